@@ -14,6 +14,10 @@ import glob
 import json
 import math
 
+import sys
+sys.path.append("../Common/Motion")
+import bvh_reader
+
 def retarget(
     input_motion_path,
     output_motion_path,
@@ -44,12 +48,8 @@ def retarget(
                 )
             
             # load FPS from BVH (Frame Time)
-            with open(input_motion_path) as f:
-                for line in f:
-                    if line.startswith("Frame Time:"):
-                        frame_time = float(line.split(":")[1].strip())
-                        bpy.context.scene.render.fps = round(1 / frame_time)
-                        break
+            frame_time = bvh_reader.loadBvhHeader(input_motion_path).frame_time
+            bpy.context.scene.render.fps = round(1 / frame_time)
             
         else:
             raise NotImplementedError(f"{input_motion_path}: Unsupported input motion-file format.")
@@ -0,0 +1,101 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# size / write-time / read-time trade-offs of exportToBvh() with compression (gzip, xz) and precision of the channels
+# on a synthetic clip (same seed, same bytes), with the largest rounding error against the default "%.6f" output
+#
+# usage: python benchmarks/bench_bvh_compression.py [--frames 10000] [--joints 22] [--repeat 3] [--seed 0]
+#
+
+import os
+import io
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import skeleton_util
+import bvh_reader
+from np2bvh import exportToBvh, bvh_suffixes
+from pos2rotation import pos2rot
+from synthetic import generateMotions
+
+
+# (compression, compresslevel, position_precision, rotation_precision)
+CASES = [
+    (None, None, 6, 6),
+    (None, None, 4, 3),
+    ("gzip", 1, 6, 6),
+    ("gzip", 6, 6, 6),
+    ("gzip", 6, 4, 3),
+    ("gzip", 6, 3, 2),
+    ("xz", 0, 6, 6),
+    ("xz", 6, 6, 6),
+    ("xz", 6, 4, 3),
+]
+
+
+def measure(func, repeat):
+
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - start)
+
+    return min(seconds)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=10000)
+    parser.add_argument("--joints", type=int, default=22, choices=[21, 22, 24])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data_pos = generateMotions(1, args.frames, args.joints, fps=120, seed=args.seed)[0]
+    data_rot = pos2rot(data_pos, "ZYX")
+    joint_names = skeleton_util.getSkeleton(args.joints).joint_names
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        reference = None
+        reference_bytes = None
+
+        print(f"{args.frames} frames, {args.joints} joints (rotation channels, seed={args.seed}):")
+        print(f"  {'compression':<12} {'level':>5} {'precision':>9} {'size MiB':>9} {'ratio':>6} {'write ms':>9} {'read ms':>8} {'max error':>10}")
+
+        for compression, compresslevel, position_precision, rotation_precision in CASES:
+            filepath = os.path.join(output_dir, "motion" + bvh_suffixes[compression])
+
+            def write():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    exportToBvh(filepath, data_pos, data_rot, joint_names, "ZYX", False, True, 1.0/120, False,
+                                compression=compression, position_precision=position_precision,
+                                rotation_precision=rotation_precision, compresslevel=compresslevel)
+
+            write_seconds = measure(write, args.repeat)
+            read_seconds = measure(lambda: bvh_reader.loadBvh(filepath), args.repeat)
+
+            motion = bvh_reader.loadBvh(filepath).motion
+            size = os.path.getsize(filepath)
+            if reference is None:
+                reference, reference_bytes = motion, size
+
+            precision = f"{position_precision}/{rotation_precision}"
+            print(f"  {str(compression):<12} {str('-' if compresslevel is None else compresslevel):>5} {precision:>9} {size/2**20:9.2f} "
+                  f"{reference_bytes/size:6.1f} {write_seconds*1000:9.1f} {read_seconds*1000:8.1f} "
+                  f"{np.abs(motion - reference).max():10.2e}")
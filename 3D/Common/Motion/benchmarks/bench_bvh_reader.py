@@ -0,0 +1,112 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# benchmark of bvh_reader (bulk, mmap and chunked reading) against a token-by-token parser
+# and the Blender importer (bpy.ops.import_anim.bvh) on the same synthetic files
+#
+# usage: python benchmarks/bench_bvh_reader.py [--frames 10000] [--joints 22] [--repeat 3]
+#        blender --background --python benchmarks/bench_bvh_reader.py -- [--frames 10000]   # with the Blender importer
+#
+
+import os
+import io
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import skeleton_util
+import bvh_reader
+from np2bvh import exportToBvh
+from pos2rotation import pos2rot
+from synthetic import generateMotions
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+
+# token-by-token parse of the MOTION block (as a hand-written reader would do)
+def readMotionPerToken(filepath):
+
+    with open(filepath) as f:
+        for line in f:
+            if line.startswith("Frame Time:"):
+                break
+        return np.array([[float(token) for token in line.split()] for line in f if line.strip()])
+
+
+def importBlender(filepath):
+
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    bpy.ops.import_anim.bvh(filepath=filepath, axis_forward="Y", axis_up="Z")
+
+
+def measure(func, repeat):
+
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - start)
+
+    return min(seconds)
+
+
+if __name__ == "__main__":
+
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:] # arguments after "--" in Blender
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=10000)
+    parser.add_argument("--joints", type=int, default=22, choices=[21, 22, 24])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    data_pos = generateMotions(1, args.frames, args.joints, fps=120)[0]
+    data_rot = pos2rot(data_pos, "ZYX")
+    joint_names = skeleton_util.getSkeleton(args.joints).joint_names
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        for outputPosition in [False, True]:
+            filepath = os.path.join(output_dir, "motion.bvh")
+            with contextlib.redirect_stdout(io.StringIO()):
+                exportToBvh(filepath, data_pos, data_rot, joint_names, "ZYX", outputPosition, True, 1.0/120, False)
+
+            bvh = bvh_reader.loadBvh(filepath)
+            assert np.array_equal(bvh.motion, readMotionPerToken(filepath))
+            assert np.array_equal(bvh.motion, bvh_reader.loadBvh(filepath, use_mmap=True).motion)
+            assert np.array_equal(bvh.motion, np.concatenate(list(bvh_reader.iterBvhChunks(filepath))))
+
+            file_mb = os.path.getsize(filepath) / 2**20
+            print(f"{args.frames} frames x {bvh.num_channels} channels ({file_mb:.1f} MiB, outputPosition={outputPosition}):")
+
+            results = [
+                ("loadBvh", lambda: bvh_reader.loadBvh(filepath)),
+                ("loadBvh(use_mmap=True)", lambda: bvh_reader.loadBvh(filepath, use_mmap=True)),
+                ("iterBvhChunks", lambda: [chunk for chunk in bvh_reader.iterBvhChunks(filepath)]),
+                ("loadBvhHeader", lambda: bvh_reader.loadBvhHeader(filepath)),
+                ("token-by-token parser", lambda: readMotionPerToken(filepath)),
+            ]
+            if bpy is not None:
+                results.append(("Blender import_anim.bvh", lambda: importBlender(filepath)))
+
+            for name, func in results:
+                seconds = measure(func, args.repeat)
+                print(f"  {name:<26}: {seconds*1000:9.1f} ms ({args.frames / seconds:12.0f} frames/s, {file_mb / seconds:7.1f} MiB/s)")
+
+            if bpy is None:
+                print("  Blender import_anim.bvh   : skipped (run this script with blender --background --python)")
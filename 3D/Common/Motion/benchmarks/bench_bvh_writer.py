@@ -0,0 +1,103 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# benchmark of the block-wise MOTION-section writer of exportToBvh() on long clips
+# against the former per-frame / per-value f-string writer (kept below as the reference of the output bytes)
+#
+# usage: python benchmarks/bench_bvh_writer.py [--frames 10000] [--joints 22] [--repeat 3]
+#
+
+import os
+import io
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import skeleton_util
+from np2bvh import exportToBvh
+from pos2rotation import pos2rot
+from synthetic import generateMotions
+
+
+# former MOTION-section writer of exportToBvh()
+def writeMotionPerFrame(f, data_pos, data_rot, joint_order, parent_order, rotation_order, outputPosition, outputRotation):
+
+    initial_pos = data_pos[0] * 100.0
+    pos_chunk = data_pos * 100.0
+    rotation_order_index = [ord(axis) - ord('X') for axis in rotation_order]
+
+    for f_idx in range(data_rot.shape[0]):
+        line = []
+        for i, j in enumerate(joint_order):
+            if j == 0 or outputPosition:
+                if j == 0:
+                    pos = pos_chunk[f_idx, j]
+                elif not outputRotation:
+                    pos = pos_chunk[f_idx, j] - pos_chunk[f_idx, parent_order[i]]
+                else:
+                    pos = initial_pos[j] - initial_pos[parent_order[i]]
+                line.extend([f"{p:.6f}" for p in pos])
+            if j == 0 or outputRotation:
+                for rot_order in rotation_order_index:
+                    line.append(f"{data_rot[f_idx, j, rot_order]:.6f}")
+        f.write(" ".join(line) + "\n")
+
+
+def readMotionSection(path):
+    with open(path) as f:
+        text = f.read()
+    return text[text.index("Frame Time:"):].split("\n", 1)[1]
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=10000)
+    parser.add_argument("--joints", type=int, default=22, choices=[21, 22, 24])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data_pos = generateMotions(1, args.frames, args.joints, fps=120)[0]
+    data_rot = pos2rot(data_pos, "ZYX")
+    skeleton = skeleton_util.getSkeleton(args.joints)
+    joint_order = skeleton.topological_order.tolist()
+    parent_order = [-1] + skeleton.parents[joint_order[1:]].tolist()
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        for outputPosition, outputRotation in [(False, True), (True, True), (True, False)]:
+
+            path_new = os.path.join(output_dir, "new.bvh")
+            path_ref = os.path.join(output_dir, "ref.bvh")
+
+            seconds_new = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    exportToBvh(path_new, data_pos, data_rot, skeleton.joint_names, "ZYX", outputPosition, outputRotation, 1.0/120, False)
+                seconds_new.append(time.perf_counter() - start)
+
+            seconds_ref = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                with open(path_ref, "w") as f:
+                    writeMotionPerFrame(f, data_pos, data_rot, joint_order, parent_order, "ZYX", outputPosition, outputRotation)
+                seconds_ref.append(time.perf_counter() - start)
+
+            assert readMotionSection(path_new) == open(path_ref).read(), "MOTION section differs"
+
+            print(f"outputPosition={outputPosition!s:<5} outputRotation={outputRotation!s:<5} ({args.frames} frames, {args.joints} joints): "
+                  f"exportToBvh {min(seconds_new)*1000:8.1f} ms (whole file), "
+                  f"per-frame MOTION writer {min(seconds_ref)*1000:8.1f} ms, "
+                  f"x{min(seconds_ref)/min(seconds_new):.1f}, {os.path.getsize(path_new)/2**20:.1f} MiB, byte-identical")
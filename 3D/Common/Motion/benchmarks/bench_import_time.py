@@ -0,0 +1,88 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# start-up cost of the entry points of Common/Motion: "python -X importtime -c 'import <module>'" in a fresh interpreter
+# records the cumulative import time of the module (the best of --repeat runs), the wall-clock of the whole process,
+# and which heavy / Blender-only packages were imported along the way (none are expected for any entry point)
+#
+# usage: python benchmarks/bench_import_time.py [--repeat 5] [--modules np2bvh plot_skeleton ...]
+#
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+MOTION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+ENTRY_POINTS = [
+    "skeleton_util",
+    "motion_transform",
+    "quaternion_util",
+    "bvh_reader",
+    "pos2rotation",
+    "np2bvh",
+    "np2gltf",
+    "plot_skeleton",
+]
+
+HEAVY_PACKAGES = ["numba", "torch", "matplotlib", "mpl_toolkits", "imageio", "scipy", "mathutils", "bpy"]
+
+
+# (cumulative import time of module in seconds, wall-clock of the process in seconds, imported heavy packages)
+def importTime(module):
+
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=MOTION_DIR, capture_output=True, text=True
+    )
+    wall_seconds = time.perf_counter() - start
+
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+
+    cumulative = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        name = name.strip()
+        if not cumulative_us.strip().isdigit():
+            continue # header
+        if name == module:
+            cumulative = int(cumulative_us) * 1e-6
+        if name.split(".")[0] in HEAVY_PACKAGES:
+            imported.add(name.split(".")[0])
+
+    return cumulative, wall_seconds, imported
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--modules", nargs="+", default=ENTRY_POINTS)
+    args = parser.parse_args()
+
+    baseline = min(importTime("os")[1] for _ in range(args.repeat))
+
+    print(f"python -X importtime, best of {args.repeat} (interpreter start-up alone: {baseline*1000:.1f} ms wall-clock):")
+    print(f"  {'module':<18} {'import ms':>10} {'process ms':>11}  heavy packages imported")
+
+    for module in args.modules:
+        results = [importTime(module) for _ in range(args.repeat)]
+        cumulative = min(result[0] for result in results)
+        wall_seconds = min(result[1] for result in results)
+        imported = sorted(set().union(*(result[2] for result in results)))
+        print(f"  {module:<18} {cumulative*1000:10.1f} {wall_seconds*1000:11.1f}  {', '.join(imported) if imported else '-'}")
@@ -0,0 +1,82 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# scaling benchmark of np2bvh(jobs=...) on a synthetic batch of clips
+#
+# one untimed conversion warms up the parent process (imports, numba kernels), and each number of jobs reports
+# the best of --repeat runs; the pool is created by each run, so the start-up of the workers
+# (including the load of the numba kernels by their initializer) is counted
+#
+# usage: python benchmarks/bench_np2bvh_parallel.py [--clips 256] [--frames 196] [--jobs 1 4 16] [--repeat 3]
+#                                                   [--backend auto|numba|numpy]
+#
+
+import os
+import sys
+import time
+import filecmp
+import tempfile
+import argparse
+import contextlib
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import pos2rotation
+from np2bvh import np2bvh
+from bench_pos2rotation import loadSampleClip
+
+
+if __name__ == "__main__":
+    
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clips", type=int, default=256)
+    parser.add_argument("--frames", type=int, default=196)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backend", default="auto", choices=["auto", "numba", "numpy"], help="rotation backend")
+    args = parser.parse_args()
+    
+    pos2rotation.setRotationBackend(args.backend)
+    print(f"{os.cpu_count()} CPUs, {args.clips} clips x {args.frames} frames, rotation backend: {args.backend}, best of {args.repeat}")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        
+        # synthetic batch: the sample clip with deterministic noise per clip
+        data_pos = np.stack([loadSampleClip(args.frames)] * args.clips, axis=0)
+        data_pos += np.random.default_rng(0).normal(scale=0.01, size=data_pos.shape).astype(data_pos.dtype)
+        input_np_path = os.path.join(temp_dir, "batch.npy")
+        np.save(input_np_path, data_pos)
+        
+        def convert(output_dir, jobs):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(open(os.devnull, "w")):
+                output_paths = np2bvh(input_np_path, output_dir, jobs=jobs)
+            return time.perf_counter() - start, output_paths
+        
+        convert(os.path.join(temp_dir, "warm-up"), 1) # untimed
+        
+        reference_paths = None
+        time_serial = None
+        for jobs in args.jobs:
+            output_dir = os.path.join(temp_dir, f"jobs{jobs}")
+            
+            results = [convert(output_dir, jobs) for _ in range(args.repeat)]
+            elapsed = min(result[0] for result in results)
+            output_paths = results[-1][1]
+            
+            if reference_paths is None:
+                reference_paths, time_serial = output_paths, elapsed
+            
+            # outputs must not depend on the number of workers
+            assert [os.path.basename(p) for p in output_paths] == [os.path.basename(p) for p in reference_paths]
+            assert all(filecmp.cmp(p, q, shallow=False) for p, q in zip(output_paths, reference_paths))
+            
+            print(f"jobs={jobs:2d}: {elapsed:.2f} s, {args.clips / elapsed:.1f} clips/s (x{time_serial / elapsed:.2f})")
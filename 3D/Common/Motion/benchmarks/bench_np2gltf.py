@@ -0,0 +1,177 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# benchmark of np2gltf.exportToGlb() (all clips as animations of one .glb) against np2bvh (one .bvh per clip)
+# and the Blender path (import each BVH and export it as glTF / FBX by bpy) on the same synthetic clips
+#
+# the written GLB is read back and its animation is evaluated by forward-kinematics,
+# which must reproduce the FK of the same rotations computed directly from pos2quat()
+#
+# usage: python benchmarks/bench_np2gltf.py [--clips 64] [--frames 200] [--joints 22] [--repeat 3]
+#        blender --background --python benchmarks/bench_np2gltf.py -- [--clips 8]   # with the Blender path
+#
+
+import os
+import io
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import skeleton_util
+from np2bvh import exportToBvh
+from np2gltf import exportToGlb, loadGlb, readAccessor
+from pos2rotation import pos2rot, pos2quat
+from quaternion_util import quatMultiply, quatConjugate
+from synthetic import generateMotions
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+
+def quatRotate(q, v):
+
+    v = np.concatenate([v, np.zeros(v.shape[:-1] + (1,))], axis=-1)
+
+    return quatMultiply(quatMultiply(q, v), quatConjugate(q))[..., :3]
+
+
+# global positions by forward-kinematics of root-translation, joint-OFFSETs and local rotations
+def forwardKinematics(root_pos, offsets, local_quats, skeleton):
+
+    positions = np.zeros(local_quats.shape[:-1] + (3,))
+    global_quats = np.zeros(local_quats.shape)
+
+    for j in skeleton.topological_order:
+        parent = skeleton.parents[j]
+        if parent < 0:
+            positions[:, j] = root_pos
+            global_quats[:, j] = local_quats[:, j]
+        else:
+            positions[:, j] = positions[:, parent] + quatRotate(global_quats[:, parent], offsets[j])
+            global_quats[:, j] = quatMultiply(global_quats[:, parent], local_quats[:, j])
+
+    return positions
+
+
+# evaluate an animation of the GLB at its key-frames
+def evaluateGlbAnimation(gltf, binary, animation_index, joints):
+
+    animation = gltf["animations"][animation_index]
+    offsets = np.array([node["translation"] for node in gltf["nodes"]])
+    root_pos = None
+    local_quats = None
+
+    for channel in animation["channels"]:
+        sampler = animation["samplers"][channel["sampler"]]
+        values = readAccessor(gltf, binary, sampler["output"])
+        node, path = channel["target"]["node"], channel["target"]["path"]
+
+        if local_quats is None:
+            local_quats = np.zeros((values.shape[0], joints, 4))
+            local_quats[..., 3] = 1.0
+
+        if path == "rotation":
+            local_quats[:, node] = values
+        elif node == 0:
+            root_pos = values
+        else:
+            offsets[node] = values[0]
+
+    return root_pos, offsets, local_quats
+
+
+def measure(func, repeat):
+
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - start)
+
+    return min(seconds)
+
+
+def exportBlender(bvh_paths, output_dir, file_format):
+
+    for i, bvh_path in enumerate(bvh_paths):
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+        bpy.ops.import_anim.bvh(filepath=bvh_path)
+        if file_format == "GLB":
+            bpy.ops.export_scene.gltf(filepath=os.path.join(output_dir, f"blender_{i:03d}.glb"), export_format="GLB")
+        else:
+            bpy.ops.export_scene.fbx(filepath=os.path.join(output_dir, f"blender_{i:03d}.fbx"))
+
+
+if __name__ == "__main__":
+
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:] # arguments after "--" in Blender
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clips", type=int, default=64)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--joints", type=int, default=22, choices=[21, 22, 24])
+    parser.add_argument("--fps", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    data_pos = generateMotions(args.clips, args.frames, args.joints, fps=args.fps)
+    skeleton = skeleton_util.getSkeleton(args.joints)
+    joint_names = skeleton.joint_names
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        glb_path = os.path.join(output_dir, "motions.glb")
+        bvh_paths = [os.path.join(output_dir, f"{i:03d}.bvh") for i in range(args.clips)]
+
+        def runGltf():
+            with contextlib.redirect_stdout(io.StringIO()):
+                exportToGlb(glb_path, data_pos, joint_names, args.fps)
+
+        def runBvh():
+            data_rot = pos2rot(data_pos)
+            with contextlib.redirect_stdout(io.StringIO()):
+                for i, bvh_path in enumerate(bvh_paths):
+                    exportToBvh(bvh_path, data_pos[i], data_rot[i], joint_names, "ZYX", False, True, 1.0/args.fps, False)
+
+        # the GLB reproduces the rotations of pos2quat()
+        runGltf()
+        gltf, binary = loadGlb(glb_path)
+        data_quat = pos2quat(data_pos)
+        max_error = 0.0
+        for i in range(args.clips):
+            root_pos, offsets, local_quats = evaluateGlbAnimation(gltf, binary, i, args.joints)
+            expected = forwardKinematics(data_pos[i, :, 0], data_pos[i, 0] - data_pos[i, 0, skeleton.parents], data_quat[i], skeleton)
+            max_error = max(max_error, np.abs(forwardKinematics(root_pos, offsets, local_quats, skeleton) - expected).max())
+        assert max_error < 1e-5, max_error
+
+        results = [
+            ("np2gltf.exportToGlb (1 file)", runGltf, glb_path),
+            ("np2bvh (pos2rot + exportToBvh)", runBvh, None),
+        ]
+        if bpy is not None:
+            runBvh()
+            results.append(("Blender BVH -> glTF", lambda: exportBlender(bvh_paths, output_dir, "GLB"), None))
+            results.append(("Blender BVH -> FBX", lambda: exportBlender(bvh_paths, output_dir, "FBX"), None))
+
+        print(f"{args.clips} clips x {args.frames} frames x {args.joints} joints (FK error of GLB: {max_error:.1e} m):")
+        for name, func, path in results:
+            seconds = measure(func, args.repeat if bpy is None or not name.startswith("Blender") else 1)
+            size = f", {os.path.getsize(path)/2**20:.2f} MiB" if path is not None else ""
+            print(f"  {name:<32}: {seconds*1000:9.1f} ms ({seconds / args.clips * 1000:7.2f} ms/clip{size})")
+
+        if bpy is None:
+            print("  Blender BVH -> glTF / FBX       : skipped (run this script with blender --background --python)")
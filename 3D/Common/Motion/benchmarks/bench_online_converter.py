@@ -0,0 +1,76 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# latency benchmark of OnlineRotationConverter.push() against the frame time at 120 fps
+# (and against re-running pos2rot() over the growing buffer)
+#
+# usage: python benchmarks/bench_online_converter.py [--frames 2400] [--joints 22] [--fps 120]
+#
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import pos2rotation
+from pos2rotation import pos2rot, OnlineRotationConverter
+from synthetic import generateMotions
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=2400)
+    parser.add_argument("--joints", type=int, default=22, choices=[21, 22, 24])
+    parser.add_argument("--fps", type=float, default=120)
+    args = parser.parse_args()
+
+    data_pos = generateMotions(1, args.frames, args.joints, fps=args.fps)[0]
+    frame_time_ms = 1000.0 / args.fps
+    data_rot_ref = pos2rot(data_pos)
+
+    for backend in ["numba", "numpy"]:
+        try:
+            pos2rotation.setRotationBackend(backend)
+        except ImportError:
+            print(f"[{backend}] skipped (not installed)")
+            continue
+
+        converter = OnlineRotationConverter(data_pos[0])
+        converter.push(data_pos[0]) # warm-up
+
+        converter.reset(data_pos[0])
+        latencies = np.empty(args.frames)
+        data_rot = np.empty(data_pos.shape)
+        for f in range(args.frames):
+            start = time.perf_counter()
+            data_rot[f] = converter.push(data_pos[f])
+            latencies[f] = time.perf_counter() - start
+        latencies *= 1000.0
+
+        error = np.abs(data_rot[1:] - data_rot_ref[1:]).max()
+        assert error < 1e-9, error
+
+        print(f"[{backend}] push() latency over {args.frames} frames: "
+              f"mean {latencies.mean():.4f} ms, p50 {np.percentile(latencies, 50):.4f} ms, "
+              f"p99 {np.percentile(latencies, 99):.4f} ms, max {latencies.max():.4f} ms "
+              f"({np.percentile(latencies, 99) / frame_time_ms * 100:.2f}% of the {frame_time_ms:.2f} ms frame time at {args.fps:g} fps), "
+              f"max error against pos2rot() {error:.1e} deg")
+
+        # re-running pos2rot() over the growing buffer costs O(n) per frame
+        for frames in [args.fps, args.fps * 10, args.frames]:
+            frames = int(min(frames, args.frames))
+            start = time.perf_counter()
+            pos2rot(data_pos[:frames])[-1]
+            print(f"[{backend}]   pos2rot() over the buffer of {frames:>5} frames: {(time.perf_counter() - start) * 1000:.3f} ms per frame")
@@ -0,0 +1,80 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# benchmark of plot_3d_motion() on the persistent-figure renderer (FrameRenderer)
+# against the former figure-per-frame renderer (update()), whose pixels must be identical
+#
+# usage: python benchmarks/bench_plot_renderer.py [--frames 196] [--joints 22] [--seed 0]
+#
+
+import os
+import sys
+import time
+import argparse
+import warnings
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import skeleton_util
+from plot_skeleton import plot_3d_motion, update
+from synthetic import generateMotions
+
+
+# frames of the former renderer: a new figure per frame (the preprocessing is the same as plot_3d_motion())
+def renderPerFigure(data_pos, title):
+
+    data = np.array(data_pos)
+    nb_joints = data.shape[1]
+    limits = 1000 if nb_joints == 21 else 2
+    MINS = data.min(axis=0).min(axis=0)
+    MAXS = data.max(axis=0).max(axis=0)
+    colors = ['red', 'blue', 'black', 'red', 'blue',
+              'darkblue', 'darkblue', 'darkblue', 'darkblue', 'darkblue',
+              'darkred', 'darkred', 'darkred', 'darkred', 'darkred']
+
+    data[:, :, 1] -= MINS[1]
+    trajec = data[:, 0, [0, 2]]
+    data[..., 0] -= data[:, 0:1, 0]
+    data[..., 2] -= data[:, 0:1, 2]
+
+    joint_chains = skeleton_util.getSkeleton(nb_joints).joint_chains
+
+    return np.stack([update(i, trajec, joint_chains, nb_joints, title, limits, MINS, MAXS, colors, data, None) for i in range(data.shape[0])])
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=196)
+    parser.add_argument("--joints", type=int, default=22, choices=[21, 22, 24])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore") # deprecation-warnings of mplot3d (ax.dist, grid(b=...)) of both renderers
+
+    data_pos = generateMotions(1, args.frames, args.joints, seed=args.seed)[0]
+    title = "a person walks forward, turns around and walks back"
+
+    start = time.perf_counter()
+    frames_new = np.asarray(plot_3d_motion(data_pos, None, title))
+    seconds_new = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frames_ref = renderPerFigure(data_pos, title)
+    seconds_ref = time.perf_counter() - start
+
+    assert frames_new.shape == frames_ref.shape and np.array_equal(frames_new, frames_ref), "pixels differ"
+
+    print(f"{args.frames} frames x {args.joints} joints ({frames_new.shape[2]}x{frames_new.shape[1]} px): "
+          f"persistent figure {seconds_new:.2f} s ({args.frames / seconds_new:.1f} frames/s), "
+          f"figure per frame {seconds_ref:.2f} s ({args.frames / seconds_ref:.1f} frames/s), "
+          f"x{seconds_ref / seconds_new:.1f}, pixel-identical")
@@ -0,0 +1,100 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# peak-memory of pos2rot() vs. pos2rotChunks() on a long take (memory-mapped .npy)
+#
+# the rotation backend is warmed up before the measurements, and each function runs twice:
+# once for the time, and once under tracemalloc (which slows down allocations) for the peak-memory only
+#
+# usage: python benchmarks/bench_pos2rot_streaming.py [--minutes 5] [--fps 120] [--chunk-frames 1024]
+#
+
+import os
+import sys
+import time
+import tempfile
+import argparse
+import contextlib
+import tracemalloc
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from pos2rotation import pos2rot, pos2rotChunks
+from np2bvh import exportToBvh
+from skeleton_util import getSkeleton
+from bench_pos2rotation import loadSampleClip
+
+
+# (seconds, peak-memory in bytes, result) of func()
+def measure(func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    del result
+    
+    tracemalloc.start()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+if __name__ == "__main__":
+    
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--minutes", type=float, default=5)
+    parser.add_argument("--fps", type=int, default=120)
+    parser.add_argument("--chunk-frames", type=int, default=1024)
+    args = parser.parse_args()
+    
+    frames = int(args.minutes * 60 * args.fps)
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_path = os.path.join(temp_dir, "long_take.npy")
+        np.save(input_path, loadSampleClip(frames))
+        data_pos = np.load(input_path, mmap_mode="r")
+        print(f"take: {frames} frames ({args.minutes} min at {args.fps} fps), positions: {data_pos.nbytes / 2**20:.1f} MiB")
+        
+        pos2rot(data_pos[:2], "ZXY") # warm-up (compile / cache-load of JIT kernels)
+        
+        time_full, peak_full, data_rot = measure(lambda: pos2rot(data_pos, "ZXY"))
+        print(f"pos2rot:       {time_full:.2f} s, peak {peak_full / 2**20:.1f} MiB")
+        
+        def consume():
+            max_diff, start = 0.0, 0
+            for rot_chunk in pos2rotChunks(data_pos, "ZXY", chunk_frames=args.chunk_frames):
+                max_diff = max(max_diff, np.abs(rot_chunk - data_rot[start:start+len(rot_chunk)]).max())
+                start += len(rot_chunk)
+            return max_diff
+        
+        time_chunk, peak_chunk, max_diff = measure(consume)
+        print(f"pos2rotChunks: {time_chunk:.2f} s, peak {peak_chunk / 2**20:.1f} MiB (chunk_frames={args.chunk_frames}), max difference: {max_diff:.2e} deg")
+        assert max_diff < 1e-6
+        
+        del data_rot
+        
+        # streaming export: rotation-chunks are fed to the BVH writer directly
+        def export():
+            with contextlib.redirect_stdout(open(os.devnull, "w")):
+                exportToBvh(
+                    os.path.join(temp_dir, "long_take.bvh"),
+                    data_pos,
+                    pos2rotChunks(data_pos, "ZXY", chunk_frames=args.chunk_frames),
+                    getSkeleton(data_pos.shape[1]).joint_names,
+                    rotation_order = "ZXY",
+                    outputPosition = False,
+                    outputRotation = True,
+                    frame_time = 1.0 / args.fps,
+                    is_left_coordinate = False
+                )
+        
+        time_export, peak_export, _ = measure(export)
+        print(f"streaming BVH export: {time_export:.2f} s, peak {peak_export / 2**20:.1f} MiB")
@@ -0,0 +1,119 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# benchmark of the vectorized pos2rot() against the per-frame reference implementation
+# (for each rotation-backend and torch.Tensor input, and compile cost of the JIT kernels)
+#
+# usage: python benchmarks/bench_pos2rotation.py [--frames 196] [--clips 32] [--repeat 3]
+#
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+MOTION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(MOTION_DIR)
+import pos2rotation
+from pos2rotation import pos2rot, pos2rotPerFrame
+
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../samples/motion_smpl_sample_T2M-GPT.npy")
+
+
+# load the sample clip and repeat it to the requested length
+def loadSampleClip(frames):
+    data_pos = np.load(SAMPLE_PATH)[0] # ndarray(frames, 22, 3)
+    repeats = (frames + data_pos.shape[0] - 1) // data_pos.shape[0]
+    return np.concatenate([data_pos] * repeats, axis=0)[:frames]
+
+
+def measure(func, data_pos, rotation_order, repeat):
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data_rot = func(data_pos, rotation_order)
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed), data_rot
+
+
+if __name__ == "__main__":
+    
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=196)
+    parser.add_argument("--clips", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    
+    data_pos = loadSampleClip(args.frames)
+    print(f"clip: {data_pos.shape[0]} frames, {data_pos.shape[1]} joints")
+    
+    backends = ["numpy", "numba"] if pos2rotation.quaternion_jit.is_available else ["numpy"]
+    
+    for backend in backends:
+        pos2rotation.setRotationBackend(backend)
+        pos2rot(data_pos[:2]) # exclude compile / cache-load of JIT kernels
+        print(f"--- backend: {backend}")
+        
+        for rotation_order in ["XYZ", "ZYX", "ZXY"]:
+            time_ref, data_rot_ref = measure(pos2rotPerFrame, data_pos, rotation_order, args.repeat)
+            time_vec, data_rot_vec = measure(pos2rot, data_pos, rotation_order, args.repeat)
+            max_diff = np.abs(data_rot_vec - data_rot_ref).max()
+            
+            print(f"[{rotation_order}] per-frame: {time_ref*1000:.1f} ms, vectorized: {time_vec*1000:.2f} ms "
+                  f"(x{time_ref/time_vec:.0f}), max difference: {max_diff:.2e} deg")
+            
+            assert max_diff < 1e-6, "vectorized pos2rot() differs from the reference implementation"
+        
+        # whole batch in one pass vs. clip by clip
+        data_pos_batch = np.stack([data_pos] * args.clips, axis=0)
+        data_pos_batch += np.random.default_rng(0).normal(scale=0.01, size=data_pos_batch.shape).astype(data_pos_batch.dtype)
+        
+        time_loop, data_rot_loop = measure(lambda d, o: np.stack([pos2rot(clip, o) for clip in d]), data_pos_batch, "ZYX", args.repeat)
+        time_batch, data_rot_batch = measure(pos2rot, data_pos_batch, "ZYX", args.repeat)
+        max_diff = np.abs(data_rot_batch - data_rot_loop).max()
+        
+        print(f"[batch of {args.clips} clips] per-clip loop: {time_loop*1000:.1f} ms, batched: {time_batch*1000:.1f} ms "
+              f"(x{time_loop/time_batch:.1f}), max difference: {max_diff:.2e} deg")
+        
+        assert max_diff < 1e-6, "batched pos2rot() differs from the per-clip results"
+    
+    # torch.Tensor input (e.g. model outputs in an evaluation hook)
+    try:
+        import torch
+    except ImportError:
+        torch = None
+    
+    if torch is not None:
+        data_rot_ref = pos2rot(data_pos_batch, "ZYX")
+        time_torch, data_rot_torch = measure(pos2rot, torch.from_numpy(data_pos_batch), "ZYX", args.repeat)
+        max_diff = np.abs(data_rot_torch.numpy() - data_rot_ref).max()
+        
+        print(f"--- torch.Tensor input ({torch.get_num_threads()} threads)")
+        print(f"[batch of {args.clips} clips] {time_torch*1000:.1f} ms, max difference from NumPy: {max_diff:.2e} deg")
+        
+        assert max_diff < 1e-6, "pos2rot() of torch.Tensor differs from NumPy"
+    
+    # compile cost of JIT kernels: 1st run (empty disk-cache) vs. 2nd run (cached)
+    if "numba" in backends:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            env = dict(os.environ, NUMBA_CACHE_DIR=cache_dir)
+            script = (
+                "import time, numpy as np; import pos2rotation; pos2rotation.setRotationBackend('numba'); "
+                "start = time.perf_counter(); pos2rotation.pos2rot(np.random.rand(2, 22, 3)); "
+                "print(time.perf_counter() - start)"
+            )
+            for label in ["cold (compile)", "warm (disk-cache)"]:
+                result = subprocess.run([sys.executable, "-c", script], cwd=MOTION_DIR, env=env, capture_output=True, text=True, check=True)
+                print(f"JIT 1st call, {label}: {float(result.stdout.strip()) * 1000:.0f} ms")
@@ -0,0 +1,128 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# benchmark of the NumPy stick-figure rasterizer (stick_renderer, renderer="numpy" of plot_skeleton)
+# against the matplotlib renderer (FrameRenderer) on the same synthetic clip
+#
+# the camera of the rasterizer must project the joints onto the same pixels as matplotlib (ax.M and the axes-transform)
+#
+# usage: python benchmarks/bench_stick_renderer.py [--frames 196] [--joints 22] [--size 320] [--block 64] [--repeat 5]
+#
+
+import os
+import sys
+import time
+import argparse
+import warnings
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import skeleton_util
+from plot_skeleton import plot_3d_motion, FrameRenderer
+from stick_renderer import StickFigureRenderer
+from synthetic import generateMotions
+
+
+COLORS = ['red', 'blue', 'black', 'red', 'blue',
+          'darkblue', 'darkblue', 'darkblue', 'darkblue', 'darkblue',
+          'darkred', 'darkred', 'darkred', 'darkred', 'darkred']
+
+
+# the preprocessing of plot_3d_motion(): (data, trajec, MINS, MAXS)
+def prepare(data_pos):
+
+    data = np.array(data_pos)
+    MINS = data.min(axis=0).min(axis=0)
+    MAXS = data.max(axis=0).max(axis=0)
+    data[:, :, 1] -= MINS[1]
+    trajec = data[:, 0, [0, 2]]
+    data[..., 0] -= data[:, 0:1, 0]
+    data[..., 2] -= data[:, 0:1, 2]
+
+    return data, trajec, MINS, MAXS
+
+
+# largest distance in pixels between the joints projected by matplotlib and by the rasterizer (on the same figure size)
+def cameraError(data, joints, limits):
+
+    import matplotlib
+    matplotlib.use('Agg')
+    from mpl_toolkits.mplot3d import proj3d
+
+    joint_chains = skeleton_util.getSkeleton(joints).joint_chains
+    renderer = FrameRenderer(joint_chains, joints, None, limits, COLORS)
+    renderer.fig.canvas.draw()
+    width, height = (int(v) for v in renderer.fig.bbox.size)
+
+    points = data.reshape(-1, 3)
+    x, y, _ = proj3d.proj_transform(points[:, 0], points[:, 1], points[:, 2], renderer.ax.M)
+    expected = renderer.ax.transData.transform(np.stack([x, y], axis=1))
+    expected[:, 1] = height - expected[:, 1]
+    renderer.close()
+
+    actual = StickFigureRenderer(joint_chains, limits, COLORS, width, height).project(points)
+
+    return np.abs(actual - expected).max()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=196)
+    parser.add_argument("--joints", type=int, default=22, choices=[21, 22, 24])
+    parser.add_argument("--size", type=int, default=320, help="width and height of the rasterized frames")
+    parser.add_argument("--block", type=int, default=64, help="frames rasterized at once")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore") # deprecation-warnings of mplot3d (ax.dist, grid(b=...))
+
+    data_pos = generateMotions(1, args.frames, args.joints, seed=args.seed)[0]
+    limits = 1000 if args.joints == 21 else 2
+    data, trajec, MINS, MAXS = prepare(data_pos)
+
+    error = cameraError(data, args.joints, limits)
+    assert error < 1e-6, error
+
+    renderer = StickFigureRenderer(skeleton_util.getSkeleton(args.joints).joint_chains, limits, COLORS, args.size, args.size)
+    buffer = np.empty((args.block, args.size, args.size, 4), dtype=np.uint8)
+
+    def renderBlocks():
+        for frame_start in range(0, args.frames, args.block):
+            renderer.render(data, trajec, MINS, MAXS, frame_start, min(frame_start + args.block, args.frames), out=buffer)
+
+    renderBlocks() # warm-up
+    seconds_numpy = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        renderBlocks()
+        seconds_numpy.append(time.perf_counter() - start)
+    seconds_numpy = min(seconds_numpy)
+
+    # (the matplotlib renderer first: it pays the imports of matplotlib and torch)
+    start = time.perf_counter()
+    frames_mpl = np.asarray(plot_3d_motion(data_pos, None, None))
+    seconds_mpl = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frames_numpy = np.asarray(plot_3d_motion(data_pos, None, None, renderer="numpy"))
+    seconds_numpy_plot = time.perf_counter() - start
+
+    print(f"{args.frames} frames x {args.joints} joints (camera error against matplotlib: {error:.1e} px):")
+    results = [
+        (f"plot_3d_motion (matplotlib, {frames_mpl.shape[2]}x{frames_mpl.shape[1]} px)", seconds_mpl),
+        (f"plot_3d_motion (numpy, {frames_numpy.shape[2]}x{frames_numpy.shape[1]} px)", seconds_numpy_plot),
+        (f"StickFigureRenderer ({args.size}x{args.size} px, {args.block} frames/block)", seconds_numpy),
+    ]
+    for name, seconds in results:
+        print(f"  {name:<50}: {seconds:7.3f} s ({args.frames / seconds:8.1f} frames/s)")
@@ -0,0 +1,293 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# benchmark suite of the motion pipeline on synthetic SMPL-style motions
+# (loadPositionalMotions, pos2rot, exportToBvh and plot_3d_motion)
+#
+# each (stage, case) is measured in a fresh subprocess so that peak RSS belongs to that stage only,
+# and frames/sec, peak RSS and bytes written are saved as JSON, which can be compared against a stored baseline.
+# everything runs offline on CPU.
+#
+# usage:
+#   python benchmarks/run_suite.py [--preset quick|full] [--output results.json]
+#   python benchmarks/run_suite.py --baseline baseline.json [--threshold 0.1]   # exit-code 1 on regression
+#   python benchmarks/run_suite.py --joints 22 --frames 196 10000 --clips 1 32 --stages pos2rot exportToBvh
+#
+
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import itertools
+import contextlib
+import subprocess
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+MOTION_DIR = os.path.join(BENCHMARK_DIR, "..")
+sys.path.append(MOTION_DIR)
+sys.path.append(BENCHMARK_DIR)
+import synthetic
+
+
+STAGES = ["loadPositionalMotions", "pos2rot", "exportToBvh", "plot_3d_motion"]
+
+# (joints, frames, clips)
+PRESETS = {
+    "quick": [
+        (22, 196, 1),
+        (22, 196, 32),
+        (21, 60, 8),
+        (24, 1000, 4),
+    ],
+    "full": [
+        (22, 196, 1),
+        (22, 196, 32),
+        (21, 60, 8),
+        (24, 1000, 4),
+        (22, 10000, 1),
+        (24, 10000, 4),
+        (21, 196, 100),
+        (22, 60, 1000),
+        (22, 196, 1000),
+    ],
+}
+
+# metrics compared against the baseline: (key, True if higher is better)
+COMPARED_METRICS = [("frames_per_sec", True), ("peak_rss_mb", False)]
+
+
+
+def _peakRssMb():
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss / 2**20 if sys.platform == "darwin" else peak_rss / 2**10 # bytes on macOS, KiB on Linux
+
+
+def _directorySize(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+
+#
+# measure a single stage in the current process (called in the subprocess)
+# returns: dict(seconds, frames, bytes_written, peak_rss_mb)
+#
+def runStage(stage, data_path, repeat, plot_frames):
+
+    from np2bvh import loadPositionalMotions, exportToBvh
+    from pos2rotation import pos2rot
+    import skeleton_util
+
+    data_pos = np.load(data_path)
+    num_clips, num_frames, num_joints, _ = data_pos.shape
+    frames = num_clips * num_frames
+
+    pos2rot(data_pos[:1, :2]) # warm-up of the JIT kernels (compile or load from cache) out of the measurement
+
+    with tempfile.TemporaryDirectory() as output_dir:
+
+        if stage == "loadPositionalMotions":
+            def func():
+                loadPositionalMotions(data_path) # positions and rotations of all clips
+
+        elif stage == "pos2rot":
+            def func():
+                pos2rot(data_pos)
+
+        elif stage == "exportToBvh":
+            data_rot = pos2rot(data_pos)
+            joint_names = skeleton_util.getSkeleton(num_joints).joint_names
+            def func():
+                for i in range(num_clips):
+                    exportToBvh(f"{output_dir}/{i:03d}.bvh", data_pos[i], data_rot[i], joint_names,
+                                "ZYX", False, True, 1.0/20, False)
+
+        elif stage == "plot_3d_motion":
+            from plot_skeleton import plot_3d_motion
+            frames = min(plot_frames, num_frames)
+            def func():
+                plot_3d_motion(data_pos[0, :frames], None, "synthetic motion", fps=20, output_path=f"{output_dir}/000.gif")
+
+        else:
+            raise ValueError(f"Invalid stage: {stage}")
+
+        seconds = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                func()
+            seconds.append(time.perf_counter() - start)
+
+        bytes_written = _directorySize(output_dir)
+
+    return dict(
+        seconds = min(seconds),
+        frames = frames,
+        bytes_written = bytes_written,
+        peak_rss_mb = _peakRssMb()
+    )
+
+
+
+def _measureInSubprocess(stage, data_path, repeat, plot_frames):
+
+    env = dict(os.environ, MPLBACKEND="Agg", CUDA_VISIBLE_DEVICES="")
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-stage", stage, data_path,
+         "--repeat", str(repeat), "--plot-frames", str(plot_frames)],
+        capture_output=True, text=True, env=env
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"stage {stage} failed:\n{proc.stderr}")
+
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+
+#
+# run every stage on every case (joints, frames, clips)
+# returns: list of result-dict
+#
+def runSuite(cases, stages=STAGES, repeat=3, plot_frames=10, seed=0):
+
+    results = []
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for num_joints, num_frames, num_clips in cases:
+
+            data_path = os.path.join(work_dir, f"synthetic_{num_joints}_{num_frames}_{num_clips}.npy")
+            np.save(data_path, synthetic.generateMotions(num_clips, num_frames, num_joints, seed=seed))
+
+            for stage in stages:
+                measured = _measureInSubprocess(stage, data_path, repeat, plot_frames)
+
+                result = dict(
+                    stage = stage,
+                    joints = num_joints,
+                    frames = num_frames,
+                    clips = num_clips,
+                    seconds = measured["seconds"],
+                    frames_per_sec = measured["frames"] / measured["seconds"],
+                    peak_rss_mb = measured["peak_rss_mb"],
+                    bytes_written = measured["bytes_written"]
+                )
+                results.append(result)
+
+                print(f"{stage:<22} joints={num_joints:<3} frames={num_frames:<6} clips={num_clips:<5}: "
+                      f"{result['frames_per_sec']:>12.1f} frames/s, "
+                      f"{result['peak_rss_mb']:>8.1f} MiB peak RSS, "
+                      f"{result['bytes_written']:>12d} bytes written", flush=True)
+
+            os.remove(data_path)
+
+    return results
+
+
+
+def _resultKey(result):
+    return (result["stage"], result["joints"], result["frames"], result["clips"])
+
+
+#
+# compare results against a baseline
+# a metric regresses when it is worse than the baseline by more than threshold (relative)
+# returns: list of regression messages
+#
+def compareResults(results, baseline_results, threshold=0.1):
+
+    baseline = {_resultKey(result): result for result in baseline_results}
+    regressions = []
+
+    for result in results:
+        key = _resultKey(result)
+        if key not in baseline:
+            continue
+
+        for metric, is_higher_better in COMPARED_METRICS:
+            value, baseline_value = result[metric], baseline[key][metric]
+            if baseline_value <= 0:
+                continue
+
+            change = value / baseline_value - 1.0
+            if (-change if is_higher_better else change) > threshold:
+                regressions.append(
+                    f"{key[0]} joints={key[1]} frames={key[2]} clips={key[3]}: "
+                    f"{metric} {baseline_value:.1f} -> {value:.1f} ({change*100:+.1f}%)"
+                )
+
+    return regressions
+
+
+
+def _environment():
+    return dict(
+        python = platform.python_version(),
+        numpy = np.__version__,
+        platform = platform.platform(),
+        processor = platform.processor(),
+        cpu_count = os.cpu_count(),
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+    )
+
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark suite of the motion pipeline on synthetic motions.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick")
+    parser.add_argument("--joints", type=int, nargs="+", choices=[21, 22, 24], help="custom cases (overrides --preset)")
+    parser.add_argument("--frames", type=int, nargs="+", help="custom cases (overrides --preset)")
+    parser.add_argument("--clips", type=int, nargs="+", help="custom cases (overrides --preset)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--plot-frames", type=int, default=10, help="frames rendered by plot_3d_motion")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="path to save the results as JSON")
+    parser.add_argument("--baseline", default=None, help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative regression threshold")
+    parser.add_argument("--run-stage", nargs=2, metavar=("STAGE", "DATA_PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # subprocess-mode: measure a single stage and print the result as JSON
+    if args.run_stage is not None:
+        stage, data_path = args.run_stage
+        print(json.dumps(runStage(stage, data_path, args.repeat, args.plot_frames)))
+        sys.exit(0)
+
+    if args.joints or args.frames or args.clips:
+        cases = list(itertools.product(args.joints or [22], args.frames or [196], args.clips or [1]))
+    else:
+        cases = PRESETS[args.preset]
+
+    results = runSuite(cases, args.stages, args.repeat, args.plot_frames, args.seed)
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(dict(environment=_environment(), threshold=args.threshold, results=results), f, indent=2)
+        print(f"Saved results to \"{args.output}\"")
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline_results = json.load(f)["results"]
+
+        regressions = compareResults(results, baseline_results, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) against \"{args.baseline}\" (threshold {args.threshold*100:.0f}%):")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+
+        print(f"No regression against \"{args.baseline}\" (threshold {args.threshold*100:.0f}%)")
@@ -0,0 +1,155 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# synthetic SMPL-style positional motions for benchmarks
+#
+# rest-pose of each joint-type is animated by sinusoidal local rotations (forward-kinematics along skeleton_util chains)
+# and a walking root-trajectory, so that every bone has a valid, non-degenerate direction.
+#
+
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import skeleton_util
+
+
+# approximate rest-pose (T-pose) joint positions in meters (Y-up)
+rest_pose_smpl = np.array([
+    [ 0.00, 0.95,  0.00], #  0: pelvis
+    [ 0.06, 0.87,  0.00], #  1: left_hip
+    [-0.06, 0.87,  0.00], #  2: right_hip
+    [ 0.00, 1.06, -0.02], #  3: spine1
+    [ 0.10, 0.50,  0.00], #  4: left_knee
+    [-0.10, 0.50,  0.00], #  5: right_knee
+    [ 0.00, 1.20,  0.00], #  6: spine2
+    [ 0.09, 0.08, -0.03], #  7: left_ankle
+    [-0.09, 0.08, -0.03], #  8: right_ankle
+    [ 0.00, 1.25,  0.01], #  9: spine3
+    [ 0.11, 0.02,  0.10], # 10: left_foot
+    [-0.11, 0.02,  0.10], # 11: right_foot
+    [ 0.00, 1.47, -0.02], # 12: neck
+    [ 0.08, 1.38, -0.01], # 13: left_collar
+    [-0.08, 1.38, -0.01], # 14: right_collar
+    [ 0.00, 1.55,  0.04], # 15: head
+    [ 0.19, 1.40, -0.02], # 16: left_shoulder
+    [-0.19, 1.40, -0.02], # 17: right_shoulder
+    [ 0.44, 1.40, -0.04], # 18: left_elbow
+    [-0.44, 1.40, -0.04], # 19: right_elbow
+    [ 0.69, 1.40, -0.03], # 20: left_wrist
+    [-0.69, 1.40, -0.03], # 21: right_wrist
+    [ 0.77, 1.40, -0.04], # 22: left_hand
+    [-0.77, 1.40, -0.04], # 23: right_hand
+])
+
+# KIT-ML layout (21 joints)
+rest_pose_kit = np.array([
+    [ 0.00, 1.00,  0.00], #  0: root
+    [ 0.00, 1.10,  0.00], #  1: torso
+    [ 0.00, 1.25,  0.00], #  2: chest
+    [ 0.00, 1.45,  0.00], #  3: neck
+    [ 0.00, 1.60,  0.02], #  4: head
+    [ 0.18, 1.40,  0.00], #  5: right shoulder
+    [ 0.45, 1.40,  0.00], #  6: right elbow
+    [ 0.70, 1.40,  0.00], #  7: right wrist
+    [-0.18, 1.40,  0.00], #  8: left shoulder
+    [-0.45, 1.40,  0.00], #  9: left elbow
+    [-0.70, 1.40,  0.00], # 10: left wrist
+    [ 0.09, 0.95,  0.00], # 11: right hip
+    [ 0.09, 0.50,  0.00], # 12: right knee
+    [ 0.09, 0.08,  0.00], # 13: right ankle
+    [ 0.09, 0.03,  0.08], # 14: right metatarsal
+    [ 0.09, 0.00,  0.15], # 15: right toe
+    [-0.09, 0.95,  0.00], # 16: left hip
+    [-0.09, 0.50,  0.00], # 17: left knee
+    [-0.09, 0.08,  0.00], # 18: left ankle
+    [-0.09, 0.03,  0.08], # 19: left metatarsal
+    [-0.09, 0.00,  0.15], # 20: left toe
+])
+
+
+def getRestPose(num_joints):
+    if num_joints == 21:
+        return rest_pose_kit
+    elif num_joints in (22, 24):
+        return rest_pose_smpl[:num_joints]
+    else:
+        raise NotImplementedError(f"This joint-type (num_joints={num_joints}) is not implemented.")
+
+
+# rotation matrices of angles around unit axes: ndarray(..., 3), ndarray(...) -> ndarray(..., 3, 3)
+def _axisAngleToMatrix(axis, angle):
+    x, y, z = axis[..., 0], axis[..., 1], axis[..., 2]
+    c, s = np.cos(angle), np.sin(angle)
+    t = 1.0 - c
+    return np.stack([
+        np.stack([t*x*x + c,   t*x*y - s*z, t*x*z + s*y], axis=-1),
+        np.stack([t*x*y + s*z, t*y*y + c,   t*y*z - s*x], axis=-1),
+        np.stack([t*x*z - s*y, t*y*z + s*x, t*z*z + c  ], axis=-1),
+    ], axis=-2)
+
+
+#
+# generate synthetic motions as ndarray(num_clips, num_frames, num_joints, 3) (float32, meters, Y-up)
+#
+def generateMotions(
+    num_clips,
+    num_frames,
+    num_joints = 22,
+    fps = 20,
+    seed = 0
+    ):
+
+    rng = np.random.default_rng(seed)
+    skeleton = skeleton_util.getSkeleton(num_joints)
+    rest_pose = getRestPose(num_joints)
+
+    offsets = rest_pose - rest_pose[np.maximum(skeleton.parents, 0)]
+
+    t = np.arange(num_frames) / fps # (frames,)
+
+    # per-clip, per-joint oscillation: random axis, amplitude (<= 30 deg), frequency (0.3-2 Hz) and phase
+    axes = rng.normal(size=(num_clips, num_joints, 3))
+    axes /= np.linalg.norm(axes, axis=-1, keepdims=True)
+    amplitudes = rng.uniform(0.0, np.deg2rad(30), size=(num_clips, num_joints))
+    frequencies = rng.uniform(0.3, 2.0, size=(num_clips, num_joints))
+    phases = rng.uniform(0.0, 2*np.pi, size=(num_clips, num_joints))
+
+    speeds = rng.uniform(0.5, 1.5, size=num_clips)
+    
+    data_pos = np.empty((num_clips, num_frames, num_joints, 3), dtype=np.float32)
+    
+    # forward-kinematics block by block of clips to bound the memory of rotation-matrices
+    clips_per_block = max(1, 2**20 // (num_frames * num_joints))
+    for start in range(0, num_clips, clips_per_block):
+        end = min(start + clips_per_block, num_clips)
+        
+        # local rotations: ndarray(clips, frames, joints, 3, 3)
+        angles = amplitudes[start:end, None] * np.sin(2*np.pi * frequencies[start:end, None] * t[None, :, None] + phases[start:end, None])
+        local_rotations = _axisAngleToMatrix(axes[start:end, None], angles)
+        global_rotations = np.empty(local_rotations.shape)
+        
+        # root: walking forward with vertical bobbing
+        block_pos = np.empty((end - start, num_frames, num_joints, 3))
+        block_pos[:, :, 0, 0] = 0.0
+        block_pos[:, :, 0, 1] = rest_pose[0, 1] + 0.03 * np.sin(4*np.pi * t)[None]
+        block_pos[:, :, 0, 2] = speeds[start:end, None] * t[None]
+        global_rotations[:, :, 0] = local_rotations[:, :, 0]
+        
+        for j in skeleton.topological_order[1:]:
+            parent = skeleton.parents[j]
+            global_rotations[:, :, j] = global_rotations[:, :, parent] @ local_rotations[:, :, j]
+            block_pos[:, :, j] = block_pos[:, :, parent] + global_rotations[:, :, parent] @ offsets[j]
+        
+        data_pos[start:end] = block_pos
+    
+    return data_pos
@@ -0,0 +1,320 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# BVH reader without Blender
+#
+# the hierarchy is parsed token by token (it is small), while the MOTION block is parsed in bulk by NumPy
+# into a single ndarray(frames, channels). huge files can be read through mmap or chunk by chunk.
+# files compressed by gzip / xz (e.g. "*.bvh.gz" of np2bvh) are decompressed transparently.
+#
+
+import gzip
+import lzma
+import mmap
+import numpy as np
+
+
+#
+# hierarchy and motion of a BVH file
+#
+# joint_names:     list of joint names (in the order of the file, i.e. the order of the channels; End Sites are excluded)
+# parents:         ndarray(joints,) index of the parent joint (-1 for root)
+# offsets:         ndarray(joints, 3) OFFSET of each joint
+# channels:        list of channel-names of each joint, e.g. ["Xposition", "Yposition", "Zposition", "Zrotation", ...]
+# channel_starts:  ndarray(joints,) first column of each joint in motion
+# end_sites:       dict{joint index: OFFSET ndarray(3,) of its End Site}
+# frames:          number of frames
+# frame_time:      seconds per frame
+# motion:          ndarray(frames, channels), or None when only the hierarchy is read
+#
+class BvhData:
+
+    def __init__(self):
+    
+        self.joint_names = []
+        self.parents = []
+        self.offsets = []
+        self.channels = []
+        self.channel_starts = []
+        self.end_sites = {}
+        self.frames = 0
+        self.frame_time = 0.0
+        self.motion = None
+    
+    
+    @property
+    def num_channels(self):
+        return sum(len(channels) for channels in self.channels)
+    
+    
+    @property
+    def fps(self):
+        return 1.0 / self.frame_time
+    
+    
+    def __repr__(self):
+        return (f"BvhData(joints={len(self.joint_names)}, channels={self.num_channels}, frames={self.frames}, "
+                f"frame_time={self.frame_time})")
+    
+    
+    # columns of a joint's channels in motion, e.g. getChannels("Hips") -> ndarray(frames, 6)
+    def getChannels(self, joint_name):
+    
+        j = self.joint_names.index(joint_name)
+        start = self.channel_starts[j]
+        
+        return self.motion[:, start:start + len(self.channels[j])]
+
+
+
+#
+# parse the hierarchy from the lines before "MOTION"
+#
+def _parseHierarchy(text, bvh):
+
+    tokens = text.split()
+    stack = []
+    pending_joint = None
+    num_channels = 0
+    i = 0
+    
+    while i < len(tokens):
+        token = tokens[i]
+        
+        if token in ("ROOT", "JOINT"):
+            bvh.joint_names.append(tokens[i+1])
+            bvh.parents.append(stack[-1] if stack else -1)
+            bvh.offsets.append(np.zeros(3))
+            bvh.channels.append([])
+            bvh.channel_starts.append(num_channels)
+            pending_joint = len(bvh.joint_names) - 1
+            i += 2
+        
+        elif token == "End":
+            pending_joint = "End Site"
+            i += 2 # "End Site"
+        
+        elif token == "{":
+            stack.append(pending_joint)
+            i += 1
+        
+        elif token == "}":
+            stack.pop()
+            i += 1
+        
+        elif token == "OFFSET":
+            offset = np.array(tokens[i+1:i+4], dtype=np.float64)
+            if stack[-1] == "End Site":
+                bvh.end_sites[stack[-2]] = offset
+            else:
+                bvh.offsets[stack[-1]] = offset
+            i += 4
+        
+        elif token == "CHANNELS":
+            count = int(tokens[i+1])
+            bvh.channels[stack[-1]] = tokens[i+2:i+2+count]
+            num_channels += count
+            i += 2 + count
+        
+        else: # "HIERARCHY" and unknown tokens
+            i += 1
+    
+    if stack:
+        raise ValueError("Unbalanced braces in the BVH hierarchy.")
+    
+    bvh.parents = np.array(bvh.parents, dtype=int)
+    bvh.offsets = np.array(bvh.offsets).reshape(-1, 3)
+    bvh.channel_starts = np.array(bvh.channel_starts, dtype=int)
+
+
+
+#
+# split a BVH buffer (str or bytes) into the hierarchy and the header of the motion
+# returns: (bvh without motion, offset of the first frame in the buffer)
+#
+def _parseHeader(buffer):
+
+    newline = "\n" if isinstance(buffer, str) else b"\n"
+    motion_start = buffer.find("MOTION" if isinstance(buffer, str) else b"MOTION")
+    if motion_start < 0:
+        raise ValueError("MOTION section is not found.")
+    
+    hierarchy = buffer[:motion_start]
+    bvh = BvhData()
+    _parseHierarchy(hierarchy if isinstance(hierarchy, str) else hierarchy.decode(), bvh)
+    
+    # "Frames: N" and "Frame Time: t"
+    position = buffer.find(newline, motion_start) + 1
+    if position <= 0:
+        raise ValueError("MOTION section has no frames.")
+    for _ in range(2):
+        line_end = buffer.find(newline, position)
+        line_end = len(buffer) if line_end < 0 else line_end
+        line = buffer[position:line_end]
+        line = line if isinstance(line, str) else line.decode()
+        name, value = line.split(":")
+        if name.strip() == "Frames":
+            bvh.frames = int(value)
+        elif name.strip() == "Frame Time":
+            bvh.frame_time = float(value)
+        else:
+            raise ValueError(f"Invalid line in MOTION section: {line}")
+        position = line_end + 1
+    
+    return bvh, position
+
+
+
+# bulk parse of whitespace-separated values into ndarray(frames, channels)
+def _parseMotion(buffer, frames, num_channels, dtype):
+
+    values = np.fromstring(buffer, dtype=dtype, sep=" ") if len(buffer) > 0 else np.zeros(0, dtype=dtype)
+    
+    if values.size != frames * num_channels:
+        raise ValueError(f"MOTION has {values.size} values, but {frames} frames x {num_channels} channels are expected.")
+    
+    return values.reshape(frames, num_channels)
+
+
+
+#
+# open a BVH file as binary, decompressing gzip / xz streams (detected by the magic bytes, not by the suffix)
+#
+def _openBinary(filepath):
+    
+    with open(filepath, "rb") as f:
+        magic = f.read(6)
+    
+    if magic.startswith(b"\x1f\x8b"):
+        return gzip.open(filepath, "rb")
+    elif magic.startswith(b"\xfd7zXZ\x00"):
+        return lzma.open(filepath, "rb")
+    
+    return open(filepath, "rb")
+
+
+
+def _isCompressed(f):
+    return isinstance(f, (gzip.GzipFile, lzma.LZMAFile))
+
+
+
+# bulk parse of a memory-mapped MOTION block, block by block of lines, into ndarray(frames, channels)
+# (the text is never copied as a whole, so that the peak-memory is the output plus a block)
+def _parseMotionMapped(buffer, position, frames, num_channels, dtype, block_bytes = 2**24):
+
+    motion = np.empty(frames * num_channels, dtype=dtype)
+    count = 0
+    
+    while position < len(buffer):
+        block_end = buffer.find(b"\n", min(position + block_bytes, len(buffer) - 1)) + 1
+        block_end = len(buffer) if block_end <= 0 else block_end
+        
+        values = np.fromstring(buffer[position:block_end], dtype=dtype, sep=" ")
+        if count + values.size > motion.size:
+            raise ValueError(f"MOTION has more values than {frames} frames x {num_channels} channels.")
+        motion[count:count + values.size] = values
+        
+        count += values.size
+        position = block_end
+    
+    if count != motion.size:
+        raise ValueError(f"MOTION has {count} values, but {frames} frames x {num_channels} channels are expected.")
+    
+    return motion.reshape(frames, num_channels)
+
+
+
+#
+# read a BVH file
+# use_mmap = True: the file is memory-mapped and parsed block by block instead of read into memory (for huge files)
+#                 ignored for compressed files (use iterBvhChunks() to bound the memory of huge compressed files)
+# read_motion = False: only the hierarchy and the header of the motion (frames, frame-time) are read
+#
+def loadBvh(
+    filepath,
+    use_mmap = False,
+    read_motion = True,
+    dtype = np.float64
+    ):
+    
+    if not read_motion:
+        return loadBvhHeader(filepath)
+    
+    with _openBinary(filepath) as f:
+    
+        if use_mmap and not _isCompressed(f): # compressed files cannot be memory-mapped, so they are read as a whole
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                bvh, position = _parseHeader(buffer)
+                bvh.motion = _parseMotionMapped(buffer, position, bvh.frames, bvh.num_channels, dtype)
+        else:
+            buffer = f.read()
+            bvh, position = _parseHeader(buffer)
+            bvh.motion = _parseMotion(buffer[position:], bvh.frames, bvh.num_channels, dtype)
+    
+    return bvh
+
+
+
+#
+# read only the hierarchy and "Frames" / "Frame Time" of a BVH file (without reading the MOTION block)
+#
+def loadBvhHeader(filepath):
+
+    lines = []
+    with _openBinary(filepath) as f:
+        for line in f:
+            lines.append(line)
+            if line.startswith(b"Frame Time:"):
+                break
+    
+    bvh, _ = _parseHeader(b"".join(lines))
+    
+    return bvh
+
+
+
+#
+# read the MOTION block chunk by chunk for huge files (the hierarchy can be read by loadBvhHeader())
+# yields: ndarray(chunk, channels)
+#
+def iterBvhChunks(
+    filepath,
+    chunk_frames = 4096,
+    dtype = np.float64
+    ):
+    
+    with _openBinary(filepath) as f:
+        
+        lines = []
+        for line in f:
+            lines.append(line)
+            if line.startswith(b"Frame Time:"):
+                break
+        
+        bvh, _ = _parseHeader(b"".join(lines))
+        num_channels = bvh.num_channels
+        
+        frame_start = 0
+        while frame_start < bvh.frames:
+            chunk_lines = []
+            for line in f:
+                if line.strip():
+                    chunk_lines.append(line)
+                if len(chunk_lines) == chunk_frames:
+                    break
+            
+            if not chunk_lines:
+                raise ValueError(f"MOTION has {frame_start} frames, but {bvh.frames} frames are expected.")
+            
+            yield _parseMotion(b"".join(chunk_lines), len(chunk_lines), num_channels, dtype)
+            
+            frame_start += len(chunk_lines)
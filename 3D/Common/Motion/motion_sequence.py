@@ -0,0 +1,192 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# lazy sequence of clips returned by np2bvh.loadMotionSequence()
+#
+# positions are indexed immediately (as views of the loaded / memory-mapped array),
+# while rotations are computed by pos2rot() only when first requested and kept in a LRU cache bounded by bytes.
+#
+
+from collections import OrderedDict
+import numpy as np
+from pos2rotation import pos2rot
+
+
+#
+# LRU cache of ndarray bounded by the total bytes
+# max_bytes = None: unbounded, 0: nothing is cached
+#
+class LruCache:
+
+    def __init__(self, max_bytes = None):
+    
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+    
+    
+    def __len__(self):
+        return len(self._items)
+    
+    
+    def __contains__(self, key):
+        return key in self._items
+    
+    
+    # returns None on miss
+    def get(self, key):
+    
+        value = self._items.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        
+        self._items.move_to_end(key)
+        self.hits += 1
+        
+        return value
+    
+    
+    def put(self, key, value):
+    
+        if key in self._items:
+            self.current_bytes -= self._items.pop(key).nbytes
+        
+        # an item larger than the budget is not cached at all
+        if self.max_bytes is not None and value.nbytes > self.max_bytes:
+            return
+        
+        self._items[key] = value
+        self.current_bytes += value.nbytes
+        
+        # evict least-recently-used items
+        while self.max_bytes is not None and self.current_bytes > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.current_bytes -= evicted.nbytes
+            self.evictions += 1
+    
+    
+    def clear(self):
+    
+        self._items.clear()
+        self.current_bytes = 0
+    
+    
+    def stats(self):
+        return dict(
+            hits = self.hits,
+            misses = self.misses,
+            evictions = self.evictions,
+            items = len(self._items),
+            bytes = self.current_bytes
+        )
+
+
+
+#
+# sequence of clips: seq[i] -> positions ndarray(frames, joints, 3), seq.rotations[i] -> rotations ndarray(frames, joints, 3)
+# data_pos: ndarray(N, frames, joints, 3)
+# clip_indices: indices of the clips in the input file (None: 0, 1, ..., N-1)
+# cache_bytes: memory budget of the rotation-cache (None: unbounded, 0: no cache)
+# rotation_cache: rotation_cache.RotationCache to persist rotations on disk across runs (None: not used)
+#
+class MotionSequence:
+
+    def __init__(
+        self,
+        data_pos,
+        rotation_order = "XYZ",
+        clip_indices = None,
+        cache_bytes = 256 * 2**20,
+        rotation_cache = None
+        ):
+        
+        assert(data_pos.ndim == 4 and data_pos.shape[-1] == 3)
+        
+        self.positions = data_pos
+        self.rotation_order = rotation_order
+        self.clip_indices = np.arange(data_pos.shape[0]) if clip_indices is None else np.asarray(clip_indices)
+        self.rotations = _RotationSequence(self)
+        self.cache = LruCache(cache_bytes)
+        self.rotation_cache = rotation_cache
+    
+    
+    def __len__(self):
+        return self.positions.shape[0]
+    
+    
+    def __getitem__(self, index):
+    
+        if isinstance(index, slice):
+            return [self.positions[i] for i in range(len(self))[index]]
+        
+        return self.positions[index]
+    
+    
+    def __iter__(self):
+        return iter(self.positions)
+    
+    
+    def __repr__(self):
+        return f"MotionSequence(clips={len(self)}, shape={self.positions.shape[1:]}, rotation_order={self.rotation_order!r}, cache={self.cache.stats()})"
+    
+    
+    # rotations of a clip (computed on the first request)
+    def getRotations(self, index):
+    
+        index = range(len(self))[index] # normalize negative index (and raise IndexError out of range)
+        
+        data_rot = self.cache.get(index)
+        if data_rot is None:
+            data_rot = self._pos2rot(self.positions[index])
+            self.cache.put(index, data_rot)
+        
+        return data_rot
+    
+    
+    # lists of all positions and rotations, whose rotations are computed in one pass (batched) and bypass the LRU cache
+    def toLists(self):
+        return list(self.positions), list(self._pos2rot(self.positions))
+    
+    
+    def _pos2rot(self, data_pos):
+        
+        if self.rotation_cache is not None:
+            return self.rotation_cache.pos2rot(data_pos, self.rotation_order)
+        
+        return pos2rot(data_pos, self.rotation_order)
+
+
+
+# seq.rotations: lazy sequence view of the rotations
+class _RotationSequence:
+
+    def __init__(self, motion_sequence):
+        self._motion_sequence = motion_sequence
+    
+    
+    def __len__(self):
+        return len(self._motion_sequence)
+    
+    
+    def __getitem__(self, index):
+    
+        if isinstance(index, slice):
+            return [self._motion_sequence.getRotations(i) for i in range(len(self))[index]]
+        
+        return self._motion_sequence.getRotations(index)
+    
+    
+    def __iter__(self):
+        return (self._motion_sequence.getRotations(i) for i in range(len(self)))
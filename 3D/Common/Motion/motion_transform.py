@@ -0,0 +1,168 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# coordinate-system and unit transform of motion arrays, shared by the exporters
+#
+# a transform is a 3x3 basis matrix M from the coordinate-system of the motion-data
+# (right-handed, Y-up, meters as HumanML3D) to the one of the output, e.g. basisMatrix(up_axis="Z", scale=100.0).
+# positions are transformed as M @ p, and rotations are conjugated by the orthonormal part of M,
+# so that both stay consistent (mirroring included).
+#
+
+import numpy as np
+from quaternion_util import quatFromEuler, quatToEuler
+
+
+#
+# basis matrix from the motion-data (right-handed, Y-up, meters) to the output
+# up_axis: "Y" or "Z" (Z-up as Blender: Y-up -> Z-up, and the front -Z -> -Y)
+# is_left_coordinate: mirror X (left-handed)
+# scale: unit, e.g. 100.0 for meters -> centimeters
+#
+def basisMatrix(
+    up_axis = "Y",
+    is_left_coordinate = False,
+    scale = 1.0
+    ):
+    
+    if up_axis == "Y":
+        matrix = np.eye(3)
+    elif up_axis == "Z":
+        matrix = np.array([
+            [1.0, 0.0,  0.0],
+            [0.0, 0.0, -1.0],
+            [0.0, 1.0,  0.0]
+        ])
+    else:
+        raise ValueError(f"Unsupported up_axis: {up_axis} (\"Y\" or \"Z\")")
+    
+    if is_left_coordinate:
+        matrix = np.diag([-1.0, 1.0, 1.0]) @ matrix
+    
+    return matrix * scale
+
+
+
+def _isDiagonal(matrix):
+    return not np.any(matrix - np.diag(np.diag(matrix)))
+
+
+
+# orthonormal part of a basis matrix (uniform scale removed), and whether it is not a pure scale
+def _rotationPart(matrix):
+
+    matrix = np.asarray(matrix, dtype=np.float64)
+    orthonormal = matrix / np.cbrt(abs(np.linalg.det(matrix)))
+    
+    return orthonormal, not np.allclose(orthonormal, np.eye(3))
+
+
+
+#
+# transform positions ndarray(..., 3) (e.g. (N, frames, joints, 3) at once) by a basis matrix
+# the input is not modified; it is returned as it is for the identity unless copy = True
+# out: output array (may be the input itself to transform in place)
+# diagonal matrices (scale, mirror) are applied element-wise, so that e.g. the scale to centimeters
+# gives exactly data_pos * 100.0 in the dtype of data_pos
+#
+def transformPositions(
+    data_pos,
+    matrix,
+    out = None,
+    copy = False
+    ):
+    
+    matrix = np.asarray(matrix, dtype=np.float64)
+    data_pos = np.asarray(data_pos)
+    dtype = data_pos.dtype if np.issubdtype(data_pos.dtype, np.floating) else np.float64
+    
+    if out is None and not copy and np.array_equal(matrix, np.eye(3)):
+        return data_pos
+    
+    if _isDiagonal(matrix):
+        return np.multiply(data_pos, np.diag(matrix).astype(dtype), out=out)
+    
+    return np.matmul(data_pos, matrix.T.astype(dtype), out=out)
+
+
+
+#
+# conjugate rotations as quaternions ndarray(..., 4) (x, y, z, w) by a basis matrix: q' = (det(R) * R @ xyz, w)
+# where R is the orthonormal part of the matrix (a mirror flips the handedness of the rotation as well)
+#
+def transformQuaternions(quats, matrix):
+
+    rotation, is_rotated = _rotationPart(matrix)
+    quats = np.asarray(quats, dtype=np.float64)
+    
+    if not is_rotated:
+        return quats
+    
+    out = np.empty(quats.shape)
+    out[..., :3] = np.linalg.det(rotation) * (quats[..., :3] @ rotation.T)
+    out[..., 3] = quats[..., 3]
+    
+    return out
+
+
+
+#
+# conjugate rotations as euler-angles ndarray(..., 3) by a basis matrix
+# rotation_order: order of the angles (the rotation_order given to pos2rot()), the output has the same order
+#
+def transformEulers(
+    angles,
+    matrix,
+    rotation_order = "XYZ",
+    is_degree = True
+    ):
+    
+    if not _rotationPart(matrix)[1]:
+        return angles
+    
+    quats = transformQuaternions(quatFromEuler(angles, rotation_order, is_degree), matrix)
+    
+    return quatToEuler(quats, rotation_order, is_degree)
+
+
+
+#
+# accuracy check against scipy.spatial.transform.Rotation
+#
+if __name__ == "__main__":
+
+    from scipy.spatial.transform import Rotation as R
+    
+    rng = np.random.default_rng(0)
+    rotations = R.random(1000, random_state=0)
+    vectors = rng.normal(size=(1000, 3))
+    
+    for up_axis in ["Y", "Z"]:
+        for is_left_coordinate in [False, True]:
+            matrix = basisMatrix(up_axis, is_left_coordinate, 100.0)
+            
+            # transformed rotation applied to transformed vector = transformed (rotation applied to vector)
+            expected = transformPositions(rotations.apply(vectors), matrix)
+            actual = R.from_quat(transformQuaternions(rotations.as_quat(), matrix)).apply(transformPositions(vectors, matrix))
+            error_quat = np.abs(actual - expected).max()
+            
+            eulers = transformEulers(rotations.as_euler("XYZ", degrees=True), matrix, "XYZ")
+            actual = R.from_euler("XYZ", eulers, degrees=True).apply(transformPositions(vectors, matrix))
+            error_euler = np.abs(actual - expected).max()
+            
+            print(f"up_axis={up_axis} is_left_coordinate={is_left_coordinate!s:<5}: max error = {max(error_quat, error_euler):.2e}")
+            assert max(error_quat, error_euler) < 1e-9
+    
+    data_pos = np.ones((2, 3, 4, 3), dtype=np.float32)
+    assert transformPositions(data_pos, np.eye(3)) is data_pos
+    assert transformPositions(data_pos, basisMatrix(scale=100.0)).dtype == np.float32
+    
+    print("OK")
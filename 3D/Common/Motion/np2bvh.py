@@ -9,37 +9,229 @@
 # limitations under the License.
 
 import os
+import io
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import contextlib
+import gzip
+import lzma
 import numpy as np
 import pickle
+import struct
+import zipfile
+from concurrent.futures import as_completed
+from multiprocessing import shared_memory
 import skeleton_util
-from pos2rotation import pos2rot
+import pos2rotation
+from pos2rotation import pos2rot, pos2rotChunks, pos2rot_version
+from motion_sequence import MotionSequence
+from rotation_cache import RotationCache
+from motion_transform import basisMatrix, transformPositions, transformEulers
 
 
-# load positional motion-data (.npy) as list of ndarray(frames, joints, 3) and compute corresponding rotations
-def loadPositionalMotions(
+#
+# resolve clip_indices (None, slice, range or sequence of int) against num_clips
+# returns: ndarray of clip-indices (None for all clips)
+#
+def resolveClipIndices(num_clips, clip_indices):
+    
+    if clip_indices is None:
+        return None
+    
+    if isinstance(clip_indices, slice):
+        return np.arange(num_clips)[clip_indices]
+    
+    clip_indices = np.asarray(clip_indices, dtype=int).reshape(-1)
+    if np.any(clip_indices >= num_clips) or np.any(clip_indices < -num_clips):
+        raise IndexError(f"clip-indices out of range for {num_clips} clips: {clip_indices.tolist()}")
+    
+    return np.where(clip_indices < 0, clip_indices + num_clips, clip_indices)
+
+
+
+# select clips of ndarray(N, ...) by resolved clip-indices
+# evenly spaced ascending indices are taken as a view (of the memory-mapped file), others are copied
+def _selectClips(data_pos, clip_indices):
+    
+    if clip_indices is None:
+        return data_pos
+    
+    if len(clip_indices) > 0:
+        step = clip_indices[1] - clip_indices[0] if len(clip_indices) > 1 else 1
+        if step > 0 and np.all(np.diff(clip_indices) == step):
+            return data_pos[clip_indices[0]:clip_indices[-1]+1:step]
+    
+    return data_pos[clip_indices]
+
+
+
+# dict{"motion": ndarray(N, joints, 3, frames)} -> ndarray(N, frames, joints, 3)
+def _transposeMotionKey(data_pos):
+    
+    if data_pos.shape[2] == 3:
+        data_pos = np.transpose(data_pos, (0, 3, 1, 2))
+    
+    return data_pos
+
+
+
+#
+# open an array of .npz lazily: memory-mapped for uncompressed (np.savez) members,
+# otherwise only this member is decompressed (np.savez_compressed)
+#
+def _loadNpzMember(filepath, archive, key):
+    
+    info = archive.getinfo(key + ".npy")
+    
+    with archive.open(info) as fp:
+        version = np.lib.format.read_magic(fp)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fp)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fp)
+        header_size = fp.tell()
+    
+    if info.compress_type == zipfile.ZIP_STORED and not dtype.hasobject:
+        # data starts after the local file-header (30 bytes + file-name + extra-field) and the .npy header
+        with open(filepath, "rb") as f:
+            f.seek(info.header_offset)
+            local_header = f.read(30)
+        name_length, extra_length = struct.unpack("<HH", local_header[26:30])
+        offset = info.header_offset + 30 + name_length + extra_length + header_size
+        
+        return np.memmap(filepath, dtype=dtype, mode="r", offset=offset, shape=shape, order="F" if fortran_order else "C")
+    
+    with archive.open(info) as fp:
+        return np.lib.format.read_array(fp)
+
+
+
+#
+# shapes of arrays in .npz without loading them
+#
+def _readNpzShapes(archive):
+    
+    shapes = {}
+    for name in archive.namelist():
+        if not name.endswith(".npy"):
+            continue
+        
+        with archive.open(name) as fp:
+            version = np.lib.format.read_magic(fp)
+            if version == (1, 0):
+                shape, _, _ = np.lib.format.read_array_header_1_0(fp)
+            else:
+                shape, _, _ = np.lib.format.read_array_header_2_0(fp)
+        
+        shapes[name[:-len(".npy")]] = shape
+    
+    return shapes
+
+
+
+#
+# load clips of .npz archive lazily per key
+# key = None: "motion" if exists (same format as the dict of .npy), otherwise all keys in the order of the archive,
+#             each of which holds ndarray(N, frames, joints, 3) or a single clip ndarray(frames, joints, 3)
+#
+def _loadNpzClips(filepath, clip_indices, key):
+    
+    with zipfile.ZipFile(filepath) as archive:
+        shapes = _readNpzShapes(archive)
+        print(f"\"{filepath}\" is opened. Following keys exist:")
+        for name, shape in shapes.items():
+            print(f"{name}: {shape}")
+        
+        if key is None and "motion" in shapes:
+            key = "motion"
+        
+        if key is not None:
+            if key not in shapes:
+                raise KeyError(f"{key} does not exist in {filepath}")
+            
+            data_pos = _loadNpzMember(filepath, archive, key)
+            if key == "motion":
+                data_pos = _transposeMotionKey(data_pos)
+            if data_pos.ndim == 3:
+                data_pos = data_pos[None]
+            
+            clip_indices = resolveClipIndices(data_pos.shape[0], clip_indices)
+            return _selectClips(data_pos, clip_indices), clip_indices
+        
+        if not shapes:
+            raise ValueError(f"\"{filepath}\" has no arrays.")
+        
+        # clip-ranges of each key
+        keys = list(shapes)
+        num_clips_of_keys = [1 if len(shapes[name]) == 3 else shapes[name][0] for name in keys]
+        key_starts = np.concatenate([[0], np.cumsum(num_clips_of_keys)])
+        
+        clip_indices = resolveClipIndices(int(key_starts[-1]), clip_indices)
+        selected = np.arange(key_starts[-1]) if clip_indices is None else clip_indices
+        
+        # only the keys including the selected clips are loaded
+        clips = []
+        for clip_index in selected:
+            key_index = np.searchsorted(key_starts, clip_index, side="right") - 1
+            name = keys[key_index]
+            if clips and clips[-1][0] == name:
+                clips[-1][1].append(clip_index - key_starts[key_index])
+            else:
+                clips.append((name, [clip_index - key_starts[key_index]]))
+        
+        parts = []
+        for name, indices in clips or [(keys[0], [])]:
+            data_pos = _loadNpzMember(filepath, archive, name)
+            if data_pos.ndim == 3:
+                data_pos = data_pos[None]
+            parts.append(_selectClips(data_pos, np.asarray(indices, dtype=int)))
+        
+        if len(set(part.shape[1:] for part in parts)) > 1:
+            raise ValueError(f"Clips of different shapes cannot be loaded at once: {[part.shape for part in parts]}")
+        
+        data_pos = parts[0] if len(parts) == 1 else np.concatenate(parts, axis=0)
+        
+        return data_pos, clip_indices
+
+
+
+#
+# load positional motion-data (.npy/.npz) as ndarray(N, frames, joints, 3)
+# plain-array .npy is memory-mapped and .npz is read lazily per key, so that clips are paged in on demand
+# clip_indices: subset of clips to load (None, slice, range or sequence of int)
+# key: array to load from .npz (default: see _loadNpzClips())
+# return_clip_indices = True: the resolved clip-indices (None for all clips) are also returned
+#
+def loadPositionalArray(
     filepath,
-    rotation_order="XYZ"
+    clip_indices = None,
+    key = None,
+    return_clip_indices = False
     ):
     
     _, ext = os.path.splitext(filepath)
     
     if ext == ".npy":
         
-        motion_data = np.load(filepath, allow_pickle=True)
+        try:
+            motion_data = np.load(filepath, mmap_mode="r")
+        except ValueError: # pickled objects (e.g. dict) cannot be memory-mapped
+            motion_data = np.load(filepath, allow_pickle=True)
         
-        if motion_data.size == 1:
+        if motion_data.size == 1 and motion_data.dtype.hasobject:
             motion_data = motion_data.item()
         
         # dict{"motion", "text", ..."}
         if isinstance(motion_data, dict):
             print(f"\"{filepath}\" is loaded. Following keys exist:")
-            for key in motion_data:
-                print(key)
+            for name in motion_data:
+                print(name)
                 
-            data_pos = motion_data["motion"]
-            
-            if data_pos.shape[2] == 3:
-                data_pos = np.transpose(data_pos, (0, 3, 1, 2))
+            data_pos = _transposeMotionKey(motion_data["motion"])
                 
             print(f"Shape of motion-data: {data_pos.shape}") # ndarray(N, joints, 3, frames)
         
@@ -53,10 +245,12 @@ def loadPositionalMotions(
         else:
             print(motion_data)
             raise ValueError(f"{filepath} is invalid format.")
-            
+        
+        clip_indices = resolveClipIndices(data_pos.shape[0], clip_indices)
+        data_pos = _selectClips(data_pos, clip_indices)
         
     elif ext == ".npz":
-        raise NotImplementedError(f"Invalid file format: {filepath}")
+        data_pos, clip_indices = _loadNpzClips(filepath, clip_indices, key)
     
     else:
         raise ValueError(f"Invalid file format: {filepath}")
@@ -65,21 +259,99 @@ def loadPositionalMotions(
     assert(len(data_pos.shape) == 4)
     assert(data_pos.shape[3] == 3) # ndarray(N, frames, joints, 3)
     
-    data_pos_list = []
-    data_rot_list = []
+    if return_clip_indices:
+        return data_pos, clip_indices
+    
+    return data_pos
+
+
+
+# load positional motion-data (.npy/.npz) as a lazy sequence of clips (motion_sequence.MotionSequence):
+#   seq[i]           -> positions ndarray(frames, joints, 3), without any computation
+#   seq.rotations[i] -> rotations ndarray(frames, joints, 3), computed on the first request and kept in a LRU cache
+#   seq.toLists()    -> (list of positions, list of rotations) whose rotations are computed in one pass
+# clip_indices, key: see loadPositionalArray()
+# cache_bytes: memory budget of the rotation-cache (None: unbounded, 0: no cache)
+# cache_dir: directory of the persistent rotation-cache (rotation_cache.RotationCache) shared across runs (None: not used)
+def loadMotionSequence(
+    filepath,
+    rotation_order="XYZ",
+    clip_indices=None,
+    key=None,
+    cache_bytes=256 * 2**20,
+    cache_dir=None
+    ):
     
-    for i in range(data_pos.shape[0]):
-        data_rot = pos2rot(data_pos[i], rotation_order)
-        data_pos_list.append(data_pos[i])
-        data_rot_list.append(data_rot)
+    data_pos, clip_indices = loadPositionalArray(filepath, clip_indices, key, return_clip_indices=True)
+    rotation_cache = RotationCache(cache_dir) if cache_dir is not None else None
     
-    return data_pos_list, data_rot_list
+    return MotionSequence(data_pos, rotation_order, clip_indices, cache_bytes, rotation_cache)
 
 
 
+# load positional motion-data (.npy/.npz) as list of ndarray(frames, joints, 3) and compute corresponding rotations
+# returns: (list of positions, list of rotations), i.e. loadMotionSequence(...).toLists()
+def loadPositionalMotions(
+    filepath,
+    rotation_order="XYZ",
+    clip_indices=None,
+    key=None,
+    cache_dir=None
+    ):
+    
+    return loadMotionSequence(filepath, rotation_order, clip_indices, key, 0, cache_dir).toLists()
 
 
 
+# suffix of the BVH files written by np2bvh() for each compression
+bvh_suffixes = {None: ".bvh", "gzip": ".bvh.gz", "xz": ".bvh.xz"}
+
+
+
+#
+# open a BVH file to write text, streamed through a compressor
+# compression: None, "gzip" or "xz" ("auto": inferred from the suffix of filename, i.e. ".gz" or ".xz")
+# compresslevel: level of gzip (1-9, default 6) or preset of xz (0-9, default 6)
+#
+def _openBvhForWrite(filename, compression = "auto", compresslevel = None):
+    
+    if compression == "auto":
+        compression = {".gz": "gzip", ".xz": "xz"}.get(os.path.splitext(filename)[1])
+    
+    if compression is None:
+        return open(filename, 'w')
+    elif compression == "gzip":
+        # mtime = 0: the same motion gives the same bytes (no timestamp in the gzip-header)
+        return io.TextIOWrapper(gzip.GzipFile(filename, 'wb', compresslevel=6 if compresslevel is None else compresslevel, mtime=0))
+    elif compression == "xz":
+        return lzma.open(filename, 'wt', preset=6 if compresslevel is None else compresslevel)
+    
+    raise ValueError(f"Unsupported compression: {compression} (None, \"gzip\" or \"xz\")")
+
+
+
+#
+# is_left_coordinate mirrors only the OFFSETs (not the motion-channels), while transform is applied to both,
+# so a mirroring transform (negative determinant) with is_left_coordinate would cancel the mirror on the OFFSETs alone
+# (mirror the output with transform = basisMatrix(..., is_left_coordinate=True) and is_left_coordinate = False instead)
+#
+def _checkLeftCoordinate(transform, is_left_coordinate):
+    
+    if is_left_coordinate and transform is not None and np.linalg.det(np.asarray(transform, dtype=np.float64)) < 0:
+        raise ValueError("is_left_coordinate cannot be combined with a mirroring transform (negative determinant).")
+
+
+
+#
+# export motion to BVH file
+# data_rot: ndarray(frames, joints, 3), or iterable of ndarray(chunk, joints, 3) (e.g. pos2rotChunks()) to stream long motions
+# data_pos is not modified (it can be a read-only memory-mapped array)
+# compression: None, "gzip", "xz" or "auto" (by the suffix of filename), streamed while writing (see _openBvhForWrite())
+# position_precision, rotation_precision: decimals of the position- and rotation-channels
+# transform: basis matrix of motion_transform applied to positions and (conjugated) rotations
+#            (None: meters -> centimeters, i.e. basisMatrix(scale=100.0)), euler_order: rotation_order of data_rot
+#            a mirroring transform cannot be combined with is_left_coordinate (see _checkLeftCoordinate())
+#
 def exportToBvh(
     filename,
     data_pos,
@@ -90,98 +362,217 @@ def exportToBvh(
     outputRotation,
     frame_time,
     is_left_coordinate,
-    base_indent="    "
+    base_indent="    ",
+    compression = "auto",
+    position_precision = 6,
+    rotation_precision = 6,
+    compresslevel = None,
+    transform = None,
+    euler_order = "XYZ"
     ):
     
     assert(outputPosition or outputRotation)
     
     frames, joints, _ = data_pos.shape
-    joint_chains, junction_nodes = skeleton_util.getJointChains(joints)
     
-    data_pos *= 100.0 # m -> cm
+    transform = basisMatrix(scale=100.0) if transform is None else np.asarray(transform, dtype=np.float64) # default: m -> cm
+    _checkLeftCoordinate(transform, is_left_coordinate)
+    initial_pos = transformPositions(data_pos[0], transform, copy=True)
     
-    with open(filename, 'w') as f:
+    template = getHierarchyTemplate(joints, joint_names, outputPosition, outputRotation, rotation_order, base_indent)
+    
+    with _openBvhForWrite(filename, compression, compresslevel) as f:
         
         #
-        # Write BVH hierarchy
+        # Write BVH hierarchy (the compiled template filled with the OFFSETs of this clip)
         #
         
-        f.write("HIERARCHY\n")
-        f.write(f"ROOT {joint_names[0]}\n") # joint[0] must be ROOT
-        f.write("{\n")
+        f.write(template.fill(initial_pos, is_left_coordinate))
         
-        # set root-position as OFFSET from 1st-frame
-        root_pos = data_pos[0, 0]
-        f.write(f"{base_indent}OFFSET {root_pos[0]} {root_pos[1]} {root_pos[2]}\n")
-        f.write(f"{base_indent}CHANNELS 6 Xposition Yposition Zposition {rotation_order[0]}rotation {rotation_order[1]}rotation {rotation_order[2]}rotation\n\n")
         
+        #
+        # Write motion data
+        #
+        
+        f.write("\nMOTION\n")
+        f.write(f"Frames: {frames}\n")
+        f.write(f"Frame Time: {frame_time:.6f}\n")
+        
+        num_channels = template.num_channels
+        rest_pos_values = (initial_pos[template.rest_pos_joints] - initial_pos[template.rest_pos_parents]).ravel()
+        
+        print(f"{filename}: {num_channels} motion-data of {len(template.joint_order)} joints per frame (totally {frames} frames) are being exported.")
+        
+        # every value is formatted at once per block of frames, with the precision of its channel-type
+        block_frames = 2048
+        column_formats = np.full(num_channels, f"%.{position_precision}f", dtype=object)
+        column_formats[template.rot_columns] = f"%.{rotation_precision}f"
+        line_format = " ".join(column_formats) + "\n"
+        
+        rot_chunks = [data_rot] if isinstance(data_rot, np.ndarray) else data_rot
+        
+        frame_start = 0
+        for rot_chunk in rot_chunks:
+            for block_start in range(0, rot_chunk.shape[0], block_frames):
+                rot_block = rot_chunk[block_start:block_start+block_frames]
+                rows = rot_block.shape[0]
+                
+                # positions with the zero-joint appended as the parent of root
+                pos_block = np.zeros((rows, joints + 1, 3), dtype=initial_pos.dtype)
+                pos_block[:, :joints] = transformPositions(data_pos[frame_start:frame_start+rows], transform)
+                rot_block = transformEulers(rot_block, transform, euler_order)
+                
+                channels = np.empty((rows, num_channels))
+                channels[:, template.frame_pos_columns] = (pos_block[:, template.frame_pos_joints] - pos_block[:, template.frame_pos_parents]).reshape(rows, -1)
+                channels[:, template.rest_pos_columns] = rest_pos_values
+                channels[:, template.rot_columns] = rot_block[:, template.rot_joints][:, :, template.rotation_order_index].reshape(rows, -1)
+                
+                f.write((line_format * rows) % tuple(channels.ravel().tolist()))
+                
+                frame_start += rows
+        
+        assert(frame_start == frames)
+
+
+
+#
+# BVH hierarchy compiled once per skeleton and channel configuration
+#
+# text:         HIERARCHY section with "%s" in place of each OFFSET value (root first, then joint_order[1:])
+# joint_order:  joints in the order of the hierarchy (and of the channels), parent_order: their parents (-1 for root)
+# layout of the channels in a line, following joint_order:
+# - frame_pos_*: positions of each frame relative to the parent (root: absolute, whose parent is the zero-joint "joints")
+# - rest_pos_*:  relative-positions of the rest-pose (constant over frames)
+# - rot_*:       rotations in rotation_order
+#
+class HierarchyTemplate:
+    
+    def __init__(
+        self,
+        joints,
+        joint_names,
+        outputPosition,
+        outputRotation,
+        rotation_order,
+        base_indent
+        ):
+        
+        joint_chains = skeleton_util.getSkeleton(joints).joint_chains
+        escape = lambda text: text.replace("%", "%%")
         
         # write hierarchy of each joint and save the order as list
+        text = io.StringIO()
+        text.write("HIERARCHY\n")
+        text.write(f"ROOT {escape(joint_names[0])}\n") # joint[0] must be ROOT
+        text.write("{\n")
+        
+        # set root-position as OFFSET from 1st-frame
+        text.write(f"{escape(base_indent)}OFFSET %s %s %s\n")
+        text.write(f"{escape(base_indent)}CHANNELS 6 Xposition Yposition Zposition {rotation_order[0]}rotation {rotation_order[1]}rotation {rotation_order[2]}rotation\n\n")
+        
         joint_order = [0]
         parent_order = [-1]
         _writeChildChains(
-            f,
-            data_pos[0],
+            text,
             0, # parent_index (root)
             1, # indent_depth
             joint_chains,
-            joint_names,
+            [escape(name) for name in joint_names],
             joint_order,
             parent_order,
             outputPosition,
             outputRotation,
             rotation_order,
-            base_indent,
-            is_left_coordinate
+            escape(base_indent)
         )
         
-        f.write("}\n")
+        text.write("}\n")
         
+        self.text = text.getvalue()
+        self.joint_order = np.array(joint_order)
+        self.parent_order = np.array(parent_order)
+        self.rotation_order_index = [ord(axis) - ord('X') for axis in rotation_order]
         
-        #
-        # Write motion data
-        #
+        frame_pos_columns, frame_pos_joints, frame_pos_parents = [], [], []
+        rest_pos_columns, rest_pos_joints, rest_pos_parents = [], [], []
+        rot_columns, rot_joints = [], []
         
-        f.write("\nMOTION\n")
-        f.write(f"Frames: {frames}\n")
-        f.write(f"Frame Time: {frame_time:.6f}\n")
+        num_channels = 0
+        for i, j in enumerate(joint_order):
+            if j == 0 or outputPosition:
+                if j == 0 or not outputRotation: # output (relative-)position of each frame
+                    frame_pos_columns.append(num_channels)
+                    frame_pos_joints.append(j)
+                    frame_pos_parents.append(joints if j == 0 else parent_order[i])
+                else: # output relative-position of the rest-pose
+                    rest_pos_columns.append(num_channels)
+                    rest_pos_joints.append(j)
+                    rest_pos_parents.append(parent_order[i])
+                num_channels += 3
+            
+            if j == 0 or outputRotation:
+                rot_columns.append(num_channels)
+                rot_joints.append(j)
+                num_channels += 3
         
-        rotation_order_index = [
-            ord(rotation_order[0]) - ord('X'),
-            ord(rotation_order[1]) - ord('X'),
-            ord(rotation_order[2]) - ord('X')
-        ]
-        
-        for f_idx in range(frames):
-            line = []
-            for i, j in enumerate(joint_order):
-                    
-                if j == 0 or outputPosition:
-                    if j == 0:
-                        pos = data_pos[f_idx, j]
-                    else:
-                        if not outputRotation: # output relative-position of each frame
-                            pos = data_pos[f_idx, j] - data_pos[f_idx, parent_order[i]]
-                        else: # output relative-position of the rest-pose
-                            pos = data_pos[0, j] - data_pos[0, parent_order[i]]
-                            
-                    line.extend([f"{p:.6f}" for p in pos])
-                
-                if j == 0 or outputRotation:
-                    for rot_order in rotation_order_index:
-                        rot = data_rot[f_idx, j, rot_order]
-                        line.append(f"{rot:.6f}")
-                
-            if f_idx == 0:
-                print(f"{filename}: {len(line)} motion-data of {len(joint_order)} joints per frame (totally {frames} frames) are being exported.")
-                
-            f.write(" ".join(line) + "\n")
+        def _channelIndices(columns):
+            return (np.asarray(columns, dtype=int)[:, None] + np.arange(3)).ravel()
+        
+        self.num_channels = num_channels
+        self.frame_pos_columns = _channelIndices(frame_pos_columns)
+        self.frame_pos_joints = np.asarray(frame_pos_joints, dtype=int)
+        self.frame_pos_parents = np.asarray(frame_pos_parents, dtype=int)
+        self.rest_pos_columns = _channelIndices(rest_pos_columns)
+        self.rest_pos_joints = np.asarray(rest_pos_joints, dtype=int)
+        self.rest_pos_parents = np.asarray(rest_pos_parents, dtype=int)
+        self.rot_columns = _channelIndices(rot_columns)
+        self.rot_joints = np.asarray(rot_joints, dtype=int)
+    
+    
+    #
+    # HIERARCHY section of a clip
+    # initial_pos: ndarray(joints, 3) positions of the 1st-frame (in the output unit), OFFSETs are relative to the parents
+    # is_left_coordinate: OFFSETs of joints (except root) are mirrored
+    #
+    def fill(self, initial_pos, is_left_coordinate):
+        
+        offsets = initial_pos[self.joint_order[1:]] - initial_pos[self.parent_order[1:]]
+        if is_left_coordinate:
+            offsets = transformPositions(offsets, basisMatrix(is_left_coordinate=True))
+        
+        # format() of each scalar gives the same text as f"{value}"
+        values = [format(value) for value in list(initial_pos[0]) + list(offsets.ravel())]
+        
+        return self.text % tuple(values)
+
 
 
+_hierarchy_templates = {}
 
+# cached HierarchyTemplate of (joint count, joint names, channel flags, rotation order, indent)
+def getHierarchyTemplate(
+    joints,
+    joint_names,
+    outputPosition,
+    outputRotation,
+    rotation_order,
+    base_indent = "    "
+    ):
+    
+    key = (joints, tuple(joint_names), bool(outputPosition), bool(outputRotation), rotation_order, base_indent)
+    
+    template = _hierarchy_templates.get(key)
+    if template is None:
+        template = HierarchyTemplate(joints, joint_names, outputPosition, outputRotation, rotation_order, base_indent)
+        _hierarchy_templates[key] = template
+    
+    return template
+
+
+
+# write the hierarchy of the chains from parent_index recursively (OFFSETs are left as "%s" of HierarchyTemplate)
 def _writeChildChains(
     file,
-    initial_global_positions,
     parent_index,
     indent_depth,
     joint_chains,
@@ -191,8 +582,7 @@ def _writeChildChains(
     outputPosition,
     outputRotation,
     rotation_order,
-    base_indent,
-    is_left_coordinate
+    base_indent
 ):
     for i, chain in enumerate(joint_chains):
         
@@ -211,11 +601,8 @@ def _writeChildChains(
             file.write(f"{indent}{{\n")
             
             # set joint-position as OFFSET from 1st-frame
-            joint_pos = initial_global_positions[joint_idx] - initial_global_positions[parent_idx]
-            if is_left_coordinate:
-                joint_pos[...,0] *= -1
             indent = base_indent * (indent_depth + j)
-            file.write(f"{indent}OFFSET {joint_pos[0]} {joint_pos[1]} {joint_pos[2]}\n")
+            file.write(f"{indent}OFFSET %s %s %s\n")
             
             if outputPosition and outputRotation:
                 file.write(f"{indent}CHANNELS 6 Xposition Yposition Zposition {rotation_order[0]}rotation {rotation_order[1]}rotation {rotation_order[2]}rotation\n\n")
@@ -227,7 +614,6 @@ def _writeChildChains(
             # write hierarchy recursively
             _writeChildChains(
                 file,
-                initial_global_positions,
                 joint_idx, # parent_index
                 indent_depth + j, # indent_depth
                 joint_chains[i+1:],
@@ -237,8 +623,7 @@ def _writeChildChains(
                 outputPosition,
                 outputRotation,
                 rotation_order,
-                base_indent,
-                is_left_coordinate
+                base_indent
             )
             
         
@@ -260,68 +645,628 @@ def _writeChildChains(
 
 
 
+#
+# attach ndarray placed on shared-memory by the parent process (without copy)
+#
+def _attachSharedArray(shm_name, shape, dtype):
+    
+    # the parent process owns (and unlinks) the shared-memory;
+    # pool-workers share the resource-tracker of the parent, so attaching here does not register it twice
+    shm = shared_memory.SharedMemory(name=shm_name)
+    
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+
+#
+# initializer of the pool-workers: applies the rotation backend chosen by the parent for the whole input,
+# and loads the numba kernels once per worker (instead of in the first task of each worker)
+#
+def _initWorker(rotation_backend):
+    
+    pos2rotation.setRotationBackend(rotation_backend)
+    
+    if rotation_backend == "numba":
+        pos2rotation.quaternion_jit._loadKernels()
+
+
+
+# rotation backend of the pool-workers converting num_rotations joint-rotations (clips x frames x joints) in total
+def _workerRotationBackend(num_rotations):
+    
+    return "numba" if pos2rotation._useNumba(num_rotations) else "numpy"
+
+
+
+# rotations of clips ndarray(N, frames, joints, 3), through the persistent cache if given
+def _computeRotations(data_pos, rotation_cache):
+    
+    if rotation_cache is not None:
+        return rotation_cache.pos2rot(data_pos)
+    
+    return pos2rot(data_pos)
+
+
+
+#
+# worker of np2bvh(jobs > 1): convert clips[clip_start:clip_end] on shared-memory and export them
+# clip_numbers: numbers of the clips in the input file, used as the output names
+# returns: (output paths, statistics of the rotation-cache)
+#
+def _convertClipsWorker(
+    shm_name,
+    shape,
+    dtype,
+    clip_start,
+    clip_end,
+    clip_numbers,
+    output_bvh_dir_path,
+    export_options,
+    chunk_frames = None,
+    cache_dir = None,
+    cache_max_bytes = None
+    ):
+    
+    shm, data_pos_all = _attachSharedArray(shm_name, shape, dtype)
+    rotation_cache = RotationCache(cache_dir, cache_max_bytes) if cache_dir is not None else None
+    data_pos = data_rot = None
+    
+    try:
+        data_pos = data_pos_all[clip_start:clip_end]
+        data_rot = _computeRotations(data_pos, rotation_cache) if chunk_frames is None else None
+        
+        output_paths = []
+        for i in range(clip_end - clip_start):
+            output_path = f"{output_bvh_dir_path}/{clip_numbers[i]:03d}{bvh_suffixes[export_options['compression']]}"
+            exportToBvh(
+                output_path,
+                data_pos[i],
+                data_rot[i] if chunk_frames is None else pos2rotChunks(data_pos[i], chunk_frames=chunk_frames),
+                skeleton_util.getSkeleton(shape[2]).joint_names,
+                **export_options
+            )
+            output_paths.append(output_path)
+        
+    finally:
+        # release views before closing the shared-memory (also on errors, so that close() does not hide them)
+        del data_pos, data_pos_all, data_rot
+        shm.close()
+    
+    return output_paths, rotation_cache.stats() if rotation_cache is not None else None
+
+
+
+#
+# convert motion-data (.npy/.npz) to BVH files ("000.bvh", "001.bvh", ... numbered by the clip-index in the input)
+# jobs > 1: clips are distributed to a process-pool through shared-memory
+# chunk_frames: rotations are computed and written chunk by chunk (for very long takes)
+# clip_indices: subset of clips to convert (None, slice, range or sequence of int), key: array of .npz
+# cache_dir: directory of the persistent rotation-cache (shared by runs and workers, limited to cache_max_bytes)
+#            rotations are computed only for the clips missing in the cache (not used with chunk_frames)
+# compression: None, "gzip" (".bvh.gz") or "xz" (".bvh.xz"), position_precision / rotation_precision: decimals of the channels
+# transform: basis matrix of the output (see motion_transform.basisMatrix(), None: Y-up centimeters)
+#
 def np2bvh(
     input_np_path,
     output_bvh_dir_path,
     fps = 20,
     outputPosition = False,
     outputRotation = True,
-    output_rotation_order = "ZYX"
+    output_rotation_order = "ZYX",
+    is_left_coordinate = False,
+    jobs = 1,
+    chunk_frames = None,
+    clip_indices = None,
+    key = None,
+    cache_dir = None,
+    cache_max_bytes = 2**30,
+    compression = None,
+    position_precision = 6,
+    rotation_precision = 6,
+    transform = None
 ):
-
-    data_pos_list, data_rot_list = loadPositionalMotions(input_np_path)
     
     os.makedirs(output_bvh_dir_path, exist_ok=True)
     
-    for i, data_pos in enumerate(data_pos_list):
-        
-        exportToBvh(
-            f"{output_bvh_dir_path}/{i:03d}.bvh",
-            data_pos,
-            data_rot_list[i],
-            skeleton_util.joint_names_smpl[:data_pos.shape[1]],
-            rotation_order = output_rotation_order,
-            outputPosition = outputPosition,
-            outputRotation = outputRotation,
-            frame_time=1.0/fps
-        )
+    export_options = dict(
+        rotation_order = output_rotation_order,
+        outputPosition = outputPosition,
+        outputRotation = outputRotation,
+        frame_time = 1.0/fps,
+        is_left_coordinate = is_left_coordinate,
+        compression = compression,
+        position_precision = position_precision,
+        rotation_precision = rotation_precision,
+        transform = None if transform is None else np.asarray(transform, dtype=np.float64).tolist()
+    )
+    _checkLeftCoordinate(transform, is_left_coordinate)
+    
+    data_pos, clip_indices = loadPositionalArray(input_np_path, clip_indices, key, return_clip_indices=True)
+    clip_numbers = list(range(data_pos.shape[0])) if clip_indices is None else clip_indices.tolist()
+    
+    if jobs <= 1:
+        rotation_cache = RotationCache(cache_dir, cache_max_bytes) if cache_dir is not None else None
+        data_rot = _computeRotations(data_pos, rotation_cache) if chunk_frames is None else None # ndarray(N, frames, joints, 3)
+        
+        output_paths = []
+        for i, clip_number in enumerate(clip_numbers):
+            output_path = f"{output_bvh_dir_path}/{clip_number:03d}{bvh_suffixes[export_options['compression']]}"
+            exportToBvh(
+                output_path,
+                data_pos[i],
+                data_rot[i] if chunk_frames is None else pos2rotChunks(data_pos[i], chunk_frames=chunk_frames),
+                skeleton_util.getSkeleton(data_pos.shape[2]).joint_names,
+                **export_options
+            )
+            output_paths.append(output_path)
+        
+        if rotation_cache is not None:
+            _printCacheStats(rotation_cache.stats())
+        
+        return output_paths
+    
+    
+    shape, dtype = data_pos.shape, data_pos.dtype
+    num_clips = shape[0]
+    
+    from concurrent.futures import ProcessPoolExecutor # the process-pool is imported only when it is used
+    
+    # place positions on shared-memory so that workers do not receive pickled copies
+    shm = shared_memory.SharedMemory(create=True, size=max(data_pos.nbytes, 1))
+    
+    try:
+        shared_data_pos = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        shared_data_pos[...] = data_pos
+        del shared_data_pos, data_pos
+        
+        # split clips into contiguous ranges (several ranges per worker to balance the load)
+        num_ranges = min(num_clips, jobs * 4)
+        boundaries = np.linspace(0, num_clips, num_ranges + 1).astype(int)
+        
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_initWorker,
+            initargs=(_workerRotationBackend(num_clips * shape[1] * shape[2]),)
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _convertClipsWorker,
+                    shm.name,
+                    shape,
+                    dtype,
+                    int(clip_start),
+                    int(clip_end),
+                    clip_numbers[clip_start:clip_end],
+                    output_bvh_dir_path,
+                    export_options,
+                    chunk_frames,
+                    cache_dir,
+                    cache_max_bytes
+                )
+                for clip_start, clip_end in zip(boundaries[:-1], boundaries[1:])
+            ]
+            
+            # collect in the order of clips (not in the order of completion)
+            output_paths = []
+            cache_stats = []
+            for future in futures:
+                worker_output_paths, worker_cache_stats = future.result()
+                output_paths.extend(worker_output_paths)
+                cache_stats.append(worker_cache_stats)
+        
+        cache_stats = [stats for stats in cache_stats if stats is not None]
+        if cache_stats:
+            _printCacheStats({name: sum(stats[name] for stats in cache_stats) for name in cache_stats[0]})
+        
+    finally:
+        shm.close()
+        shm.unlink()
+    
+    return output_paths
+
+
+
+#
+# batch conversion of many files with a manifest (skip unchanged outputs, resume interrupted batches)
+#
+# manifest: JSON-lines file appended one line per converted clip (so that an interrupted batch keeps its progress)
+#   {"output": path, "input": path, "clip": index, "input_hash": hash of the clip positions, "options": {...}, "size": bytes}
+#   an output is skipped when the latest line of it has the same input_hash and options, and the file still has that size
+#   failures are recorded as {"output": path (the output directory for an input which cannot be loaded), "input": path,
+#   "error": message}, which are retried by the next run
+#
+
+# hash of the positions of a clip ndarray(frames, joints, 3)
+def _hashClip(data_pos):
+
+    data_pos = np.ascontiguousarray(data_pos)
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(f"{data_pos.dtype.str}|{data_pos.shape}|".encode())
+    hasher.update(memoryview(data_pos).cast("B"))
+    
+    return hasher.hexdigest()
+
+
+
+def _readManifest(manifest_path):
+
+    entries = {}
+    if not os.path.exists(manifest_path):
+        return entries
+    
+    with open(manifest_path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError: # line truncated by an interruption
+                continue
+            entries[entry["output"]] = entry
+    
+    return entries
+
+
+
+def _isUpToDate(entry, input_hash, options):
+
+    if entry is None or entry.get("input_hash") != input_hash or entry.get("options") != options:
+        return False
+    
+    try:
+        return os.path.getsize(entry["output"]) == entry["size"]
+    except FileNotFoundError:
+        return False
+
+
+
+# expand paths and glob patterns into the sorted list of existing .npy/.npz files
+def expandInputPaths(patterns):
+
+    input_paths = []
+    for pattern in patterns:
+        matches = glob.glob(pattern, recursive=True) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if os.path.splitext(path)[1] not in (".npy", ".npz"):
+                continue
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+            input_paths.append(os.path.normpath(path))
+    
+    return sorted(set(input_paths))
+
+
+
+#
+# worker of np2bvhBatch(): load a file and hash its clips (so that the parent does not read every input serially)
+# returns: (clip_numbers, input_hashes, is_mapped, joint-rotations per clip)
+#
+def _scanFileWorker(input_path, key, clip_indices, verbose):
+    
+    with contextlib.redirect_stdout(sys.stdout if verbose else io.StringIO()):
+        data_pos, selected = loadPositionalArray(input_path, clip_indices, key, return_clip_indices=True)
+    
+    clip_numbers = list(range(data_pos.shape[0])) if selected is None else selected.tolist()
+    input_hashes = [_hashClip(data_pos[i]) for i in range(len(clip_numbers))]
+    is_mapped = isinstance(data_pos, np.memmap) or isinstance(getattr(data_pos, "base", None), np.memmap)
+    
+    return clip_numbers, input_hashes, is_mapped, data_pos.shape[1] * data_pos.shape[2]
+
+
+
+#
+# worker of np2bvhBatch(): convert clips of a file, which are loaded by the worker itself (memory-mapped when possible)
+# returns: list of (clip_number, output_path)
+#
+def _convertFileClipsWorker(
+    input_path,
+    key,
+    clip_numbers,
+    output_bvh_dir_path,
+    export_options,
+    chunk_frames,
+    cache_dir,
+    cache_max_bytes,
+    verbose
+    ):
+    
+    with contextlib.redirect_stdout(sys.stdout if verbose else io.StringIO()):
+        data_pos = loadPositionalArray(input_path, clip_numbers, key)
+        rotation_cache = RotationCache(cache_dir, cache_max_bytes) if cache_dir is not None else None
+        data_rot = _computeRotations(data_pos, rotation_cache) if chunk_frames is None else None
+        
+        results = []
+        for i, clip_number in enumerate(clip_numbers):
+            output_path = f"{output_bvh_dir_path}/{clip_number:03d}{bvh_suffixes[export_options['compression']]}"
+            exportToBvh(
+                output_path,
+                data_pos[i],
+                data_rot[i] if chunk_frames is None else pos2rotChunks(data_pos[i], chunk_frames=chunk_frames),
+                skeleton_util.getSkeleton(data_pos.shape[2]).joint_names,
+                **export_options
+            )
+            results.append((clip_number, output_path))
+    
+    return results
+
+
+
+#
+# convert many motion-files (.npy/.npz) to BVH files "<output_root>/<name of input>/000.bvh", ...
+# work is split into tasks of clips_per_task clips, which are processed by jobs worker-processes
+# manifest_path: JSON-lines manifest (default: "<output_root>/manifest.jsonl"), force = True: ignore the manifest
+# inputs which cannot be loaded are reported and recorded as failed, and the batch goes on with the other inputs
+# returns: dict(converted, skipped, failed) numbers of clips, and failed_inputs: number of inputs which cannot be loaded
+#
+def np2bvhBatch(
+    input_paths,
+    output_root,
+    fps = 20,
+    outputPosition = False,
+    outputRotation = True,
+    output_rotation_order = "ZYX",
+    is_left_coordinate = False,
+    jobs = 1,
+    chunk_frames = None,
+    clip_indices = None,
+    key = None,
+    cache_dir = None,
+    cache_max_bytes = 2**30,
+    compression = None,
+    position_precision = 6,
+    rotation_precision = 6,
+    transform = None,
+    manifest_path = None,
+    force = False,
+    clips_per_task = 64,
+    verbose = False
+):
+
+    export_options = dict(
+        rotation_order = output_rotation_order,
+        outputPosition = outputPosition,
+        outputRotation = outputRotation,
+        frame_time = 1.0/fps,
+        is_left_coordinate = is_left_coordinate,
+        compression = compression,
+        position_precision = position_precision,
+        rotation_precision = rotation_precision,
+        transform = None if transform is None else np.asarray(transform, dtype=np.float64).tolist()
+    )
+    _checkLeftCoordinate(transform, is_left_coordinate)
+    
+    # options which change the output (recorded in the manifest)
+    manifest_options = dict(export_options, key=key, pos2rot_version=pos2rot_version)
+    
+    os.makedirs(output_root, exist_ok=True)
+    manifest_path = manifest_path or os.path.join(output_root, "manifest.jsonl")
+    manifest = {} if force else _readManifest(manifest_path)
+    
+    names = [os.path.splitext(os.path.basename(input_path))[0] for input_path in input_paths]
+    if len(set(names)) != len(names):
+        raise ValueError("Input files must have different names, since they are converted into \"<output_root>/<name>/\".")
+    
+    
+    # find clips to convert (inputs are loaded and hashed by the workers)
+    tasks = []
+    clip_hashes = {}
+    num_skipped = 0
+    num_failed = 0
+    num_failed_inputs = 0
+    num_rotations = 0
+    
+    def recordFailure(manifest_file, output_path, input_path, e):
+        manifest_file.write(json.dumps(dict(output=output_path, input=input_path, error=repr(e))) + "\n")
+    
+    with open(manifest_path, "a") as manifest_file:
+        
+        if jobs > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=jobs) as scan_executor:
+                scans = [scan_executor.submit(_scanFileWorker, input_path, key, clip_indices, verbose) for input_path in input_paths]
+        else:
+            scans = [_ImmediateResult(_scanFileWorker, input_path, key, clip_indices, verbose) for input_path in input_paths]
+        
+        for input_path, name, scan in zip(input_paths, names, scans):
+            output_bvh_dir_path = os.path.join(output_root, name)
+            
+            try:
+                clip_numbers, input_hashes, is_mapped, rotations_per_clip = scan.result()
+            except Exception as e:
+                num_failed_inputs += 1
+                recordFailure(manifest_file, output_bvh_dir_path, input_path, e)
+                print(f"Failed to load \"{input_path}\": {e!r}")
+                continue
+            
+            os.makedirs(output_bvh_dir_path, exist_ok=True)
+            
+            pending = []
+            for clip_number, input_hash in zip(clip_numbers, input_hashes):
+                output_path = f"{output_bvh_dir_path}/{clip_number:03d}{bvh_suffixes[export_options['compression']]}"
+                clip_hashes[output_path] = (input_path, clip_number, input_hash)
+                
+                if _isUpToDate(manifest.get(output_path), input_hash, manifest_options):
+                    num_skipped += 1
+                else:
+                    pending.append(clip_number)
+            
+            # inputs which cannot be memory-mapped are loaded once by a single task
+            task_size = clips_per_task if is_mapped else max(len(pending), 1)
+            for start in range(0, len(pending), task_size):
+                tasks.append((input_path, output_bvh_dir_path, pending[start:start+task_size]))
+            num_rotations += len(pending) * rotations_per_clip
         
+        manifest_file.flush()
+        
+        num_total = num_skipped + sum(len(clips) for _, _, clips in tasks)
+        print(f"{len(input_paths)} files, {num_total} clips: {num_skipped} up-to-date (skipped), {num_total - num_skipped} to convert"
+              + (f", {num_failed_inputs} files failed to load" if num_failed_inputs > 0 else ""))
+        
+        
+        # convert and record each finished (or failed) clip in the manifest
+        num_converted = 0
+        start_time = time.perf_counter()
+        
+        def submitTask(executor, input_path, output_bvh_dir_path, clip_numbers):
+            args = (input_path, key, clip_numbers, output_bvh_dir_path, export_options, chunk_frames, cache_dir, cache_max_bytes, verbose)
+            return executor.submit(_convertFileClipsWorker, *args) if executor is not None else _ImmediateResult(_convertFileClipsWorker, *args)
+        
+        if jobs > 1 and tasks:
+            executor = ProcessPoolExecutor(max_workers=jobs, initializer=_initWorker, initargs=(_workerRotationBackend(num_rotations),))
+        else:
+            executor = None
+        
+        try:
+            futures = {}
+            for task in tasks:
+                futures[submitTask(executor, *task)] = task
+            
+            for future in (as_completed(futures) if executor is not None else futures):
+                input_path, output_bvh_dir_path, clip_numbers = futures[future]
+                
+                try:
+                    results = future.result()
+                except Exception as e:
+                    num_failed += len(clip_numbers)
+                    for clip_number in clip_numbers:
+                        output_path = f"{output_bvh_dir_path}/{clip_number:03d}{bvh_suffixes[export_options['compression']]}"
+                        recordFailure(manifest_file, output_path, input_path, e)
+                    manifest_file.flush()
+                    print(f"Failed to convert clips {clip_numbers[0]}-{clip_numbers[-1]} of \"{input_path}\": {e!r}")
+                    continue
+                
+                for clip_number, output_path in results:
+                    _, _, input_hash = clip_hashes[output_path]
+                    entry = dict(
+                        output = output_path,
+                        input = input_path,
+                        clip = clip_number,
+                        input_hash = input_hash,
+                        options = manifest_options,
+                        size = os.path.getsize(output_path)
+                    )
+                    manifest_file.write(json.dumps(entry) + "\n")
+                manifest_file.flush()
+                
+                num_converted += len(results)
+                elapsed = time.perf_counter() - start_time
+                remaining = num_total - num_skipped - num_converted - num_failed
+                eta = elapsed / num_converted * remaining if num_converted > 0 else 0.0
+                print(f"[{num_converted + num_failed}/{num_total - num_skipped}] {num_converted / elapsed:.1f} clips/s, ETA {eta:.0f} s", flush=True)
+        
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
     
+    print(f"converted: {num_converted}, skipped: {num_skipped}, failed: {num_failed}"
+          + (f", failed to load: {num_failed_inputs} files" if num_failed_inputs > 0 else ""))
+    
+    return dict(converted=num_converted, skipped=num_skipped, failed=num_failed, failed_inputs=num_failed_inputs)
+
+
+
+# serial stand-in of concurrent.futures.Future (jobs = 1), which runs the task when its result is requested
+class _ImmediateResult:
+
+    def __init__(self, func, *args):
+        self._func = func
+        self._args = args
+    
+    
+    def result(self):
+        return self._func(*self._args)
+
+
+
+def _printCacheStats(stats):
+    print(f"rotation-cache: {stats['hits']} hits, {stats['misses']} misses, {stats['writes']} writes, {stats['evictions']} evictions")
+
+
+
+# "10:21" -> slice(10, 21), "3,5,7" -> [3, 5, 7]
+def _parseClipIndices(text):
+    
+    if ":" in text:
+        return slice(*[int(value) if value else None for value in text.split(":")])
+    
+    return [int(value) for value in text.split(",")]
+
 
 
 if __name__ == "__main__":
     
-    fps = [
-        20, # HumanML3D
-        24, # 100STYLES
-        30, # Bandai-Namco (non-commercial)
-        60,
-       120  # Bandai-Namco (commercial)
-    ][0]
-    
-    rotation_order = [
-        "ZYX", # 100STYLES
-        "ZXY", # Bandai-Namco
-        "XYZ"
-    ][0]
-    
-    #input_np_path = "samples/motion_smpl_sample_T2M-GPT.npy"
-    input_np_path = "samples/motion_smpl_sample_LoRA-MDM.npy"
-    #input_np_path = "D:/Project/Motion/LoRA-MDM/save/out/results.npy"
-    
-    #is_left_coordinate = False # T2M-GPT
-    is_left_coordinate = True # LoRA-MDM
-    
-    output_bvh_dir_path = "results/" + os.path.splitext(os.path.basename(input_np_path))[0]
-    
-    np2bvh(
-        input_np_path,
-        output_bvh_dir_path,
-        fps,
-        outputPosition = False,
-        outputRotation = True,
-        output_rotation_order = rotation_order,
-        is_left_coordinate = is_left_coordinate
+    parser = argparse.ArgumentParser(description="Convert positional motion-data (.npy/.npz) to BVH files.")
+    parser.add_argument(
+        "inputs",
+        nargs="*",
+        default=["samples/motion_smpl_sample_LoRA-MDM.npy"], # or "samples/motion_smpl_sample_T2M-GPT.npy"
+        help="input files or glob patterns (e.g. \"results/**/*.npy\")"
+        )
+    parser.add_argument("--output-dir", default="results", help="BVH files are written into <output-dir>/<name of input>/")
+    parser.add_argument(
+        "--fps",
+        type=int,
+        default=20,
+        help="20: HumanML3D, 24: 100STYLES, 30: Bandai-Namco (non-commercial), 120: Bandai-Namco (commercial)"
+        )
+    parser.add_argument(
+        "--rotation-order",
+        default="ZYX",
+        help="ZYX: 100STYLES, ZXY: Bandai-Namco"
+        )
+    parser.add_argument(
+        "--left-coordinate",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="True: LoRA-MDM, False: T2M-GPT"
+        )
+    parser.add_argument(
+        "--channels",
+        choices=["rotation", "position", "both"],
+        default="rotation",
+        help="rotation: root-position + rotations, position: positions only, both: positions and rotations"
+        )
+    parser.add_argument("--up-axis", choices=["Y", "Z"], default="Y", help="up-axis of the output")
+    parser.add_argument("--unit-scale", type=float, default=100.0, help="scale of the output positions (100: meters -> centimeters)")
+    parser.add_argument("--compression", choices=["none", "gzip", "xz"], default="none", help="stream BVH files through a compressor (.bvh.gz / .bvh.xz)")
+    parser.add_argument("--position-precision", type=int, default=6, help="decimals of position-channels")
+    parser.add_argument("--rotation-precision", type=int, default=6, help="decimals of rotation-channels")
+    parser.add_argument("--jobs", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--chunk-frames", type=int, default=None, help="stream rotations in chunks of this many frames (for long takes)")
+    parser.add_argument("--clips", type=_parseClipIndices, default=None, help="subset of clips of each file, e.g. \"10:21\" or \"3,5,7\" (default: all)")
+    parser.add_argument("--key", default=None, help="array to convert in .npz (default: \"motion\" or all arrays)")
+    parser.add_argument("--cache-dir", default=None, help="directory of the persistent rotation-cache (default: not used)")
+    parser.add_argument("--cache-max-mb", type=float, default=1024, help="size limit of the rotation-cache in MiB")
+    parser.add_argument("--manifest", default=None, help="manifest to skip up-to-date outputs (default: <output-dir>/manifest.jsonl)")
+    parser.add_argument("--force", action="store_true", help="convert all clips regardless of the manifest")
+    parser.add_argument("--clips-per-task", type=int, default=64, help="number of clips per task of the workers")
+    parser.add_argument("--verbose", action="store_true", help="print messages of each file and clip")
+    args = parser.parse_args()
+    
+    input_paths = expandInputPaths(args.inputs)
+    if not input_paths:
+        parser.error(f"No input file matches: {args.inputs}")
+    
+    summary = np2bvhBatch(
+        input_paths,
+        args.output_dir,
+        args.fps,
+        outputPosition = args.channels in ("position", "both"),
+        outputRotation = args.channels in ("rotation", "both"),
+        output_rotation_order = args.rotation_order,
+        is_left_coordinate = args.left_coordinate,
+        jobs = args.jobs,
+        chunk_frames = args.chunk_frames,
+        clip_indices = args.clips,
+        key = args.key,
+        cache_dir = args.cache_dir,
+        cache_max_bytes = int(args.cache_max_mb * 2**20),
+        compression = None if args.compression == "none" else args.compression,
+        transform = basisMatrix(args.up_axis, scale=args.unit_scale),
+        position_precision = args.position_precision,
+        rotation_precision = args.rotation_precision,
+        manifest_path = args.manifest,
+        force = args.force,
+        clips_per_task = args.clips_per_task,
+        verbose = args.verbose
     )
     
-    
\ No newline at end of file
+    sys.exit(1 if summary["failed"] > 0 or summary["failed_inputs"] > 0 else 0)
@@ -0,0 +1,303 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# export positional motion-data to binary glTF (.glb) without Blender
+#
+# the skeleton is written as a hierarchy of nodes (without mesh or skin), and each clip as an animation of
+# - translation of root (per frame)
+# - rotation of each joint as quaternion (per frame, the same rotations as the BVH of np2bvh)
+# - translation of the other joints (single key: OFFSET of the clip, so that clips of different bone-lengths share the nodes)
+# glTF is right-handed, Y-up and in meters, i.e. the same coordinate-system as the motion-data (no transform by default)
+#
+
+import os
+import json
+import struct
+import argparse
+import numpy as np
+import skeleton_util
+from np2bvh import loadPositionalArray, _parseClipIndices
+from pos2rotation import pos2quat
+from motion_transform import basisMatrix, transformPositions, transformQuaternions
+
+
+GLB_MAGIC = 0x46546C67 # "glTF"
+GLB_CHUNK_JSON = 0x4E4F534A # "JSON"
+GLB_CHUNK_BIN = 0x004E4942 # "BIN\0"
+COMPONENT_FLOAT = 5126
+
+
+#
+# binary buffer of the glTF, which keeps the NumPy arrays as they are (no copy until written)
+#
+class _GltfBuffer:
+
+    def __init__(self):
+    
+        self.chunks = []
+        self.byte_length = 0
+        self.buffer_views = []
+        self.accessors = []
+    
+    
+    # add a float32 array as a bufferView (4-byte aligned), returns its index
+    def addBufferView(self, array):
+    
+        array = np.ascontiguousarray(array, dtype="<f4")
+        
+        self.chunks.append(memoryview(array).cast("B"))
+        self.buffer_views.append(dict(buffer=0, byteOffset=self.byte_length, byteLength=array.nbytes))
+        self.byte_length += array.nbytes # float32: always 4-byte aligned
+        
+        return len(self.buffer_views) - 1
+    
+    
+    #
+    # add an accessor of count elements of accessor_type ("SCALAR", "VEC3", "VEC4") in a bufferView, returns its index
+    # values: min / max of them are written (required for the inputs of animation-samplers)
+    #
+    def addAccessor(self, buffer_view, byte_offset, count, accessor_type, values = None):
+    
+        accessor = dict(bufferView=buffer_view, byteOffset=byte_offset, componentType=COMPONENT_FLOAT, count=count, type=accessor_type)
+        if values is not None:
+            values = np.asarray(values, dtype=np.float32).reshape(count, -1)
+            accessor["min"] = values.min(axis=0).tolist()
+            accessor["max"] = values.max(axis=0).tolist()
+        
+        self.accessors.append(accessor)
+        
+        return len(self.accessors) - 1
+
+
+
+#
+# export clips to a GLB file, each clip as an animation
+# clips_pos: ndarray(frames, joints, 3), ndarray(N, frames, joints, 3) or list of ndarray(frames, joints, 3) in meters
+# clips_quat: rotations of clips_pos from pos2quat() (None: computed here)
+# animation_names: names of the animations (default: "000", "001", ...)
+# transform: basis matrix of motion_transform applied to positions and (conjugated) rotations (None: as it is)
+#
+def exportToGlb(
+    filename,
+    clips_pos,
+    joint_names,
+    fps = 20,
+    clips_quat = None,
+    animation_names = None,
+    transform = None
+    ):
+    
+    if isinstance(clips_pos, np.ndarray) and clips_pos.ndim == 3:
+        clips_pos = clips_pos[None]
+        clips_quat = None if clips_quat is None else clips_quat[None]
+    
+    if clips_quat is None:
+        clips_quat = pos2quat(clips_pos) if isinstance(clips_pos, np.ndarray) else [pos2quat(clip) for clip in clips_pos]
+    
+    if animation_names is None:
+        animation_names = [f"{i:03d}" for i in range(len(clips_pos))]
+    
+    transform = np.eye(3) if transform is None else np.asarray(transform, dtype=np.float64)
+    
+    joints = clips_pos[0].shape[1]
+    skeleton = skeleton_util.getSkeleton(joints)
+    parents = skeleton.parents
+    non_root = np.arange(1, joints)
+    
+    # rotations of joints whose rotations are estimated (others stay as the identity)
+    animated_joints = np.union1d([0], skeleton.bone_joints).astype(int)
+    
+    
+    # nodes in the order of joints (children follow the skeleton), the rest-pose is the 1st frame of the 1st clip
+    initial_pos = transformPositions(np.asarray(clips_pos[0][0], dtype=np.float64), transform)
+    offsets = initial_pos - initial_pos[parents]
+    offsets[0] = initial_pos[0]
+    
+    nodes = [dict(name=str(joint_names[j]), translation=offsets[j].tolist()) for j in range(joints)]
+    for j in non_root:
+        nodes[parents[j]].setdefault("children", []).append(int(j))
+    
+    
+    buffer = _GltfBuffer()
+    animations = []
+    
+    # key-frame times, shared by clips of the same length (1: single key of the OFFSETs)
+    time_accessors = {1: buffer.addAccessor(buffer.addBufferView(np.zeros(1)), 0, 1, "SCALAR", np.zeros(1))}
+    
+    for clip_pos, clip_quat, name in zip(clips_pos, clips_quat, animation_names):
+        frames = clip_pos.shape[0]
+        
+        if frames not in time_accessors:
+            times = np.arange(frames, dtype=np.float32) / np.float32(fps)
+            time_accessors[frames] = buffer.addAccessor(buffer.addBufferView(times), 0, frames, "SCALAR", times)
+        
+        # root-translation per frame, and OFFSETs of the other joints of this clip (single key)
+        clip_pos = transformPositions(clip_pos, transform)
+        clip_offsets = clip_pos[0, non_root] - clip_pos[0, parents[non_root]]
+        
+        translation_view = buffer.addBufferView(np.concatenate([clip_pos[:, 0], clip_offsets], axis=0))
+        
+        # rotations of all animated joints in one bufferView, tightly packed per joint: (joints, frames, 4)
+        clip_quat = transformQuaternions(clip_quat[:, animated_joints], transform)
+        rotation_view = buffer.addBufferView(np.transpose(clip_quat, (1, 0, 2)))
+        
+        samplers = []
+        channels = []
+        
+        def addChannel(node, path, input_accessor, output_accessor, interpolation = "LINEAR"):
+            samplers.append(dict(input=input_accessor, output=output_accessor, interpolation=interpolation))
+            channels.append(dict(sampler=len(samplers) - 1, target=dict(node=int(node), path=path)))
+        
+        addChannel(0, "translation", time_accessors[frames], buffer.addAccessor(translation_view, 0, frames, "VEC3"))
+        
+        for k, j in enumerate(non_root):
+            byte_offset = (frames + k) * 3 * 4
+            addChannel(j, "translation", time_accessors[1], buffer.addAccessor(translation_view, byte_offset, 1, "VEC3"), "STEP")
+        
+        for k, j in enumerate(animated_joints):
+            byte_offset = k * frames * 4 * 4
+            addChannel(j, "rotation", time_accessors[frames], buffer.addAccessor(rotation_view, byte_offset, frames, "VEC4"))
+        
+        animations.append(dict(name=str(name), samplers=samplers, channels=channels))
+    
+    
+    gltf = dict(
+        asset=dict(version="2.0", generator="np2gltf"),
+        scene=0,
+        scenes=[dict(nodes=[0])],
+        nodes=nodes,
+        animations=animations,
+        buffers=[dict(byteLength=buffer.byte_length)],
+        bufferViews=buffer.buffer_views,
+        accessors=buffer.accessors
+    )
+    
+    _writeGlb(filename, gltf, buffer)
+    
+    print(f"{filename}: {len(animations)} animations of {joints} joints are exported.")
+
+
+
+# write GLB container: header, JSON chunk (padded by spaces) and BIN chunk (padded by zeros)
+def _writeGlb(filename, gltf, buffer):
+
+    json_bytes = json.dumps(gltf, separators=(",", ":")).encode()
+    json_bytes += b" " * (-len(json_bytes) % 4)
+    bin_padding = b"\0" * (-buffer.byte_length % 4)
+    bin_length = buffer.byte_length + len(bin_padding)
+    
+    total_length = 12 + 8 + len(json_bytes) + 8 + bin_length
+    
+    with open(filename, "wb") as f:
+        f.write(struct.pack("<III", GLB_MAGIC, 2, total_length))
+        f.write(struct.pack("<II", len(json_bytes), GLB_CHUNK_JSON))
+        f.write(json_bytes)
+        f.write(struct.pack("<II", bin_length, GLB_CHUNK_BIN))
+        for chunk in buffer.chunks:
+            f.write(chunk)
+        f.write(bin_padding)
+
+
+
+#
+# read a GLB file written by exportToGlb()
+# returns: (glTF JSON as dict, binary buffer as bytes)
+#
+def loadGlb(filename):
+
+    with open(filename, "rb") as f:
+        magic, version, total_length = struct.unpack("<III", f.read(12))
+        if magic != GLB_MAGIC or version != 2:
+            raise ValueError(f"{filename} is not a GLB file of glTF 2.0.")
+        
+        json_length, _ = struct.unpack("<II", f.read(8))
+        gltf = json.loads(f.read(json_length))
+        
+        bin_length, _ = struct.unpack("<II", f.read(8))
+        binary = f.read(bin_length)
+    
+    return gltf, binary
+
+
+
+# values of an accessor as ndarray(count, components)
+def readAccessor(gltf, binary, index):
+
+    accessor = gltf["accessors"][index]
+    view = gltf["bufferViews"][accessor["bufferView"]]
+    components = {"SCALAR": 1, "VEC3": 3, "VEC4": 4}[accessor["type"]]
+    offset = view.get("byteOffset", 0) + accessor.get("byteOffset", 0)
+    
+    return np.frombuffer(binary, dtype="<f4", count=accessor["count"] * components, offset=offset).reshape(accessor["count"], components)
+
+
+
+#
+# convert motion-data (.npy/.npz) to a GLB file, whose animations are the clips ("000", "001", ... by the clip-index)
+# clip_indices: subset of clips to convert (None, slice, range or sequence of int), key: array of .npz
+#
+def np2gltf(
+    input_np_path,
+    output_glb_path,
+    fps = 20,
+    clip_indices = None,
+    key = None,
+    transform = None
+    ):
+    
+    data_pos, clip_indices = loadPositionalArray(input_np_path, clip_indices, key, return_clip_indices=True)
+    clip_numbers = range(data_pos.shape[0]) if clip_indices is None else clip_indices.tolist()
+    
+    output_dir = os.path.dirname(output_glb_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    
+    exportToGlb(
+        output_glb_path,
+        data_pos,
+        skeleton_util.getSkeleton(data_pos.shape[2]).joint_names,
+        fps,
+        animation_names = [f"{clip_number:03d}" for clip_number in clip_numbers],
+        transform = transform
+    )
+    
+    return output_glb_path
+
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Convert positional motion-data (.npy/.npz) to a binary glTF (.glb).")
+    parser.add_argument(
+        "input_np_path",
+        nargs="?",
+        default="samples/motion_smpl_sample_LoRA-MDM.npy" # or "samples/motion_smpl_sample_T2M-GPT.npy"
+        )
+    parser.add_argument("--output", default=None, help="default: results/<name of input>.glb")
+    parser.add_argument("--fps", type=int, default=20, help="20: HumanML3D")
+    parser.add_argument("--clips", type=_parseClipIndices, default=None, help="subset of clips, e.g. \"10:21\" or \"3,5,7\" (default: all)")
+    parser.add_argument("--key", default=None, help="array to convert in .npz (default: \"motion\" or all arrays)")
+    parser.add_argument("--up-axis", choices=["Y", "Z"], default="Y", help="up-axis of the output (glTF is Y-up)")
+    parser.add_argument("--unit-scale", type=float, default=1.0, help="scale of the output positions (glTF is in meters)")
+    args = parser.parse_args()
+    
+    output_glb_path = args.output
+    if output_glb_path is None:
+        output_glb_path = "results/" + os.path.splitext(os.path.basename(args.input_np_path))[0] + ".glb"
+    
+    np2gltf(
+        args.input_np_path,
+        output_glb_path,
+        args.fps,
+        clip_indices = args.clips,
+        key = args.key,
+        transform = basisMatrix(args.up_axis, scale=args.unit_scale)
+    )
@@ -8,18 +8,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+#
+# matplotlib (mpl_toolkits), imageio and torch are imported by the functions that use them,
+# so that importing this module (e.g. by process-pool workers, or for loadMotionSequence()) stays light
+#
+
 import os
-import torch 
-import matplotlib.pyplot as plt
 import numpy as np
 import io
-import matplotlib
-from mpl_toolkits.mplot3d.art3d import Poly3DCollection
-import mpl_toolkits.mplot3d.axes3d as p3
 from textwrap import wrap
-import imageio
 import skeleton_util
-from np2bvh import loadPositionalMotions
+from np2bvh import loadMotionSequence
+from motion_transform import basisMatrix, transformPositions
 
 
 def init(ax, limits):
@@ -31,6 +31,8 @@ def init(ax, limits):
 
 
 def plot_xzPlane(ax, minx, maxx, miny, minz, maxz):
+    from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+    
     ## Plot a plane XZ
     verts = [
         [minx, miny, minz],
@@ -46,6 +48,9 @@ def plot_xzPlane(ax, minx, maxx, miny, minz, maxz):
 # plot single-frame
 def update(index, trajec, joint_chains, nb_joints, title, limits, MINS, MAXS, colors, data, out_name):
 
+    import matplotlib.pyplot as plt
+    import mpl_toolkits.mplot3d.axes3d as p3
+    
     fig = plt.figure(figsize=(480/96., 320/96.), dpi=96) if nb_joints == 21 else plt.figure(figsize=(10, 10), dpi=96)
     if title is not None :
         wraped_title = '\n'.join(wrap(title, 40))
@@ -123,22 +128,202 @@ def update(index, trajec, joint_chains, nb_joints, title, limits, MINS, MAXS, co
         return arr
 
 
+#
+# renderer of frames on a persistent figure
+# the figure, axes, floor, trajectory and one line per chain are built once (in the same order as update()),
+# and each frame only updates their 3-D data and grabs the canvas, which gives the same pixels as update()
+#
+class FrameRenderer:
+    
+    def __init__(self, joint_chains, nb_joints, title, limits, colors):
+        
+        import matplotlib.pyplot as plt
+        import mpl_toolkits.mplot3d.axes3d as p3
+        from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+        
+        self.fig = plt.figure(figsize=(480/96., 320/96.), dpi=96) if nb_joints == 21 else plt.figure(figsize=(10, 10), dpi=96)
+        if title is not None :
+            wraped_title = '\n'.join(wrap(title, 40))
+            self.fig.suptitle(wraped_title, fontsize=16)
+        ax = p3.Axes3D(self.fig)
+        self.fig.add_axes(ax)
+        
+        ax.cla()
+        init(ax, limits)
+        
+        ax.view_init(elev=110, azim=-90)
+        ax.dist = 7.5
+        
+        self.floor = Poly3DCollection([np.zeros((4, 3))])
+        self.floor.set_facecolor((0.5, 0.5, 0.5, 0.5))
+        ax.add_collection3d(self.floor)
+        
+        self.trajectory, = ax.plot3D([], [], [], linewidth=1.0, color='blue')
+        
+        self.chain_lines = []
+        for i, (chain, color) in enumerate(zip(joint_chains, colors)):
+            line, = ax.plot3D([], [], [], linewidth=4.0 if i < 5 else 2.0, color=color)
+            self.chain_lines.append((line, chain))
+        
+        plt.axis('off')
+        ax.set_xticklabels([])
+        ax.set_yticklabels([])
+        ax.set_zticklabels([])
+        
+        self.ax = ax
+    
+    
+    # render single-frame as ndarray(height, width, 4) of uint8 (RGBA)
+    def render(self, index, trajec, MINS, MAXS, data):
+        
+        minx, maxx = MINS[0] - trajec[index, 0], MAXS[0] - trajec[index, 0]
+        minz, maxz = MINS[2] - trajec[index, 1], MAXS[2] - trajec[index, 1]
+        self.floor.set_verts([[[minx, 0, minz], [minx, 0, maxz], [maxx, 0, maxz], [maxx, 0, minz]]])
+        
+        # the trajectory is drawn from the 3rd frame (as update())
+        self.trajectory.set_visible(index > 1)
+        if index > 1:
+            self.trajectory.set_data_3d(
+                trajec[:index, 0] - trajec[index, 0],
+                np.zeros_like(trajec[:index, 0]),
+                trajec[:index, 1] - trajec[index, 1]
+                )
+        
+        for line, chain in self.chain_lines:
+            line.set_data_3d(data[index, chain, 0], data[index, chain, 1], data[index, chain, 2])
+        
+        self.fig.canvas.draw()
+        
+        return np.array(self.fig.canvas.buffer_rgba()) # copy: the buffer is reused by the next frame
+    
+    
+    def close(self):
+        import matplotlib.pyplot as plt
+        plt.close(self.fig)
+
+
+
+#
+# incremental writer of animation, chosen by the suffix of output_path
+# ".gif": animation-gif (the same file as imageio.mimsave())
+# ".mp4": H.264 by the ffmpeg bundled with imageio-ffmpeg, streamed frame by frame (alpha is dropped)
+#
+class AnimationWriter:
+    
+    def __init__(self, output_path, fps):
+        
+        import imageio
+        
+        self.is_rgb = os.path.splitext(output_path)[1].lower() == ".mp4"
+        if self.is_rgb:
+            self.writer = imageio.get_writer(output_path, fps=fps, codec="libx264", macro_block_size=16)
+        else:
+            self.writer = imageio.get_writer(output_path, fps=fps)
+    
+    
+    # frames: ndarray(frames, height, width, 4)
+    def append(self, frames):
+        for frame in frames:
+            self.writer.append_data(frame[..., :3] if self.is_rgb else frame)
+    
+    
+    def close(self):
+        self.writer.close()
+    
+    
+    def __enter__(self):
+        return self
+    
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+
+# frames[frame_start:frame_end] of a prepared motion rendered one by one on a FrameRenderer
+def _iterFrames(data, trajec, MINS, MAXS, joint_chains, nb_joints, title, limits, colors, frame_start, frame_end):
+    
+    import matplotlib
+    matplotlib.use('Agg')
+    
+    renderer = FrameRenderer(joint_chains, nb_joints, title, limits, colors)
+    try:
+        for i in range(frame_start, frame_end):
+            yield renderer.render(i, trajec, MINS, MAXS, data)
+    finally:
+        renderer.close()
+
+
+# worker of plot_3d_motion(jobs > 1), whose process has its own backend-state
+def _renderFrames(*args):
+    return np.stack(list(_iterFrames(*args)), axis=0)
+
+
+# blocks of frames rendered by _renderFrames() on the executor in the order of boundaries,
+# with at most window ranges in flight (the next range is submitted as each block is consumed)
+def _iterRenderedRanges(executor, args, boundaries, window):
+    
+    from collections import deque
+    
+    futures = deque()
+    for frame_start, frame_end in zip(boundaries[:-1], boundaries[1:]):
+        if len(futures) >= window:
+            yield futures.popleft().result()
+        futures.append(executor.submit(_renderFrames, *args, int(frame_start), int(frame_end)))
+    
+    while futures:
+        yield futures.popleft().result()
+
+
+# blocks of 64 frames of a prepared motion rendered by the NumPy stick-figure rasterizer (renderer = "numpy")
+# each block is a new array, as the GIF-writer keeps the appended frames until it is closed
+def _iterStickFrames(data, trajec, MINS, MAXS, joint_chains, limits, colors, block_frames = 64):
+    
+    from stick_renderer import StickFigureRenderer
+    
+    renderer = StickFigureRenderer(joint_chains, limits, colors)
+    
+    for frame_start in range(0, data.shape[0], block_frames):
+        yield renderer.render(data, trajec, MINS, MAXS, frame_start, min(frame_start + block_frames, data.shape[0]))
+
+
+#
+# output_path: frames are streamed into an animation-file (".gif" or ".mp4", at fps) as they are rendered
+# return_frames: return the frames as tensor(frames, height, width, 4) (default: only without output_path)
+# jobs > 1: frame-ranges are rendered in worker-processes and written / concatenated in the order of frames
+# renderer: "matplotlib" (mplot3d figure with the title) or "numpy" (stick_renderer: floor-grid, trajectory and chains
+#           rasterized in batches of frames, for quick previews; 320x320 frames without title, jobs is not used)
+#
 def plot_3d_motion(
     data_pos,
     out_name,
     title,
     figsize=(10, 10),
     fps=120,
-    radius=4
+    radius=4,
+    up_axis="Y",
+    jobs=1,
+    output_path=None,
+    return_frames=None,
+    renderer="matplotlib"
     ):
     
-    matplotlib.use('Agg')
+    if renderer not in ("matplotlib", "numpy"):
+        raise ValueError(f"Invalid renderer: {renderer}")
+    if renderer == "numpy" and out_name is not None:
+        raise ValueError("out_name (a file per frame) requires renderer=\"matplotlib\"")
     
-    data = data_pos #.copy().reshape(len(data_pos), -1, 3)
+    if renderer == "matplotlib":
+        import matplotlib
+        matplotlib.use('Agg')
+    
+    # copy in Y-up (the inverse of the orthonormal basis is its transpose)
+    # data_pos may be a read-only (memory-mapped) view and is not modified
+    data = transformPositions(data_pos, basisMatrix(up_axis).T, copy=True)
     
     nb_joints = data_pos.shape[1]
     
-    joint_chains, junction_nodes = skeleton_util.getJointChains(nb_joints)
+    joint_chains = skeleton_util.getSkeleton(nb_joints).joint_chains
     
     
     limits = 1000 if nb_joints == 21 else 2
@@ -158,51 +343,140 @@ def plot_3d_motion(
     data[..., 2] -= data[:, 0:1, 2]
 
 
+    if out_name is not None : # each frame is saved as out_name (by update())
+        out = []
+        for i in range(frame_number) : 
+            out.append(update(i, trajec, joint_chains, nb_joints, title, limits, MINS, MAXS, colors, data, out_name))
+        return out
+    
+    args = (data, trajec, MINS, MAXS, joint_chains, nb_joints, title, limits, colors)
+    
+    if return_frames is None:
+        return_frames = output_path is None
+    
+    writer = AnimationWriter(output_path, fps) if output_path is not None else None
     out = []
-    for i in range(frame_number) : 
-        out.append(update(i, trajec, joint_chains, nb_joints, title, limits, MINS, MAXS, colors, data, out_name))
-    out = np.stack(out, axis=0)
-    return torch.from_numpy(out)
+    
+    try:
+        if renderer == "numpy":
+            blocks = _iterStickFrames(data, trajec, MINS, MAXS, joint_chains, limits, colors)
+            executor = None
+        elif jobs <= 1 or frame_number < 2:
+            blocks = (frame[None] for frame in _iterFrames(*args, 0, frame_number))
+            executor = None
+        else:
+            # ranges of at most 64 frames, at most 2 x jobs of which are in flight,
+            # so that the rendered frames waiting for the writer are bounded by 128 x jobs frames
+            num_ranges = max(min(jobs, frame_number), -(-frame_number // 64))
+            boundaries = np.linspace(0, frame_number, num_ranges + 1).astype(int)
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(max_workers=jobs)
+            blocks = _iterRenderedRanges(executor, args, boundaries, 2 * jobs)
+        
+        for block in blocks:
+            if writer is not None:
+                writer.append(block)
+            if return_frames:
+                out.append(block)
+    
+    finally:
+        if writer is not None:
+            writer.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    
+    if not return_frames:
+        return None
+    
+    import torch
+    
+    return torch.from_numpy(np.concatenate(out, axis=0))
+
+
+
+# worker of plotPositionalMotions(jobs > 1): render a clip into an animation-file
+def _plotClipWorker(data_pos, title, up_axis, output_path, fps, return_frames, renderer):
+    
+    out = plot_3d_motion(data_pos, None, title, fps=fps, up_axis=up_axis, output_path=output_path, return_frames=return_frames, renderer=renderer)
+    
+    return np.asarray(out) if return_frames else None
 
 
+#
+# render clips into "<output_dir>/000.gif", ... (video_format: "gif" or "mp4"), streaming each frame into the file
+# return_frames = True: all frames are also returned as tensor(N, frames, height, width, 4), otherwise the output paths
+# jobs > 1: clips are rendered in worker-processes (a single clip: its frames are split into the workers)
+# the results are the same as jobs = 1, in the order of clips
+# renderer: "matplotlib" or "numpy" (see plot_3d_motion())
+#
 def plotPositionalMotions(
     data_pos_list,
     fps,
     titles = None,
-    output_dir = None
+    output_dir = None,
+    up_axis = "Y",
+    jobs = 1,
+    video_format = "gif",
+    return_frames = False,
+    renderer = "matplotlib"
     ):
     
     batch_size = len(data_pos_list)
     out = []
     
+    if return_frames:
+        import torch
+    
     os.makedirs(output_dir, exist_ok=True)
+    output_paths = [output_dir + f"/{i:03d}.{video_format}" for i in range(batch_size)]
+    
+    if jobs > 1 and batch_size > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(
+                    _plotClipWorker,
+                    np.asarray(data_pos_list[i]),
+                    titles[i] if titles is not None else None,
+                    up_axis,
+                    output_paths[i],
+                    fps,
+                    return_frames,
+                    renderer
+                )
+                for i in range(batch_size)
+            ]
+            
+            for i, future in enumerate(futures):
+                frames = future.result()
+                if return_frames:
+                    out.append(torch.from_numpy(frames))
+                print(f"[{i+1}/{batch_size}] Saved as \"{output_paths[i]}\"")
+        
+        print("Done")
+        return torch.stack(out, axis=0) if return_frames else output_paths
     
     for i in range(batch_size) : 
         
         print(f"[{i+1}/{batch_size}]")
         
-        print("Plotting...")
-        out.append(
-            plot_3d_motion(
-                data_pos_list[i],
-                None,
-                titles[i] if titles is not None else None
-            )
+        print(f"Plotting and saving as \"{output_paths[i]}\"...")
+        frames = plot_3d_motion(
+            data_pos_list[i],
+            None,
+            titles[i] if titles is not None else None,
+            fps = fps,
+            up_axis = up_axis,
+            jobs = jobs,
+            output_path = output_paths[i],
+            return_frames = return_frames,
+            renderer = renderer
         )
-        
-        output_animgif_path = output_dir + f"/{i:03d}.gif"
-        print("Saving as animation-gif \"{output_animgif_path}\"...")
-        
-        imageio.mimsave(
-            output_animgif_path,
-            np.asarray(out[-1]),
-            fps = fps
-            )
-            
+        if return_frames:
+            out.append(frames)
         
     print("Done")
-    out = torch.stack(out, axis=0)
-    return out
+    return torch.stack(out, axis=0) if return_frames else output_paths
     
 
 
@@ -211,8 +485,8 @@ if __name__ == "__main__":
     #input_np_path = "samples/motion_smpl_sample_T2M-GPT.npy"
     input_np_path = "samples/motion_smpl_sample_LoRA-MDM.npy"
     
-    # load ndarray from file
-    data_pos_list, data_rot_list = loadPositionalMotions(input_np_path)
+    # load clips from file (rotations are not needed for plotting, so they are never computed)
+    data_pos_list = loadMotionSequence(input_np_path)
     
     # load text-list from text-file
     text_file_path = os.path.splitext(input_np_path)[0] + ".txt"
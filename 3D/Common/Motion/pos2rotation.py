@@ -8,14 +8,68 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import sys
 import numpy as np
 import skeleton_util
-from scipy.spatial.transform import Rotation as R
+import quaternion_jit
+from quaternion_util import quatMultiply, quatConjugate, quatNormalize, quatFromTwoVectors, quatToEuler
+
+
+#
+# backend of the rotation kernels
+# "auto": the JIT-compiled kernels for large inputs (numba_min_rotations or more) or once they are loaded, otherwise NumPy
+# "numba": JIT-compiled kernels
+# "numpy": pure NumPy kernels
+#
+# the first call of the numba kernels in a process costs about 0.5 s (import of numba and load of the cached kernels),
+# while a single 196-frame clip takes about 2 ms with NumPy (0.8 ms with numba),
+# so short runs (CLIs, Blender, a few clips) stay on NumPy unless numba is selected explicitly
+#
+rotation_backend = "auto"
+numba_min_rotations = 2000000 # joint-rotations (clips x frames x joints) from which "auto" pays the start-up of numba
+
+
+#
+# version of the pos2rot() results, which invalidates persisted rotations (rotation_cache) when the computation changes
+#
+pos2rot_version = 1
+
+
+def setRotationBackend(backend):
+    
+    global rotation_backend
+    
+    if backend not in ("auto", "numba", "numpy"):
+        raise ValueError(f"Invalid rotation-backend: {backend}")
+    if backend == "numba" and not quaternion_jit.is_available:
+        raise ImportError("numba is not installed.")
+    
+    rotation_backend = backend
+
+
+#
+# whether the numba kernels are used for num_rotations joint-rotations with the current rotation_backend
+#
+def _useNumba(num_rotations):
+    
+    if rotation_backend == "auto":
+        return quaternion_jit.is_available and (quaternion_jit.isLoaded() or num_rotations >= numba_min_rotations)
+    
+    return rotation_backend == "numba"
+
+
+
+#
+# torch.Tensor inputs are processed by the torch kernels (torch is never imported here unless the caller did)
+#
+def _isTensor(data):
+    torch = sys.modules.get("torch")
+    return torch is not None and isinstance(data, torch.Tensor)
 
 
 #
 # compute rotation-differences between quaternion ndarrays
-# input-data format: ndarray(num, 4)
+# input-data format: ndarray(..., 4) (broadcastable to each other)
 #
 def computeRotationDifference(
     quats_target,
@@ -25,176 +79,341 @@ def computeRotationDifference(
     is_degree = True       # only for euler-angle
     ):
     
-    num = quats_target.shape[0]
-    assert(num == quats_source.shape[0])
+    if _isTensor(quats_target) or _isTensor(quats_source):
+        import quaternion_torch
+        return quaternion_torch.computeRotationDifference(quats_target, quats_source, is_euler, rotation_order, is_degree)
     
-    if is_euler:
-        output_delta = np.zeros((num, 3)) # output as euler
-    else:
-        output_delta = np.zeros((num, 4)) # output as quaternion
-        output_delta[:,3] = 1.0
+    if is_euler and _useNumba(np.size(quats_target) // 4):
+        return quaternion_jit.computeEulerDifference(quats_target, quats_source, rotation_order, is_degree)
     
+    # align source to target
+    delta_quats = quatMultiply(quatConjugate(quatNormalize(quats_source)), quatNormalize(quats_target))
     
-    for i in range(num):
-        # convert to rotation-object
-        rot_src = R.from_quat(quats_source[i])
-        rot_tgt = R.from_quat(quats_target[i])
-
-        # align source to target
-        delta_rot = rot_src.inv() * rot_tgt
-
-        # convert to rotation-angle
-        if is_euler:
-            output_delta[i] = delta_rot.as_euler(rotation_order, degrees=is_degree)
-        else:
-            output_delta[i] = delta_rot.as_quat()
-    
-    return output_delta
+    # convert to rotation-angle
+    if is_euler:
+        return quatToEuler(delta_quats, rotation_order, is_degree)
+    else:
+        return delta_quats
     
 
 
 
 #
 # convert posiotional data to global rotation data
-# input-data format: ndarray(joints, 3)
+# input-data format: ndarray(..., joints, 3)
 #
 def computeGlobalRotations (
-    global_positions, # ndarray(joints, 3)
+    global_positions, # ndarray(..., joints, 3)
     is_euler = False, # True: Euler, False: Quaternion
-    rotaton_order = "XYZ", # only for euler-angle
+    rotation_order = "XYZ", # only for euler-angle
     is_degree = True,      # only for euler-angle
     frontal_direction = [0, 0, -1] # frontal direction of loaded skeleton
     ):
     
-    joints, _ = global_positions.shape
-    joint_chains, junction_nodes = skeleton_util.getJointChains(joints)
+    skeleton = skeleton_util.getSkeleton(global_positions.shape[-2])
+    
+    if _isTensor(global_positions):
+        import quaternion_torch
+        global_rotations = quaternion_torch.computeGlobalRotations(global_positions, skeleton, frontal_direction)
+        return quaternion_torch.quatToEuler(global_rotations, rotation_order, is_degree) if is_euler else global_rotations
+    
+    global_rotations = np.zeros(global_positions.shape[:-1] + (4,)) # quaternion
+    global_rotations[..., 3] = 1.0
+    
+    # rotation of branched-bones cannot be estimated, so only bone-joints are processed
+    vectors = global_positions[..., skeleton.bone_children, :] - global_positions[..., skeleton.bone_joints, :]
+    
+    # compute angle from frontal-direction
+    global_rotations[..., skeleton.bone_joints, :] = quatFromTwoVectors(vectors, frontal_direction) # (target, source)
     
     if is_euler:
-        global_rotations = np.zeros(global_positions.shape)
+        return quatToEuler(global_rotations, rotation_order, is_degree)
     else:
-        global_rotations = np.zeros((global_positions.shape[0], 4)) # quaternion
-        global_rotations[:,3] = 1.0
-    
-    for chain in joint_chains:
-        for i in range(1, len(chain)-1):
-            joint_idx = chain[i]
-            if joint_idx in junction_nodes: # rotation of branched-bones cannot be estimated
-                continue
-            
-            child_idx = chain[i+1]
-            joint_pos = global_positions[joint_idx, :]
-            child_pos = global_positions[child_idx, :]
-            vec       = child_pos - joint_pos
-            
-            # compute angle from frontal-direction
-            rot = R.align_vectors([vec], [frontal_direction])[0] # (target, source)
-            
-            if is_euler:
-                global_rotations[joint_idx, :] = rot.as_euler(rotation_order, degrees=is_degree)
-            else:
-                global_rotations[joint_idx, :] = rot.as_quat()
-            
-        
-    return global_rotations
+        return global_rotations
     
 
 
 
 #
 # convert posiotional data to local rotation data whose axis is the parent-bone
-# input-data format: ndarray(joints, 3)
+# input-data format: ndarray(..., joints, 3)
 #
 def computeLocalRotations (
-    global_positions, # ndarray(joints, 3)
+    global_positions, # ndarray(..., joints, 3)
     is_euler = False, # True: Euler, False: Quaternion
-    rotaton_order = "XYZ", # only for euler-angle
+    rotation_order = "XYZ", # only for euler-angle
     is_degree = True,      # only for euler-angle
     frontal_direction = [0, 0, -1] # frontal direction of loaded skeleton
     ):
     
-    # compute global-rotations at first
-    global_rotations = computeGlobalRotations(
-        global_positions,
-        is_euler = False,
-        frontal_direction = frontal_direction
-    )
+    skeleton = skeleton_util.getSkeleton(global_positions.shape[-2])
     
+    if _isTensor(global_positions):
+        import quaternion_torch
+        local_rotations = quaternion_torch.computeLocalRotations(global_positions, skeleton, frontal_direction)
+        return quaternion_torch.quatToEuler(local_rotations, rotation_order, is_degree) if is_euler else local_rotations
     
-    joints, _ = global_positions.shape
-    joint_chains, junction_nodes = skeleton_util.getJointChains(joints)
+    elif _useNumba(global_positions.size // 3):
+        local_rotations = quaternion_jit.computeLocalRotations(global_positions, skeleton, frontal_direction)
     
-    if is_euler:
-        local_rotations = np.zeros(global_positions.shape)
     else:
-        local_rotations = np.zeros((global_positions.shape[0], 4)) # quaternion
-        local_rotations[:,3] = 1.0
-    
-    for chain in joint_chains:
-        for i in range(1, len(chain)-1):
-            bone_idx = chain[i]
-            if bone_idx in junction_nodes: # rotation of branched-bones cannot be estimated
-                continue
-                
-            parent_bone_idx = chain[i-1]
-            
-            rot_bone        = R.from_quat(global_rotations[bone_idx])
-            rot_parent_bone = R.from_quat(global_rotations[parent_bone_idx])
-            
-            # compute angle-difference
-            delta_rot = rot_parent_bone.inv() * rot_bone
-            
-            if is_euler:
-                local_rotations[bone_idx, :] = delta_rot.as_euler(rotation_order, degrees=is_degree)
-            else:
-                local_rotations[bone_idx, :] = delta_rot.as_quat()
-            
+        # compute global-rotations at first
+        global_rotations = computeGlobalRotations(
+            global_positions,
+            is_euler = False,
+            frontal_direction = frontal_direction
+        )
         
-    return local_rotations
+        local_rotations = np.zeros(global_rotations.shape) # quaternion
+        local_rotations[..., 3] = 1.0
+        
+        # compute angle-difference from the parent-bone
+        local_rotations[..., skeleton.bone_joints, :] = computeRotationDifference(
+            global_rotations[..., skeleton.bone_joints, :],
+            global_rotations[..., skeleton.bone_parents, :]
+        )
+    
+    if is_euler:
+        return quatToEuler(local_rotations, rotation_order, is_degree)
+    else:
+        return local_rotations
     
 
 
 
 #
 # convert posiotional data to local rotation-euler data from the 1st frame pose
-# input-data format: ndarray(frames, joints, 3)
+# whole clip (or whole batch of clips) is processed at once by the vectorized engine,
+# whose results match pos2rotPerFrame() within 1e-6 degrees (except around gimbal-lock of the euler-angles)
+# input-data format: ndarray(frames, joints, 3) or ndarray(N, frames, joints, 3)
+# torch.Tensor inputs are also accepted, and the rotations are returned as torch.Tensor (float64, on the same device)
 #
 def pos2rot(
-    data_pos,  # ndarray(frames, joints, 3)
+    data_pos,  # ndarray([N,] frames, joints, 3)
     rotation_order="XYZ"
      ):
-     
-    frames, joints, _ = data_pos.shape
-    joint_chains, junction_nodes = skeleton_util.getJointChains(joints)
     
-    # compute global-rotation angles of the 1st frame
-    initial_rotations = computeLocalRotations(data_pos[0,:,:]) # compute as quaternion
+    assert(data_pos.ndim in (3, 4) and data_pos.shape[-1] == 3)
     
+    # compute local-rotation angles of all frames as quaternion
+    rotations = computeLocalRotations(data_pos)
     
-    # compute local-rotation angles from the 1st frame
-    data_rot = np.zeros(data_pos.shape)
-    for f in range(1, frames):
-        rotations = computeLocalRotations(data_pos[f,:,:]) # compute as quaternion
-        data_rot[f,:,:] = computeRotationDifference(
+    # compute local-rotation angles from the 1st frame of each clip
+    data_rot = computeRotationDifference(
+        rotations,
+        rotations[..., :1, :, :],
+        is_euler = True,
+        rotation_order = rotation_order,
+        is_degree = True
+        )
+    data_rot[..., 0, :, :] = 0.0 # the 1st frame is the reference-pose itself
+    
+    return data_rot
+
+
+
+#
+# quaternion version of pos2rot(): local rotations from the 1st frame pose as (x, y, z, w)
+# (the same rotations as pos2rot() before the conversion to euler-angles, e.g. for glTF)
+# input-data format: ndarray(frames, joints, 3) or ndarray(N, frames, joints, 3)
+# output-data format: ndarray([N,] frames, joints, 4)
+#
+def pos2quat(
+    data_pos  # ndarray([N,] frames, joints, 3)
+     ):
+    
+    assert(data_pos.ndim in (3, 4) and data_pos.shape[-1] == 3)
+    
+    rotations = computeLocalRotations(data_pos)
+    
+    data_quat = computeRotationDifference(rotations, rotations[..., :1, :, :])
+    data_quat[..., 0, :, :] = [0.0, 0.0, 0.0, 1.0] # the 1st frame is the reference-pose itself
+    
+    return data_quat
+
+
+
+#
+# generator version of pos2rot() for very long takes, which yields ndarray(chunk, joints, 3) chunk by chunk
+# rotations of the 1st frame are carried across chunks as the reference,
+# so peak-memory is bounded by chunk_frames instead of the clip length
+# input-data format: ndarray(frames, joints, 3) (e.g. memory-mapped) or iterable of ndarray(chunk, joints, 3)
+#
+def pos2rotChunks(
+    data_pos,  # ndarray(frames, joints, 3) or iterable of chunks
+    rotation_order="XYZ",
+    chunk_frames=1024
+    ):
+    
+    if isinstance(data_pos, np.ndarray) or _isTensor(data_pos):
+        assert(data_pos.ndim == 3 and data_pos.shape[-1] == 3)
+        chunks = (data_pos[start:start+chunk_frames] for start in range(0, data_pos.shape[0], chunk_frames))
+    else:
+        chunks = data_pos
+    
+    initial_rotations = None
+    
+    for chunk in chunks:
+        if len(chunk) == 0:
+            continue
+        
+        # compute local-rotation angles of the chunk as quaternion
+        rotations = computeLocalRotations(chunk if _isTensor(chunk) else np.asarray(chunk))
+        
+        is_first_chunk = initial_rotations is None
+        if is_first_chunk:
+            initial_rotations = rotations[:1] + 0.0 # copy (of ndarray or tensor)
+        
+        data_rot = computeRotationDifference(
             rotations,
             initial_rotations,
             is_euler = True,
             rotation_order = rotation_order,
             is_degree = True
             )
+        if is_first_chunk:
+            data_rot[0] = 0.0 # the 1st frame is the reference-pose itself
+        
+        yield data_rot
+
+
+
+#
+# stateful online version of pos2rot() for frame-by-frame streaming (e.g. live preview of a motion generator)
+# rotations of the reference pose are computed once, and each push() converts a single frame at constant cost
+# with the topology and working buffers prepared in advance
+# push(data_pos[f]) gives pos2rot(data_pos)[f] when reference_positions = data_pos[0] (for f >= 1)
+# input-data format: ndarray(joints, 3)
+#
+class OnlineRotationConverter:
+
+    def __init__(
+        self,
+        reference_positions, # ndarray(joints, 3)
+        rotation_order = "XYZ",
+        frontal_direction = [0, 0, -1] # frontal direction of loaded skeleton
+        ):
         
-        """
-        debug_joint_index = 4
-        print(f"Frame-{f+1:03d}: (", end="")
-        for i, r in enumerate(data_rot[f, debug_joint_index, :]):
-            print(f"{r:.1f}", end="")
-            if i != 2:
-                print(",\t", end="")
-            
-        print(")")
-        """
+        reference_positions = np.asarray(reference_positions)
+        assert(reference_positions.ndim == 2 and reference_positions.shape[-1] == 3)
         
+        quatToEuler(np.array([0.0, 0.0, 0.0, 1.0]), rotation_order) # validate rotation_order
         
-    return data_rot
+        self.rotation_order = rotation_order
+        self.frontal_direction = np.asarray(frontal_direction, dtype=np.float64)
+        self.skeleton = skeleton_util.getSkeleton(reference_positions.shape[0])
+        self.num_frames = 0
+        
+        # working buffers (bone-vectors are computed in the precision of the reference as pos2rot() does)
+        dtype = reference_positions.dtype if reference_positions.dtype in (np.float32, np.float64) else np.float64
+        self._positions = np.empty((1,) + reference_positions.shape, dtype=dtype)
+        self._global_rotations = np.zeros((reference_positions.shape[0], 4))
+        self._global_rotations[:, 3] = 1.0
+        self._local_rotations = self._global_rotations.copy()
+        
+        # prepared arguments of the JIT kernels
+        if quaternion_jit.is_available:
+            self._bone_joints = np.ascontiguousarray(self.skeleton.bone_joints, dtype=np.int64)
+            self._bone_children = np.ascontiguousarray(self.skeleton.bone_children, dtype=np.int64)
+            self._bone_parents = np.ascontiguousarray(self.skeleton.bone_parents, dtype=np.int64)
+            self._euler_parameters = quaternion_jit._eulerParameters(rotation_order)
+        
+        self.reset(reference_positions)
+    
+    
+    # set a new reference pose
+    def reset(self, reference_positions):
+    
+        self.initial_rotations = self._computeLocalRotations(reference_positions).copy()
+        self.num_frames = 0
+    
+    
+    # local-rotations of a frame as quaternion: ndarray(joints, 4)
+    def _computeLocalRotations(self, frame_positions):
+    
+        self._positions[0] = frame_positions
+        
+        if _useNumba(1):
+            return quaternion_jit._localRotationsKernel(
+                self._positions, self._bone_joints, self._bone_children, self._bone_parents, self.frontal_direction
+            )[0]
+        
+        skeleton = self.skeleton
+        positions = self._positions[0]
+        vectors = positions[skeleton.bone_children] - positions[skeleton.bone_joints]
+        self._global_rotations[skeleton.bone_joints] = quatFromTwoVectors(vectors, self.frontal_direction)
+        self._local_rotations[skeleton.bone_joints] = computeRotationDifference(
+            self._global_rotations[skeleton.bone_joints],
+            self._global_rotations[skeleton.bone_parents]
+        )
+        return self._local_rotations
+    
+    
+    # convert a frame to local rotation-euler data (degrees) from the reference pose: ndarray(joints, 3)
+    def push(self, frame_positions):
+    
+        rotations = self._computeLocalRotations(frame_positions)
+        self.num_frames += 1
+        
+        if _useNumba(1):
+            return quaternion_jit._deltaEulerKernel(rotations, self.initial_rotations, *self._euler_parameters, True)
+        
+        return computeRotationDifference(
+            rotations,
+            self.initial_rotations,
+            is_euler = True,
+            rotation_order = self.rotation_order,
+            is_degree = True
+        )
 
 
 
+#
+# per-frame reference implementation of pos2rot() with scipy (slow)
+# which is kept to validate the vectorized engine
+# input-data format: ndarray(frames, joints, 3)
+#
+def pos2rotPerFrame(
+    data_pos,  # ndarray(frames, joints, 3)
+    rotation_order="XYZ",
+    frontal_direction = [0, 0, -1] # frontal direction of loaded skeleton
+     ):
+    
+    from scipy.spatial.transform import Rotation as R
+    
+    frames, joints, _ = data_pos.shape
+    skeleton = skeleton_util.getSkeleton(joints)
+    
+    # compute local-rotations of a frame as quaternion
+    def computeLocalRotationsOfFrame(global_positions):
+        
+        global_rotations = np.zeros((joints, 4))
+        global_rotations[:,3] = 1.0
+        
+        for joint_idx, child_idx in zip(skeleton.bone_joints, skeleton.bone_children):
+            vec = global_positions[child_idx, :] - global_positions[joint_idx, :]
+            global_rotations[joint_idx, :] = R.align_vectors([vec], [frontal_direction])[0].as_quat() # (target, source)
+        
+        local_rotations = np.zeros((joints, 4))
+        local_rotations[:,3] = 1.0
+        
+        for bone_idx, parent_bone_idx in zip(skeleton.bone_joints, skeleton.bone_parents):
+            delta_rot = R.from_quat(global_rotations[parent_bone_idx]).inv() * R.from_quat(global_rotations[bone_idx])
+            local_rotations[bone_idx, :] = delta_rot.as_quat()
+        
+        return local_rotations
+    
+    
+    # compute global-rotation angles of the 1st frame
+    initial_rotations = computeLocalRotationsOfFrame(data_pos[0,:,:])
+    
+    
+    # compute local-rotation angles from the 1st frame
+    data_rot = np.zeros(data_pos.shape)
+    for f in range(1, frames):
+        rotations = computeLocalRotationsOfFrame(data_pos[f,:,:])
+        for j in range(joints):
+            delta_rot = R.from_quat(initial_rotations[j]).inv() * R.from_quat(rotations[j])
+            data_rot[f,j,:] = delta_rot.as_euler(rotation_order, degrees=True)
+        
+    return data_rot
@@ -0,0 +1,316 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# JIT-compiled (numba) versions of the rotation kernels of pos2rotation / quaternion_util
+#
+# numba is optional: is_available is False when it is not installed, and pos2rotation falls back to the NumPy kernels.
+# numba itself is imported by the first call of a kernel (not by importing this module), which keeps the start-up
+# of the CLIs and the process-pool workers that never compute rotations short.
+# compiled kernels are cached to disk (cache=True, i.e. __pycache__ next to this file or NUMBA_CACHE_DIR),
+# so the compile cost is paid only by the first run.
+#
+
+import math
+import importlib.util
+import numpy as np
+
+is_available = importlib.util.find_spec("numba") is not None
+
+
+#
+# import numba and define the kernels as globals of this module (once)
+#
+def _loadKernels():
+
+    global numba, _localRotationsKernel, _deltaEulerKernel
+    
+    if "_deltaEulerKernel" in globals():
+        return
+    
+    import numba
+
+    #
+    # local rotations of bone-joints by walking each bone (global shortest-arc rotation, then relative to the parent-bone)
+    # input-data format: ndarray(poses, joints, 3)
+    # output-data format: ndarray(poses, joints, 4) as quaternion (x, y, z, w)
+    #
+    @numba.njit(cache=True)
+    def _localRotationsKernel(global_positions, bone_joints, bone_children, bone_parents, frontal_direction):
+    
+        poses, joints, _ = global_positions.shape
+        sx, sy, sz = frontal_direction[0], frontal_direction[1], frontal_direction[2]
+        norm_source = math.sqrt(sx*sx + sy*sy + sz*sz)
+        
+        global_rotations = np.zeros((joints, 4))
+        local_rotations = np.zeros((poses, joints, 4))
+        local_rotations[:, :, 3] = 1.0
+        
+        for p in range(poses):
+        
+            global_rotations[:, :] = 0.0
+            global_rotations[:, 3] = 1.0
+            
+            # global-rotation: shortest-arc from frontal-direction to the bone
+            for b in range(bone_joints.shape[0]):
+                joint_idx = bone_joints[b]
+                child_idx = bone_children[b]
+                tx = np.float64(global_positions[p, child_idx, 0] - global_positions[p, joint_idx, 0])
+                ty = np.float64(global_positions[p, child_idx, 1] - global_positions[p, joint_idx, 1])
+                tz = np.float64(global_positions[p, child_idx, 2] - global_positions[p, joint_idx, 2])
+                norm_target = math.sqrt(tx*tx + ty*ty + tz*tz)
+                
+                x = sy*tz - sz*ty
+                y = sz*tx - sx*tz
+                z = sx*ty - sy*tx
+                w = norm_source * norm_target + sx*tx + sy*ty + sz*tz
+                
+                # anti-parallel vectors: rotate by 180 degrees around an axis orthogonal to the source (same choice as scipy)
+                if w <= 1e-12 * norm_source * norm_target:
+                    x, y, z, w = 0.0, sz, -sy, 0.0 # source x (1, 0, 0)
+                    if math.sqrt(y*y + z*z) <= 1e-12 * norm_source:
+                        x, y, z = -sz, 0.0, sx # source x (0, 1, 0)
+                
+                norm = math.sqrt(x*x + y*y + z*z + w*w)
+                global_rotations[joint_idx, 0] = x / norm
+                global_rotations[joint_idx, 1] = y / norm
+                global_rotations[joint_idx, 2] = z / norm
+                global_rotations[joint_idx, 3] = w / norm
+            
+            # local-rotation: conjugate(parent) * bone
+            for b in range(bone_joints.shape[0]):
+                joint_idx = bone_joints[b]
+                parent_idx = bone_parents[b]
+                x1 = -global_rotations[parent_idx, 0]
+                y1 = -global_rotations[parent_idx, 1]
+                z1 = -global_rotations[parent_idx, 2]
+                w1 =  global_rotations[parent_idx, 3]
+                x2, y2, z2, w2 = global_rotations[joint_idx, 0], global_rotations[joint_idx, 1], global_rotations[joint_idx, 2], global_rotations[joint_idx, 3]
+                local_rotations[p, joint_idx, 0] = w1*x2 + x1*w2 + y1*z2 - z1*y2
+                local_rotations[p, joint_idx, 1] = w1*y2 - x1*z2 + y1*w2 + z1*x2
+                local_rotations[p, joint_idx, 2] = w1*z2 + x1*y2 - y1*x2 + z1*w2
+                local_rotations[p, joint_idx, 3] = w1*w2 - x1*x2 - y1*y2 - z1*z2
+        
+        return local_rotations
+    
+    
+    
+    #
+    # euler-angles of conjugate(q_source) * q_target (see quaternion_util.quatToEuler() for the algorithm)
+    # input-data format: ndarray(num, 4), ndarray(num, 4)
+    # output-data format: ndarray(num, 3)
+    #
+    @numba.njit(cache=True)
+    def _deltaEulerKernel(q_target, q_source, i, j, k, is_symmetric, sign, is_extrinsic, is_degree):
+    
+        num = q_target.shape[0]
+        angles = np.empty((num, 3))
+        angle_first, angle_third = (0, 2) if is_extrinsic else (2, 0)
+        eps = 1e-7
+        
+        for n in range(num):
+        
+            # normalized quaternions
+            norm1 = math.sqrt(q_source[n, 0]**2 + q_source[n, 1]**2 + q_source[n, 2]**2 + q_source[n, 3]**2)
+            norm2 = math.sqrt(q_target[n, 0]**2 + q_target[n, 1]**2 + q_target[n, 2]**2 + q_target[n, 3]**2)
+            x1, y1, z1, w1 = -q_source[n, 0] / norm1, -q_source[n, 1] / norm1, -q_source[n, 2] / norm1, q_source[n, 3] / norm1
+            x2, y2, z2, w2 = q_target[n, 0] / norm2, q_target[n, 1] / norm2, q_target[n, 2] / norm2, q_target[n, 3] / norm2
+            
+            q = (
+                w1*x2 + x1*w2 + y1*z2 - z1*y2,
+                w1*y2 - x1*z2 + y1*w2 + z1*x2,
+                w1*z2 + x1*y2 - y1*x2 + z1*w2
+            )
+            w = w1*w2 - x1*x2 - y1*y2 - z1*z2
+            
+            if is_symmetric:
+                a, b, c, d = w, q[i], q[j], q[k] * sign
+            else:
+                a, b, c, d = w - q[j], q[i] + q[k] * sign, q[j] + w, q[k] * sign - q[i]
+            
+            angles[n, 1] = 2 * math.atan2(math.hypot(c, d), math.hypot(a, b))
+            
+            half_sum  = math.atan2(b, a)
+            half_diff = math.atan2(d, c)
+            
+            angles[n, angle_first] = half_sum - half_diff
+            angles[n, angle_third] = half_sum + half_diff
+            
+            # gimbal-lock: the last angle of the output is set to zero
+            if abs(angles[n, 1]) <= eps:
+                angles[n, 0] = 2 * half_sum
+                angles[n, 2] = 0.0
+            elif abs(angles[n, 1] - math.pi) <= eps:
+                angles[n, 0] = 2 * half_diff * (-1 if is_extrinsic else 1)
+                angles[n, 2] = 0.0
+            
+            # Tait-Bryan angles
+            if not is_symmetric:
+                angles[n, angle_third] *= sign
+                angles[n, 1] -= math.pi / 2
+            
+            for m in range(3):
+                if angles[n, m] < -math.pi:
+                    angles[n, m] += 2 * math.pi
+                elif angles[n, m] > math.pi:
+                    angles[n, m] -= 2 * math.pi
+                if is_degree:
+                    angles[n, m] = angles[n, m] * (180.0 / math.pi)
+        
+        return angles
+
+
+
+# whether numba is imported and the kernels are defined (i.e. no start-up cost is left)
+def isLoaded():
+
+    return "_deltaEulerKernel" in globals()
+
+
+
+# kernels accessed as attributes of this module (e.g. quaternion_jit._localRotationsKernel) are defined on first access
+def __getattr__(name):
+
+    if name in ("_localRotationsKernel", "_deltaEulerKernel") and is_available:
+        _loadKernels()
+        return globals()[name]
+    
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+
+#
+# JIT version of pos2rotation.computeLocalRotations() (quaternion output)
+# input-data format: ndarray(..., joints, 3)
+# output-data format: ndarray(..., joints, 4)
+#
+def computeLocalRotations(
+    global_positions,
+    skeleton,
+    frontal_direction = [0, 0, -1]
+    ):
+    
+    _loadKernels()
+    
+    # bone-vectors are computed in the precision of the input (as the NumPy kernels do)
+    dtype = global_positions.dtype if global_positions.dtype in (np.float32, np.float64) else np.float64
+    positions = np.ascontiguousarray(global_positions, dtype=dtype).reshape(-1, global_positions.shape[-2], 3)
+    local_rotations = _localRotationsKernel(
+        positions,
+        np.ascontiguousarray(skeleton.bone_joints, dtype=np.int64),
+        np.ascontiguousarray(skeleton.bone_children, dtype=np.int64),
+        np.ascontiguousarray(skeleton.bone_parents, dtype=np.int64),
+        np.asarray(frontal_direction, dtype=np.float64)
+    )
+    
+    return local_rotations.reshape(global_positions.shape[:-1] + (4,))
+
+
+
+#
+# axis-indices of rotation_order for _deltaEulerKernel(): (i, j, k, is_symmetric, sign, is_extrinsic)
+#
+def _eulerParameters(rotation_order):
+    
+    if len(rotation_order) != 3 or not (rotation_order.isupper() or rotation_order.islower()) \
+       or set(rotation_order.upper()) - set("XYZ"):
+        raise ValueError(f"Invalid rotation_order: {rotation_order}")
+    
+    is_extrinsic = rotation_order.islower()
+    seq = rotation_order.upper()
+    if not is_extrinsic:
+        seq = seq[::-1]
+    
+    i, j, k = (ord(axis) - ord('X') for axis in seq)
+    is_symmetric = (i == k)
+    if is_symmetric:
+        k = 3 - i - j
+    sign = (i - j) * (j - k) * (k - i) // 2
+    
+    return i, j, k, is_symmetric, sign, is_extrinsic
+
+
+
+#
+# JIT version of quaternion_util.quatToEuler(conjugate(quats_source) * quats_target)
+# input-data format: ndarray(..., 4) (broadcastable to each other)
+# output-data format: ndarray(..., 3)
+#
+def computeEulerDifference(
+    quats_target,
+    quats_source,
+    rotation_order = "XYZ",
+    is_degree = True
+    ):
+    
+    _loadKernels()
+    
+    quats_target = np.asarray(quats_target, dtype=np.float64)
+    quats_source = np.asarray(quats_source, dtype=np.float64)
+    shape = np.broadcast_shapes(quats_target.shape, quats_source.shape)
+    
+    angles = _deltaEulerKernel(
+        np.ascontiguousarray(np.broadcast_to(quats_target, shape)).reshape(-1, 4),
+        np.ascontiguousarray(np.broadcast_to(quats_source, shape)).reshape(-1, 4),
+        *_eulerParameters(rotation_order), is_degree
+    )
+    
+    return angles.reshape(shape[:-1] + (3,))
+
+
+
+#
+# accuracy check against the NumPy kernels
+#
+if __name__ == "__main__":
+
+    import time
+    import skeleton_util
+    from quaternion_util import quatMultiply, quatConjugate, quatFromTwoVectors, quatToEuler
+    
+    if not is_available:
+        raise SystemExit("numba is not installed.")
+    
+    rng = np.random.default_rng(0)
+    
+    # compile (or load from the disk-cache)
+    start = time.perf_counter()
+    skeleton = skeleton_util.getSkeleton(22)
+    computeLocalRotations(rng.normal(size=(1, 22, 3)), skeleton)
+    computeEulerDifference(rng.normal(size=(1, 4)), rng.normal(size=(1, 4)), "XYZ")
+    print(f"compile / cache-load: {time.perf_counter() - start:.2f} s")
+    
+    for num_joints in [21, 22, 24]:
+        skeleton = skeleton_util.getSkeleton(num_joints)
+        positions = rng.normal(size=(100, num_joints, 3))
+        positions[0, skeleton.bone_children] = positions[0, skeleton.bone_joints] + [0, 0, 1] # anti-parallel to frontal-direction
+        
+        global_rotations = np.zeros((100, num_joints, 4))
+        global_rotations[..., 3] = 1.0
+        vectors = positions[:, skeleton.bone_children] - positions[:, skeleton.bone_joints]
+        global_rotations[:, skeleton.bone_joints] = quatFromTwoVectors(vectors, [0, 0, -1])
+        local_ref = np.zeros((100, num_joints, 4))
+        local_ref[..., 3] = 1.0
+        local_ref[:, skeleton.bone_joints] = quatMultiply(quatConjugate(global_rotations[:, skeleton.bone_parents]), global_rotations[:, skeleton.bone_joints])
+        
+        error = np.abs(computeLocalRotations(positions, skeleton) - local_ref).max()
+        print(f"local rotations ({num_joints} joints): max error = {error:.2e}")
+        assert error < 1e-12
+    
+    q1 = rng.normal(size=(10000, 4))
+    q2 = rng.normal(size=(10000, 4))
+    q2[:3] = q1[:3] # identity
+    for rotation_order in ["XYZ", "XZY", "YXZ", "YZX", "ZXY", "ZYX", "xyz", "zyx"]:
+        euler_ref = quatToEuler(quatMultiply(quatConjugate(q2 / np.linalg.norm(q2, axis=-1, keepdims=True)), q1 / np.linalg.norm(q1, axis=-1, keepdims=True)), rotation_order)
+        error = np.abs(computeEulerDifference(q1, q2, rotation_order) - euler_ref).max()
+        print(f"euler difference ({rotation_order}): max error = {error:.2e}")
+        assert error < 1e-9
+    
+    print("OK")
@@ -0,0 +1,328 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# torch versions of the quaternion kernels of quaternion_util and the rotation kernels of pos2rotation
+#
+# quaternions are torch.Tensor(..., 4) as (x, y, z, w), computed in float64 on the device of the input,
+# so that model outputs can be converted without the round-trip to NumPy.
+# pos2rotation dispatches torch.Tensor inputs to this module.
+#
+
+import torch
+
+
+#
+# quaternions of identity-rotation as tensor(*shape, 4)
+#
+def quatIdentity(shape, device=None):
+
+    quats = torch.zeros(tuple(shape) + (4,), dtype=torch.float64, device=device)
+    quats[..., 3] = 1.0
+    
+    return quats
+
+
+
+#
+# multiply quaternions (q1 * q2 = rotation q2 followed by q1)
+# input-data format: tensor(..., 4)
+#
+def quatMultiply(q1, q2):
+
+    x1, y1, z1, w1 = q1.unbind(-1)
+    x2, y2, z2, w2 = q2.unbind(-1)
+    
+    return torch.stack([
+        w1*x2 + x1*w2 + y1*z2 - z1*y2,
+        w1*y2 - x1*z2 + y1*w2 + z1*x2,
+        w1*z2 + x1*y2 - y1*x2 + z1*w2,
+        w1*w2 - x1*x2 - y1*y2 - z1*z2
+    ], dim=-1)
+
+
+
+#
+# conjugate of quaternions, which is the inverse rotation of unit-quaternions
+# input-data format: tensor(..., 4)
+#
+def quatConjugate(q):
+    return q * torch.tensor([-1.0, -1.0, -1.0, 1.0], dtype=q.dtype, device=q.device)
+
+
+
+#
+# inverse of (not necessarily normalized) quaternions
+# input-data format: tensor(..., 4)
+#
+def quatInverse(q):
+    return quatConjugate(q) / torch.sum(q * q, dim=-1, keepdim=True)
+
+
+
+#
+# normalize quaternions to unit-length
+# input-data format: tensor(..., 4)
+#
+def quatNormalize(q):
+    return q / torch.linalg.norm(q, dim=-1, keepdim=True)
+
+
+
+#
+# compute the shortest-arc rotations which align vectors_source to vectors_target
+# input-data format: tensor(..., 3)
+# output-data format: tensor(..., 4)
+#
+def quatFromTwoVectors(
+    vectors_target,
+    vectors_source
+    ):
+    
+    vectors_target = torch.as_tensor(vectors_target, dtype=torch.float64)
+    vectors_source = torch.as_tensor(vectors_source, dtype=torch.float64, device=vectors_target.device)
+    vectors_target, vectors_source = torch.broadcast_tensors(vectors_target, vectors_source)
+    
+    norm_target = torch.linalg.norm(vectors_target, dim=-1)
+    norm_source = torch.linalg.norm(vectors_source, dim=-1)
+    
+    xyz = torch.linalg.cross(vectors_source, vectors_target, dim=-1)
+    w   = norm_source * norm_target + torch.sum(vectors_source * vectors_target, dim=-1)
+    
+    # anti-parallel vectors: rotate by 180 degrees around an axis orthogonal to the source (same choice as scipy)
+    is_opposite = w <= 1e-12 * norm_source * norm_target
+    if torch.any(is_opposite):
+        axis_x = torch.linalg.cross(vectors_source, torch.tensor([1.0, 0.0, 0.0], dtype=torch.float64, device=xyz.device).expand_as(vectors_source), dim=-1)
+        axis_y = torch.linalg.cross(vectors_source, torch.tensor([0.0, 1.0, 0.0], dtype=torch.float64, device=xyz.device).expand_as(vectors_source), dim=-1)
+        is_parallel_to_x = torch.linalg.norm(axis_x, dim=-1) <= 1e-12 * norm_source
+        axis = torch.where(is_parallel_to_x[..., None], axis_y, axis_x)
+        xyz = torch.where(is_opposite[..., None], axis, xyz)
+        w   = torch.where(is_opposite, torch.zeros_like(w), w)
+    
+    return quatNormalize(torch.cat([xyz, w[..., None]], dim=-1))
+
+
+
+#
+# convert quaternions to euler-angles (see quaternion_util.quatToEuler())
+# input-data format: tensor(..., 4)
+# output-data format: tensor(..., 3)
+#
+def quatToEuler(
+    q,
+    rotation_order = "XYZ",
+    is_degree = True
+    ):
+    
+    if len(rotation_order) != 3 or not (rotation_order.isupper() or rotation_order.islower()) \
+       or set(rotation_order.upper()) - set("XYZ"):
+        raise ValueError(f"Invalid rotation_order: {rotation_order}")
+    
+    is_extrinsic = rotation_order.islower()
+    seq = rotation_order.upper()
+    
+    # intrinsic rotation is computed as the extrinsic rotation of reversed order
+    if not is_extrinsic:
+        seq = seq[::-1]
+    
+    i, j, k = (ord(axis) - ord('X') for axis in seq)
+    is_symmetric = (i == k)
+    if is_symmetric:
+        k = 3 - i - j
+    sign = (i - j) * (j - k) * (k - i) // 2 # +1: even permutation, -1: odd permutation
+    
+    q = q.to(torch.float64)
+    w = q[..., 3]
+    if is_symmetric:
+        a, b, c, d = w, q[..., i], q[..., j], q[..., k] * sign
+    else:
+        a, b, c, d = w - q[..., j], q[..., i] + q[..., k] * sign, q[..., j] + w, q[..., k] * sign - q[..., i]
+    
+    angle_first, angle_third = (0, 2) if is_extrinsic else (2, 0)
+    angles = [None, None, None]
+    
+    angles[1] = 2 * torch.atan2(torch.hypot(c, d), torch.hypot(a, b))
+    
+    eps = 1e-7
+    is_case_zero = torch.abs(angles[1]) <= eps
+    is_case_pi   = torch.abs(angles[1] - torch.pi) <= eps
+    is_gimbal_locked = is_case_zero | is_case_pi
+    
+    half_sum  = torch.atan2(b, a)
+    half_diff = torch.atan2(d, c)
+    
+    angles[angle_first] = half_sum - half_diff
+    angles[angle_third] = half_sum + half_diff
+    
+    # gimbal-lock: the last angle of the output is set to zero
+    angles[0] = torch.where(is_case_zero, 2 * half_sum, angles[0])
+    angles[0] = torch.where(is_case_pi, 2 * half_diff * (-1 if is_extrinsic else 1), angles[0])
+    angles[2] = torch.where(is_gimbal_locked, torch.zeros_like(angles[2]), angles[2])
+    
+    # Tait-Bryan angles
+    if not is_symmetric:
+        angles[angle_third] = angles[angle_third] * sign
+        angles[1] = angles[1] - torch.pi / 2
+    
+    angles = torch.stack(angles, dim=-1)
+    
+    # wrap into [-pi, pi]
+    angles = torch.where(angles < -torch.pi, angles + 2*torch.pi, angles)
+    angles = torch.where(angles > torch.pi, angles - 2*torch.pi, angles)
+    
+    if is_degree:
+        angles = torch.rad2deg(angles)
+    
+    return angles
+
+
+
+#
+# spherical linear interpolation between quaternions along the shortest path
+# input-data format: q1, q2 = tensor(..., 4), t = scalar or tensor(...) in [0, 1]
+# output-data format: tensor(..., 4)
+#
+def quatSlerp(q1, q2, t):
+
+    q1 = quatNormalize(q1.to(torch.float64))
+    q2 = quatNormalize(q2.to(torch.float64))
+    t  = torch.as_tensor(t, dtype=torch.float64, device=q1.device)[..., None]
+    
+    dot = torch.sum(q1 * q2, dim=-1, keepdim=True)
+    
+    # q and -q are the same rotation: take the shorter arc
+    q2  = torch.where(dot < 0, -q2, q2)
+    dot = torch.abs(dot)
+    
+    theta = torch.arccos(torch.clamp(dot, -1.0, 1.0))
+    sin_theta = torch.sin(theta)
+    
+    # fall back to linear interpolation for (nearly) identical rotations
+    is_small = sin_theta < 1e-6
+    safe_sin_theta = torch.where(is_small, torch.ones_like(sin_theta), sin_theta)
+    weight1 = torch.where(is_small, 1.0 - t, torch.sin((1.0 - t) * theta) / safe_sin_theta)
+    weight2 = torch.where(is_small, t, torch.sin(t * theta) / safe_sin_theta)
+    
+    return quatNormalize(weight1 * q1 + weight2 * q2)
+
+
+
+#
+# torch version of pos2rotation.computeRotationDifference()
+# input-data format: tensor(..., 4) (broadcastable to each other)
+#
+def computeRotationDifference(
+    quats_target,
+    quats_source,
+    is_euler = False,
+    rotation_order = "XYZ",
+    is_degree = True
+    ):
+    
+    delta_quats = quatMultiply(quatConjugate(quatNormalize(quats_source)), quatNormalize(quats_target))
+    
+    if is_euler:
+        return quatToEuler(delta_quats, rotation_order, is_degree)
+    else:
+        return delta_quats
+
+
+
+#
+# torch version of pos2rotation.computeGlobalRotations() (quaternion output)
+# input-data format: tensor(..., joints, 3)
+# output-data format: tensor(..., joints, 4)
+#
+def computeGlobalRotations(
+    global_positions,
+    skeleton,
+    frontal_direction = [0, 0, -1]
+    ):
+    
+    device = global_positions.device
+    bone_joints   = torch.tensor(skeleton.bone_joints.tolist(), device=device)
+    bone_children = torch.tensor(skeleton.bone_children.tolist(), device=device)
+    
+    global_rotations = quatIdentity(global_positions.shape[:-1], device=device)
+    
+    # bone-vectors are computed in the precision of the input (as the NumPy kernels do)
+    vectors = global_positions[..., bone_children, :] - global_positions[..., bone_joints, :]
+    global_rotations[..., bone_joints, :] = quatFromTwoVectors(
+        vectors,
+        torch.as_tensor(frontal_direction, dtype=torch.float64, device=device)
+    )
+    
+    return global_rotations
+
+
+
+#
+# torch version of pos2rotation.computeLocalRotations() (quaternion output)
+# input-data format: tensor(..., joints, 3)
+# output-data format: tensor(..., joints, 4)
+#
+def computeLocalRotations(
+    global_positions,
+    skeleton,
+    frontal_direction = [0, 0, -1]
+    ):
+    
+    global_rotations = computeGlobalRotations(global_positions, skeleton, frontal_direction)
+    
+    device = global_positions.device
+    bone_joints  = torch.tensor(skeleton.bone_joints.tolist(), device=device)
+    bone_parents = torch.tensor(skeleton.bone_parents.tolist(), device=device)
+    
+    local_rotations = quatIdentity(global_rotations.shape[:-1], device=device)
+    local_rotations[..., bone_joints, :] = computeRotationDifference(
+        global_rotations[..., bone_joints, :],
+        global_rotations[..., bone_parents, :]
+    )
+    
+    return local_rotations
+
+
+
+#
+# accuracy check against the NumPy kernels
+#
+if __name__ == "__main__":
+
+    import numpy as np
+    import quaternion_util
+    
+    rng = np.random.default_rng(0)
+    q1 = rng.normal(size=(10000, 4))
+    q2 = rng.normal(size=(10000, 4))
+    
+    def report(name, error, tolerance):
+        print(f"{name:<24}: max error = {error:.2e} (tolerance {tolerance:.0e})")
+        assert error < tolerance, name
+    
+    report("multiply", np.abs(quatMultiply(torch.from_numpy(q1), torch.from_numpy(q2)).numpy() - quaternion_util.quatMultiply(q1, q2)).max(), 1e-12)
+    report("inverse", np.abs(quatInverse(torch.from_numpy(q1)).numpy() - quaternion_util.quatInverse(q1)).max(), 1e-12)
+    
+    v_target = rng.normal(size=(1000, 3))
+    v_source = rng.normal(size=(1000, 3))
+    v_target[:2] = -v_source[:2]
+    v_source[1] = [1, 0, 0]
+    v_target[1] = [-1, 0, 0]
+    report("shortest-arc", np.abs(quatFromTwoVectors(torch.from_numpy(v_target), torch.from_numpy(v_source)).numpy() - quaternion_util.quatFromTwoVectors(v_target, v_source)).max(), 1e-12)
+    
+    q_gimbal = np.array([[0.5, 0.5, 0.5, 0.5], [0, 0, 0, 1.0], [1.0, 0, 0, 0]])
+    q_euler = quaternion_util.quatNormalize(np.concatenate([q1, q_gimbal]))
+    for rotation_order in ["XYZ", "XZY", "YXZ", "YZX", "ZXY", "ZYX", "xyz", "zyx"]:
+        euler = quatToEuler(torch.from_numpy(q_euler), rotation_order).numpy()
+        report(f"euler {rotation_order}", np.abs(euler - quaternion_util.quatToEuler(q_euler, rotation_order)).max(), 1e-9)
+    
+    t = rng.uniform(size=10000)
+    report("slerp", np.abs(quatSlerp(torch.from_numpy(q1), torch.from_numpy(q2), torch.from_numpy(t)).numpy() - quaternion_util.quatSlerp(q1, q2, t)).max(), 1e-9)
+    
+    print("OK")
@@ -0,0 +1,307 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# quaternion kernels on ndarray(..., 4)
+#
+# quaternions are stored as (x, y, z, w) (scalar-last) in the same manner as scipy.spatial.transform.Rotation,
+# and every function works on arbitrarily batched arrays by broadcasting over the leading axes.
+#
+
+import numpy as np
+
+
+#
+# multiply quaternions (q1 * q2 = rotation q2 followed by q1)
+# input-data format: ndarray(..., 4)
+#
+def quatMultiply(q1, q2):
+
+    x1, y1, z1, w1 = q1[..., 0], q1[..., 1], q1[..., 2], q1[..., 3]
+    x2, y2, z2, w2 = q2[..., 0], q2[..., 1], q2[..., 2], q2[..., 3]
+    
+    return np.stack([
+        w1*x2 + x1*w2 + y1*z2 - z1*y2,
+        w1*y2 - x1*z2 + y1*w2 + z1*x2,
+        w1*z2 + x1*y2 - y1*x2 + z1*w2,
+        w1*w2 - x1*x2 - y1*y2 - z1*z2
+    ], axis=-1)
+
+
+
+#
+# conjugate of quaternions, which is the inverse rotation of unit-quaternions
+# input-data format: ndarray(..., 4)
+#
+def quatConjugate(q):
+
+    q_conj = np.array(q, dtype=np.float64, copy=True)
+    q_conj[..., :3] *= -1
+    
+    return q_conj
+
+
+
+#
+# inverse of (not necessarily normalized) quaternions
+# input-data format: ndarray(..., 4)
+#
+def quatInverse(q):
+    return quatConjugate(q) / np.sum(np.square(q), axis=-1, keepdims=True)
+
+
+
+#
+# normalize quaternions to unit-length
+# input-data format: ndarray(..., 4)
+#
+def quatNormalize(q):
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+
+#
+# compute the shortest-arc rotations which align vectors_source to vectors_target
+# this gives the same rotation as R.align_vectors([target], [source]) for each single vector-pair
+# input-data format: ndarray(..., 3)
+# output-data format: ndarray(..., 4)
+#
+def quatFromTwoVectors(
+    vectors_target,
+    vectors_source
+    ):
+    
+    vectors_target = np.asarray(vectors_target, dtype=np.float64)
+    vectors_source = np.asarray(vectors_source, dtype=np.float64)
+    vectors_target, vectors_source = np.broadcast_arrays(vectors_target, vectors_source)
+    
+    norm_target = np.linalg.norm(vectors_target, axis=-1)
+    norm_source = np.linalg.norm(vectors_source, axis=-1)
+    
+    quats = np.empty(vectors_target.shape[:-1] + (4,))
+    quats[..., :3] = np.cross(vectors_source, vectors_target)
+    quats[..., 3]  = norm_source * norm_target + np.sum(vectors_source * vectors_target, axis=-1)
+    
+    # anti-parallel vectors: rotate by 180 degrees around an axis orthogonal to the source (same choice as scipy)
+    is_opposite = quats[..., 3] <= 1e-12 * norm_source * norm_target
+    if np.any(is_opposite):
+        source = vectors_source[is_opposite]
+        axis = np.cross(source, [1.0, 0.0, 0.0])
+        is_parallel_to_x = np.linalg.norm(axis, axis=-1) <= 1e-12 * np.linalg.norm(source, axis=-1)
+        axis[is_parallel_to_x] = np.cross(source[is_parallel_to_x], [0.0, 1.0, 0.0])
+        quats[is_opposite, :3] = axis
+        quats[is_opposite, 3]  = 0.0
+    
+    return quatNormalize(quats)
+
+
+
+#
+# convert quaternions to euler-angles
+# rotation_order: "XYZ", "ZYX", ... (upper-case: intrinsic, lower-case: extrinsic) in the same manner as scipy
+# the angles follow rotation_order, i.e. output[..., 0] is the angle around rotation_order[0]
+# input-data format: ndarray(..., 4)
+# output-data format: ndarray(..., 3)
+#
+# algorithm: E. Bernardes and S. Viollet, "Quaternion to Euler angles conversion: A direct, general and computationally efficient method", 2022
+# (the same method as scipy, so that angles match including the gimbal-locked cases)
+#
+def quatToEuler(
+    q,
+    rotation_order = "XYZ",
+    is_degree = True
+    ):
+    
+    if len(rotation_order) != 3 or not (rotation_order.isupper() or rotation_order.islower()) \
+       or set(rotation_order.upper()) - set("XYZ"):
+        raise ValueError(f"Invalid rotation_order: {rotation_order}")
+    
+    is_extrinsic = rotation_order.islower()
+    seq = rotation_order.upper()
+    
+    # intrinsic rotation is computed as the extrinsic rotation of reversed order
+    if not is_extrinsic:
+        seq = seq[::-1]
+    
+    i, j, k = (ord(axis) - ord('X') for axis in seq)
+    is_symmetric = (i == k)
+    if is_symmetric:
+        k = 3 - i - j
+    sign = (i - j) * (j - k) * (k - i) // 2 # +1: even permutation, -1: odd permutation
+    
+    q = np.asarray(q, dtype=np.float64)
+    w = q[..., 3]
+    if is_symmetric:
+        a, b, c, d = w, q[..., i], q[..., j], q[..., k] * sign
+    else:
+        a, b, c, d = w - q[..., j], q[..., i] + q[..., k] * sign, q[..., j] + w, q[..., k] * sign - q[..., i]
+    
+    angles = np.empty(q.shape[:-1] + (3,))
+    angle_first, angle_third = (0, 2) if is_extrinsic else (2, 0)
+    
+    angles[..., 1] = 2 * np.arctan2(np.hypot(c, d), np.hypot(a, b))
+    
+    eps = 1e-7
+    is_case_zero = np.abs(angles[..., 1]) <= eps
+    is_case_pi   = np.abs(angles[..., 1] - np.pi) <= eps
+    is_gimbal_locked = is_case_zero | is_case_pi
+    
+    half_sum  = np.arctan2(b, a)
+    half_diff = np.arctan2(d, c)
+    
+    angles[..., angle_first] = half_sum - half_diff
+    angles[..., angle_third] = half_sum + half_diff
+    
+    # gimbal-lock: the last angle of the output is set to zero
+    if np.any(is_gimbal_locked):
+        angles[..., 0] = np.where(
+            is_case_zero,
+            2 * half_sum,
+            np.where(is_case_pi, 2 * half_diff * (-1 if is_extrinsic else 1), angles[..., 0])
+        )
+        angles[..., 2] = np.where(is_gimbal_locked, 0.0, angles[..., 2])
+    
+    # Tait-Bryan angles
+    if not is_symmetric:
+        angles[..., angle_third] *= sign
+        angles[..., 1] -= np.pi / 2
+    
+    # wrap into [-pi, pi]
+    angles = np.where(angles < -np.pi, angles + 2*np.pi, angles)
+    angles = np.where(angles > np.pi, angles - 2*np.pi, angles)
+    
+    if is_degree:
+        angles = np.rad2deg(angles)
+    
+    return angles
+
+
+
+#
+# convert euler-angles to quaternions (inverse of quatToEuler())
+# rotation_order: "XYZ", "ZYX", ... (upper-case: intrinsic, lower-case: extrinsic) in the same manner as scipy
+# input-data format: ndarray(..., 3)
+# output-data format: ndarray(..., 4)
+#
+def quatFromEuler(
+    angles,
+    rotation_order = "XYZ",
+    is_degree = True
+    ):
+    
+    if len(rotation_order) != 3 or not (rotation_order.isupper() or rotation_order.islower()) \
+       or set(rotation_order.upper()) - set("XYZ"):
+        raise ValueError(f"Invalid rotation_order: {rotation_order}")
+    
+    angles = np.asarray(angles, dtype=np.float64)
+    if is_degree:
+        angles = np.deg2rad(angles)
+    
+    # rotation around each single axis
+    axis_quats = []
+    for n, axis in enumerate(rotation_order.upper()):
+        q = np.zeros(angles.shape[:-1] + (4,))
+        q[..., ord(axis) - ord('X')] = np.sin(angles[..., n] / 2)
+        q[..., 3] = np.cos(angles[..., n] / 2)
+        axis_quats.append(q)
+    
+    # intrinsic: q0 * q1 * q2, extrinsic: q2 * q1 * q0
+    if rotation_order.islower():
+        axis_quats = axis_quats[::-1]
+    
+    return quatMultiply(quatMultiply(axis_quats[0], axis_quats[1]), axis_quats[2])
+
+
+
+#
+# spherical linear interpolation between quaternions along the shortest path
+# input-data format: q1, q2 = ndarray(..., 4), t = scalar or ndarray(...) in [0, 1]
+# output-data format: ndarray(..., 4)
+#
+def quatSlerp(q1, q2, t):
+
+    q1 = quatNormalize(np.asarray(q1, dtype=np.float64))
+    q2 = quatNormalize(np.asarray(q2, dtype=np.float64))
+    t  = np.asarray(t, dtype=np.float64)[..., None]
+    
+    dot = np.sum(q1 * q2, axis=-1, keepdims=True)
+    
+    # q and -q are the same rotation: take the shorter arc
+    q2  = np.where(dot < 0, -q2, q2)
+    dot = np.abs(dot)
+    
+    theta = np.arccos(np.clip(dot, -1.0, 1.0))
+    sin_theta = np.sin(theta)
+    
+    # fall back to linear interpolation for (nearly) identical rotations
+    is_small = sin_theta < 1e-6
+    safe_sin_theta = np.where(is_small, 1.0, sin_theta)
+    weight1 = np.where(is_small, 1.0 - t, np.sin((1.0 - t) * theta) / safe_sin_theta)
+    weight2 = np.where(is_small, t, np.sin(t * theta) / safe_sin_theta)
+    
+    return quatNormalize(weight1 * q1 + weight2 * q2)
+
+
+
+#
+# accuracy check against scipy.spatial.transform.Rotation
+#
+if __name__ == "__main__":
+
+    import warnings
+    from scipy.spatial.transform import Rotation as R, Slerp
+    
+    rng = np.random.default_rng(0)
+    num = 100000
+    
+    q1 = R.random(num, random_state=1).as_quat()
+    q2 = R.random(num, random_state=2).as_quat()
+    
+    def report(name, error, tolerance):
+        print(f"{name:<24}: max error = {error:.2e} (tolerance {tolerance:.0e})")
+        assert error < tolerance, name
+    
+    # rotations are compared as matrices to ignore the sign-ambiguity of quaternions
+    def rotationError(q_a, q_b):
+        return np.abs(R.from_quat(q_a).as_matrix() - R.from_quat(q_b).as_matrix()).max()
+    
+    report("multiply", rotationError(quatMultiply(q1, q2), (R.from_quat(q1) * R.from_quat(q2)).as_quat()), 1e-12)
+    report("conjugate", rotationError(quatConjugate(q1), R.from_quat(q1).inv().as_quat()), 1e-12)
+    report("inverse (non-unit)", rotationError(quatInverse(q1 * 3.0), R.from_quat(q1).inv().as_quat()), 1e-12)
+    report("inverse * q = identity", np.abs(quatMultiply(quatInverse(q1 * 3.0), q1 * 3.0) - [0, 0, 0, 1]).max(), 1e-12)
+    
+    # shortest-arc
+    v_target = rng.normal(size=(1000, 3))
+    v_source = rng.normal(size=(1000, 3))
+    v_source[:4] = [[0, 0, -1], [1, 0, 0], [0, 1, 0], [1, 1, 1]]
+    v_target[:4] = -v_source[:4] # anti-parallel cases
+    q_ref = np.array([R.align_vectors([t], [s])[0].as_quat() for t, s in zip(v_target, v_source)])
+    report("shortest-arc", rotationError(quatFromTwoVectors(v_target, v_source), q_ref), 1e-12)
+    
+    # euler-angles (including gimbal-locked cases)
+    q_gimbal = R.from_euler("XYZ", [[10, 90, 20], [30, -90, 40], [0, 0, 0], [180, 0, 0]], degrees=True).as_quat()
+    q_euler = np.concatenate([q1, q_gimbal, -q1[:10]], axis=0)
+    for rotation_order in ["XYZ", "XZY", "YXZ", "YZX", "ZXY", "ZYX", "xyz", "xzy", "yxz", "yzx", "zxy", "zyx"]:
+        for is_degree in [True, False]:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore") # gimbal-lock warnings of scipy
+                euler_ref = R.from_quat(q_euler).as_euler(rotation_order, degrees=is_degree)
+            euler = quatToEuler(q_euler, rotation_order, is_degree)
+            report(f"euler {rotation_order} ({'deg' if is_degree else 'rad'})", np.abs(euler - euler_ref).max(), 1e-9)
+            report(f"from euler {rotation_order} ({'deg' if is_degree else 'rad'})",
+                   rotationError(quatFromEuler(euler_ref, rotation_order, is_degree), q_euler), 1e-9)
+    
+    # slerp
+    times = rng.uniform(size=num)
+    q_slerp_ref = np.array([Slerp([0, 1], R.from_quat([a, b]))([t]).as_quat()[0] for a, b, t in zip(q1[:1000], q2[:1000], times[:1000])])
+    report("slerp", rotationError(quatSlerp(q1[:1000], q2[:1000], times[:1000]), q_slerp_ref), 1e-9)
+    report("slerp (t=0, t=1)", max(rotationError(quatSlerp(q1, q2, 0.0), q1), rotationError(quatSlerp(q1, q2, 1.0), q2)), 1e-9)
+    
+    print("OK")
@@ -0,0 +1,189 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# persistent on-disk cache of pos2rot() results, addressed by the content of the clip
+#
+# key:   hash of the positions (bytes, dtype, shape), joint count, reference frame, rotation order and pos2rot_version
+# value: rotations ndarray(frames, joints, 3) saved as float64 .npy ("<cache_dir>/<key[:2]>/<key>.npy")
+#
+# files are written to a temporary file and renamed atomically, so that parallel workers can share a directory,
+# and the least-recently-used files (by modification time, which is refreshed on every hit) are evicted over max_bytes.
+# the size is re-measured on the directory after each write (once per batch in pos2rot()), so that the writes of
+# the other workers are counted: the limit is exceeded at most by the batches being written at the same time.
+#
+
+import os
+import glob
+import hashlib
+import tempfile
+import numpy as np
+from pos2rotation import pos2rot, pos2rot_version
+
+
+class RotationCache:
+
+    def __init__(
+        self,
+        cache_dir,
+        max_bytes = 2**30 # 1 GiB
+        ):
+        
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    
+    #
+    # key of a clip: ndarray(frames, joints, 3)
+    # reference_frame: frame whose pose is the reference of the rotations (pos2rot() uses the 1st frame)
+    #
+    def key(self, data_pos, rotation_order = "XYZ", reference_frame = 0):
+    
+        data_pos = np.ascontiguousarray(data_pos)
+        
+        hasher = hashlib.blake2b(digest_size=20)
+        hasher.update(f"pos2rot-v{pos2rot_version}|{data_pos.dtype.str}|{data_pos.shape}|joints={data_pos.shape[-2]}|"
+                      f"reference={reference_frame}|{rotation_order}|".encode())
+        hasher.update(memoryview(data_pos).cast("B"))
+        
+        return hasher.hexdigest()
+    
+    
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".npy")
+    
+    
+    # returns None on miss (including an entry whose shape differs from the expected shape)
+    def get(self, key, shape = None):
+    
+        path = self._path(key)
+        
+        try:
+            data_rot = np.load(path)
+            if shape is not None and data_rot.shape != tuple(shape):
+                raise ValueError(f"shape of the cached rotations {data_rot.shape} != {tuple(shape)}")
+            os.utime(path) # mark as recently used
+        except (FileNotFoundError, ValueError, EOFError, OSError):
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        
+        return data_rot
+    
+    
+    # evict = False: the size is not checked (the caller calls evict() after a batch of writes)
+    def put(self, key, data_rot, evict = True):
+    
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        # write to a temporary file in the same directory, then rename it atomically
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.asarray(data_rot, dtype=np.float64))
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        
+        self.writes += 1
+        
+        if evict:
+            self.evict()
+    
+    
+    #
+    # remove least-recently-used files until the total size is within max_bytes
+    # (the size is re-measured here since other processes may share the directory)
+    #
+    def evict(self):
+    
+        if self.max_bytes is None:
+            return
+        
+        entries = []
+        for path in glob.glob(os.path.join(self.cache_dir, "*", "*.npy")):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError: # removed by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+        
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+    
+    
+    def sizeOnDisk(self):
+    
+        total_bytes = 0
+        for path in glob.glob(os.path.join(self.cache_dir, "*", "*.npy")):
+            try:
+                total_bytes += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        
+        return total_bytes
+    
+    
+    def stats(self):
+        return dict(
+            hits = self.hits,
+            misses = self.misses,
+            writes = self.writes,
+            evictions = self.evictions
+        )
+    
+    
+    #
+    # pos2rot() of clips through the cache: ndarray([N,] frames, joints, 3)
+    # only the clips missing in the cache are computed (in one batched pass) and stored
+    #
+    def pos2rot(self, data_pos, rotation_order = "XYZ"):
+    
+        if data_pos.ndim == 3:
+            return self.pos2rot(data_pos[None], rotation_order)[0]
+        
+        keys = [self.key(clip, rotation_order) for clip in data_pos]
+        data_rot = np.empty(data_pos.shape)
+        
+        missing = []
+        for i, key in enumerate(keys):
+            cached = self.get(key, data_pos.shape[1:])
+            if cached is None:
+                missing.append(i)
+            else:
+                data_rot[i] = cached
+        
+        if missing:
+            data_rot[missing] = pos2rot(data_pos[missing], rotation_order)
+            for i in missing:
+                self.put(keys[i], data_rot[i], evict=False)
+            self.evict()
+        
+        return data_rot
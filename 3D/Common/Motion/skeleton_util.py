@@ -9,9 +9,8 @@
 # limitations under the License.
 
 import os
+import functools
 import numpy as np
-from mathutils import Matrix, Vector, Quaternion, Euler
-from scipy.spatial.transform import Rotation as R
 
 
 # https://meshcapade.wiki/SMPL#related-models-the-smpl-family
@@ -123,3 +122,81 @@ def getJointChains(num_joints):
     return joint_chains, junction_nodes
     
 
+
+
+#
+# compiled topology of the skeleton (see getSkeleton())
+#
+# parents:             ndarray(joints,) parent index of each joint (-1 for root)
+# topological_order:   ndarray(joints,) depth-first order of the joints from root (same order as BVH hierarchy)
+# is_leaf:             ndarray(joints,) True for end of each chain
+# is_junction:         ndarray(joints,) True for branching joints (start of each chain)
+# bone_joints:         ndarray(bones,) joints whose rotations can be estimated, i.e. chain[i] (1 <= i < len(chain)-1) except junctions
+# bone_children:       ndarray(bones,) child of each bone-joint (= chain[i+1])
+# bone_parents:        ndarray(bones,) parent of each bone-joint (= chain[i-1])
+# joint_names:         ndarray(joints,) SMPL joint names
+#
+class Skeleton:
+    
+    def __init__(self, num_joints):
+        
+        self.num_joints = num_joints
+        self.joint_chains, self.junction_nodes = getJointChains(num_joints)
+        
+        parents = np.full(num_joints, -1)
+        is_leaf = np.zeros(num_joints, dtype=bool)
+        is_junction = np.zeros(num_joints, dtype=bool)
+        bone_joints, bone_children, bone_parents = [], [], []
+        
+        for chain in self.joint_chains:
+            parents[chain[1:]] = chain[:-1]
+            is_leaf[chain[-1]] = True
+            is_junction[chain[0]] = True
+        
+        for chain in self.joint_chains:
+            for i in range(1, len(chain)-1):
+                if is_junction[chain[i]]: # rotation of branched-bones cannot be estimated
+                    continue
+                bone_joints.append(chain[i])
+                bone_children.append(chain[i+1])
+                bone_parents.append(chain[i-1])
+        
+        topological_order = [0] # joint[0] must be root
+        self._traverseChains(0, self.joint_chains, topological_order)
+        
+        self.parents = parents
+        self.topological_order = np.array(topological_order)
+        self.is_leaf = is_leaf
+        self.is_junction = is_junction
+        self.bone_joints = np.array(bone_joints)
+        self.bone_children = np.array(bone_children)
+        self.bone_parents = np.array(bone_parents)
+        self.joint_names = np.array(joint_names_smpl[:num_joints])
+        
+        # instances are shared by getSkeleton(), so they must not be modified
+        for array in (self.parents, self.topological_order, self.is_leaf, self.is_junction,
+                      self.bone_joints, self.bone_children, self.bone_parents, self.joint_names):
+            array.flags.writeable = False
+        
+    
+    # visit joints in the same depth-first order as writing BVH hierarchy
+    def _traverseChains(self, parent_index, joint_chains, order):
+        for i, chain in enumerate(joint_chains):
+            if chain[0] != parent_index:
+                continue
+            for joint_idx in chain[1:]:
+                order.append(joint_idx)
+                self._traverseChains(joint_idx, joint_chains[i+1:], order)
+        
+    
+    def __repr__(self):
+        return f"Skeleton(num_joints={self.num_joints})"
+
+
+
+#
+# get compiled topology of the skeleton, which is built once per joint-count and cached
+#
+@functools.lru_cache(maxsize=None)
+def getSkeleton(num_joints):
+    return Skeleton(num_joints)
@@ -0,0 +1,382 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# NumPy software rasterizer of stick-figure previews (the renderer="numpy" backend of plot_skeleton)
+#
+# draws the same scene as plot_skeleton.FrameRenderer (a floor under the motion, the root trajectory and the joint chains)
+# without matplotlib: joints are projected by the camera of Axes3D.view_init(elev=110, azim=-90) with ax.dist = 7.5,
+# and segments are drawn as anti-aliased lines (coverage by the distance to the segment) into an RGBA uint8 buffer.
+# all segments of all frames of a batch are rasterized at once, i.e. there is no Python loop per frame or per segment.
+# the floor is drawn as a grid (outline and lines every limits / 2), the title is not drawn.
+#
+
+import numpy as np
+
+
+# colors used by plot_skeleton (other names are resolved by matplotlib, if installed)
+COLOR_TABLE = {
+    "black": (0, 0, 0),
+    "white": (255, 255, 255),
+    "gray": (128, 128, 128),
+    "red": (255, 0, 0),
+    "blue": (0, 0, 255),
+    "darkred": (139, 0, 0),
+    "darkblue": (0, 0, 139),
+}
+
+# 2-D view-limits of Axes3D (the projected coordinates of the box are drawn in this range of a square viewport):
+# Axes3D.set_top_view() sets viewLim to (-0.95 / dist, 0.9 / dist) in both directions when the axes is created,
+# with the initial camera distance of 10 (setting ax.dist later does not change them)
+VIEW_LIMITS = (-0.95 / 10, 0.9 / 10)
+
+# norm of the box-aspect of Axes3D: set_box_aspect() scales the aspect (4, 4, 3) to this norm
+# ("default scale tuned to match the mpl32 appearance" in mpl_toolkits.mplot3d.axes3d, matplotlib >= 3.3)
+BOX_ASPECT_NORM = 1.8294640721620434
+
+
+# RGB of a color name or a tuple (in 0-1 or 0-255) as float32 in 0-255
+def _toRgb(color):
+
+    if isinstance(color, str):
+        if color in COLOR_TABLE:
+            return np.array(COLOR_TABLE[color], dtype=np.float32)
+        from matplotlib.colors import to_rgb
+        return np.array(to_rgb(color), dtype=np.float32) * 255
+    
+    color = np.asarray(color, dtype=np.float32)
+    
+    return color * 255 if color.max() <= 1.0 else color
+
+
+
+#
+# projection matrix of Axes3D.get_proj() (perspective, focal_length = 1, default box-aspect 4:4:3, vertical axis Z)
+# for the limits of plot_skeleton.init(): x, y in [-limits, limits] and z in [0, limits]
+# points are given as (x, y, z) of ax.plot3D(), i.e. (X, Y, Z) of the motion-data
+#
+def cameraMatrix(
+    limits,
+    elev = 110,
+    azim = -90,
+    dist = 7.5
+    ):
+    
+    box_aspect = np.array([4.0, 4.0, 3.0])
+    box_aspect *= BOX_ASPECT_NORM / np.linalg.norm(box_aspect)
+    
+    bounds = np.array([[-limits, limits], [-limits, limits], [0, limits]], dtype=np.float64)
+    scale = box_aspect / (bounds[:, 1] - bounds[:, 0])
+    world = np.eye(4)
+    world[:3, :3] = np.diag(scale)
+    world[:3, 3] = -bounds[:, 0] * scale
+    
+    center = 0.5 * box_aspect
+    elev_rad = np.deg2rad((elev + 180) % 360 - 180)
+    azim_rad = np.deg2rad((azim + 180) % 360 - 180)
+    eye = center + dist * np.array([np.cos(elev_rad) * np.cos(azim_rad), np.cos(elev_rad) * np.sin(azim_rad), np.sin(elev_rad)])
+    up = np.array([0.0, 0.0, -1.0 if abs(elev_rad) > 0.5 * np.pi else 1.0])
+    
+    n = (eye - center) / np.linalg.norm(eye - center)
+    u = np.cross(up, n)
+    u /= np.linalg.norm(u)
+    v = np.cross(n, u)
+    view = np.eye(4)
+    view[:3, :3] = [u, v, n]
+    view = view @ np.block([[np.eye(3), -eye[:, None]], [np.zeros((1, 3)), np.ones((1, 1))]])
+    
+    zfront, zback = -dist, dist
+    projection = np.array([
+        [1.0, 0.0, 0.0, 0.0],
+        [0.0, 1.0, 0.0, 0.0],
+        [0.0, 0.0, (zfront + zback) / (zfront - zback), -2 * (zfront * zback) / (zfront - zback)],
+        [0.0, 0.0, -1.0, 0.0]
+    ])
+    
+    return projection @ view @ world
+
+
+
+#
+# clip 2-D segments ndarray(S, 2) to the rectangle [0, width] x [0, height] (Liang-Barsky)
+# returns: (p0, p1, mask of the segments which are (partly) inside)
+#
+def _clipSegments(p0, p1, width, height):
+
+    d = p1 - p0
+    t0 = np.zeros(len(p0))
+    t1 = np.ones(len(p0))
+    inside = np.ones(len(p0), dtype=bool)
+    
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for axis, size in ((0, width), (1, height)):
+            for p, q in ((-d[:, axis], p0[:, axis]), (d[:, axis], size - p0[:, axis])):
+                parallel = p == 0
+                inside &= ~(parallel & (q < 0))
+                t = q / p
+                t0 = np.where(~parallel & (p < 0), np.maximum(t0, t), t0)
+                t1 = np.where(~parallel & (p > 0), np.minimum(t1, t), t1)
+    
+    inside &= t0 <= t1
+    
+    return p0 + t0[:, None] * d, p0 + t1[:, None] * d, inside
+
+
+
+#
+# anti-aliased thick segments as coverage of pixels
+# p0, p1: ndarray(S, 2) of (x, y) in pixels (the center of pixel (row, col) is (col + 0.5, row + 0.5))
+# frame_ids: ndarray(S) of the frame (in the batch) of each segment
+# returns: (flat indices of pixels in the (frames, height, width) buffer, coverage in (0, 1]), with duplicates
+#
+# each segment is walked along its major axis: per column (or row) the span of pixels that can be covered is computed
+# (clipped to the image), then the coverage of each pixel of the spans is clip(linewidth / 2 + 0.5 - distance, 0, 1),
+# where the distance to the segment is advanced incrementally from the start of the span
+#
+def _rasterizeSegments(p0, p1, frame_ids, linewidth, width, height):
+
+    reach = 0.5 * linewidth + 0.5
+    
+    # segments in (major, minor) coordinates, from the smaller major coordinate
+    steep = np.abs(p1[:, 1] - p0[:, 1]) > np.abs(p1[:, 0] - p0[:, 0])
+    a0 = np.where(steep, p0[:, 1], p0[:, 0])
+    a1 = np.where(steep, p1[:, 1], p1[:, 0])
+    b0 = np.where(steep, p0[:, 0], p0[:, 1])
+    b1 = np.where(steep, p1[:, 0], p1[:, 1])
+    swap = a1 < a0
+    a0, a1, b0, b1 = np.where(swap, a1, a0), np.where(swap, a0, a1), np.where(swap, b1, b0), np.where(swap, b0, b1)
+    
+    length = np.hypot(a1 - a0, b1 - b0)
+    unit_a = np.divide(a1 - a0, length, out=np.ones_like(length), where=length > 0)
+    unit_b = np.divide(b1 - b0, length, out=np.zeros_like(length), where=length > 0)
+    half_span = reach / unit_a # minor extent of the line around its center-line
+    major_size = np.where(steep, height, width)
+    minor_size = np.where(steep, width, height)
+    
+    # columns of each segment: pixel-centers within reach of [a0, a1] (and in the image)
+    col_start = np.maximum(np.ceil(a0 - reach - 0.5), 0)
+    num_cols = np.maximum(np.minimum(np.floor(a1 + reach - 0.5), major_size - 1) - col_start + 1, 0).astype(np.intp)
+    
+    segment = np.repeat(np.arange(len(p0)), num_cols)
+    a = col_start[segment] + (np.arange(len(segment)) - np.repeat(np.cumsum(num_cols) - num_cols, num_cols))
+    a0_s, b0_s = a0[segment], b0[segment]
+    center = b0_s + unit_b[segment] / unit_a[segment] * (np.clip(a + 0.5, a0_s, a1[segment]) - a0_s)
+    row_start = np.maximum(np.floor(center - half_span[segment] - 0.5) + 1, 0)
+    row_end = np.minimum(np.ceil(center + half_span[segment] - 0.5) - 1, minor_size[segment] - 1)
+    num_rows = np.maximum(row_end - row_start + 1, 0).astype(np.intp)
+    
+    # per column: (along, across) of the first pixel in the frame of the segment, their steps per pixel,
+    # and the flat index of the first pixel and its step
+    unit_a_s, unit_b_s = unit_a[segment], unit_b[segment]
+    da = a + 0.5 - a0_s
+    db = row_start + 0.5 - b0_s
+    along = (da * unit_a_s + db * unit_b_s).astype(np.float32)
+    across = (db * unit_a_s - da * unit_b_s).astype(np.float32)
+    steep_s = steep[segment]
+    x = np.where(steep_s, row_start, a).astype(np.intp)
+    y = np.where(steep_s, a, row_start).astype(np.intp)
+    first_index = (frame_ids[segment] * height + y) * width + x
+    index_step = np.where(steep_s, 1, width)
+    
+    # pixels of the columns
+    pixel_col = np.repeat(np.arange(len(segment)), num_rows)
+    k = np.arange(len(pixel_col)) - np.repeat(np.cumsum(num_rows) - num_rows, num_rows)
+    k_float = k.astype(np.float32)
+    
+    along_p = along[pixel_col] + k_float * unit_b_s.astype(np.float32)[pixel_col]
+    across_p = across[pixel_col] + k_float * unit_a_s.astype(np.float32)[pixel_col]
+    along_p -= np.minimum(np.maximum(along_p, 0), length.astype(np.float32)[segment][pixel_col])
+    coverage = np.minimum(np.float32(reach) - np.sqrt(along_p * along_p + across_p * across_p), np.float32(1.0))
+    
+    valid = coverage > 0
+    indices = first_index[pixel_col] + k * index_step[pixel_col]
+    
+    return indices[valid], coverage[valid]
+
+
+
+#
+# renderer of stick-figures into RGBA uint8 frames, with the inputs of plot_skeleton.FrameRenderer
+# (data: root-centered positions, trajec: root-trajectory on XZ, MINS / MAXS of the clip)
+# linewidths: widths of the joint_chains in pixels (default: 3 px for the first 5 chains and 2 px for the others at 320 px)
+#
+class StickFigureRenderer:
+
+    def __init__(
+        self,
+        joint_chains,
+        limits,
+        colors,
+        width = 320,
+        height = 320,
+        linewidths = None,
+        floor_color = "gray",
+        floor_opacity = 0.5,
+        trajectory_color = "blue"
+        ):
+        
+        self.joint_chains = [np.asarray(chain, dtype=np.intp) for chain in joint_chains]
+        self.limits = limits
+        self.width = width
+        self.height = height
+        self.colors = [_toRgb(color) for color in colors[:len(joint_chains)]]
+        
+        side = min(width, height)
+        if linewidths is None:
+            linewidths = [(3.0 if i < 5 else 2.0) * max(side / 320, 1 / 2) for i in range(len(joint_chains))]
+        self.linewidths = linewidths
+        self.thin_linewidth = max(side / 320, 1.0)
+        
+        self.floor_color = _toRgb(floor_color)
+        self.floor_opacity = floor_opacity
+        self.trajectory_color = _toRgb(trajectory_color)
+        
+        # camera and viewport (a square of the smaller side at the center, as the axes of matplotlib)
+        self.camera = cameraMatrix(limits)
+        self.pixel_scale = side / (VIEW_LIMITS[1] - VIEW_LIMITS[0])
+        self.pixel_origin = np.array([0.5 * (width - side), 0.5 * (height - side)])
+        
+        self._coverage = np.zeros(0, dtype=np.float32)
+    
+    
+    # points ndarray(..., 3) -> pixel coordinates ndarray(..., 2) (x right, y down)
+    def project(self, points):
+    
+        points = np.asarray(points, dtype=np.float64)
+        projected = points @ self.camera[:, :3].T + self.camera[:, 3]
+        xy = projected[..., :2] / projected[..., 3:]
+        
+        pixels = np.empty(xy.shape)
+        pixels[..., 0] = self.pixel_origin[0] + (xy[..., 0] - VIEW_LIMITS[0]) * self.pixel_scale
+        pixels[..., 1] = self.pixel_origin[1] + (VIEW_LIMITS[1] - xy[..., 1]) * self.pixel_scale
+        
+        return pixels
+    
+    
+    # draw 3-D segments ndarray(S, 3) of frame_ids into the frames, blended by their coverage (overlaps take the maximum)
+    def _drawSegments(self, frames, p0, p1, frame_ids, linewidth, color, opacity = 1.0):
+    
+        if len(p0) == 0:
+            return
+        
+        p0, p1, inside = _clipSegments(self.project(p0), self.project(p1), self.width, self.height)
+        indices, coverage = _rasterizeSegments(p0[inside], p1[inside], frame_ids[inside], linewidth, self.width, self.height)
+        
+        np.maximum.at(self._coverage, indices, coverage)
+        alpha = (self._coverage[indices, None] * np.float32(256 * opacity) + np.float32(0.5)).astype(np.uint16)
+        self._coverage[indices] = 0.0
+        
+        # pixels are gathered / scattered as uint32 (RGBA) and blended in 8-bit fixed-point,
+        # duplicates of a pixel write the same value
+        pixels = frames.reshape(-1).view(np.uint32)
+        rgba = pixels[indices].view(np.uint8).reshape(-1, 4).astype(np.uint16)
+        rgba *= 256 - alpha
+        rgba += np.append(color, 255).astype(np.uint16) * alpha + 128 # alpha-channel stays 255
+        pixels[indices] = (rgba >> 8).astype(np.uint8).view(np.uint32).ravel()
+    
+    
+    #
+    # grid on the floor (Y = 0) over [MINS, MAXS] of XZ, moving with the root as the floor of FrameRenderer
+    # lines are limited to 2 * limits around the root, where the camera sees them
+    #
+    def _floorSegments(self, trajec, MINS, MAXS, frame_indices):
+    
+        spacing = self.limits / 2
+        
+        segments = []
+        for axis, other, traj_axis, traj_other in ((0, 2, 0, 1), (2, 0, 1, 0)):
+            lines = np.arange(np.ceil(MINS[axis] / spacing), np.floor(MAXS[axis] / spacing) + 1) * spacing
+            lines = np.unique(np.concatenate([[MINS[axis]], lines[(lines > MINS[axis]) & (lines < MAXS[axis])], [MAXS[axis]]]))
+            
+            # (frames, lines) in root-relative coordinates
+            position = lines[None] - trajec[frame_indices, traj_axis, None]
+            start = np.clip(MINS[other] - trajec[frame_indices, traj_other, None], -2 * self.limits, 2 * self.limits)
+            end = np.clip(MAXS[other] - trajec[frame_indices, traj_other, None], -2 * self.limits, 2 * self.limits)
+            visible = (np.abs(position) <= 2 * self.limits) & (start < end)
+            start, end = np.broadcast_to(start, position.shape), np.broadcast_to(end, position.shape)
+            
+            p0 = np.zeros(position.shape + (3,))
+            p1 = np.zeros(position.shape + (3,))
+            p0[..., axis] = p1[..., axis] = position
+            p0[..., other] = start
+            p1[..., other] = end
+            frame_ids = np.broadcast_to(np.arange(len(frame_indices))[:, None], position.shape)
+            segments.append((p0[visible], p1[visible], frame_ids[visible]))
+        
+        return [np.concatenate(items) for items in zip(*segments)]
+    
+    
+    #
+    # root-trajectory of the previous frames on the floor (drawn from the 3rd frame as FrameRenderer)
+    # segments (j, j + 1) for j < index - 1 of each frame index, within 2 * limits around the root of the frame
+    # the segments are first limited to the box around the roots of the whole batch, so that the cost of a batch
+    # depends on the trajectory near the batch, not on the length of the clip
+    #
+    def _trajectorySegments(self, trajec, frame_indices):
+    
+        reach = 2 * self.limits
+        roots = trajec[frame_indices]
+        
+        # candidates: both ends within reach of the box of the roots of the batch
+        starts = np.arange(max(frame_indices.max(initial=0) - 1, 0))
+        low, high = roots.min(axis=0, initial=np.inf) - reach, roots.max(axis=0, initial=-np.inf) + reach
+        inside = ((trajec >= low) & (trajec <= high)).all(axis=1)
+        starts = starts[inside[starts] & inside[starts + 1]]
+        
+        # (frames, candidates) visible in each frame
+        q0 = trajec[starts][None] - roots[:, None]
+        q1 = trajec[starts + 1][None] - roots[:, None]
+        visible = (starts[None] < frame_indices[:, None] - 1) & (np.abs(q0) <= reach).all(axis=2) & (np.abs(q1) <= reach).all(axis=2)
+        frame_ids, candidates = np.nonzero(visible)
+        
+        p0 = np.zeros((len(frame_ids), 3))
+        p1 = np.zeros((len(frame_ids), 3))
+        p0[:, [0, 2]] = q0[frame_ids, candidates]
+        p1[:, [0, 2]] = q1[frame_ids, candidates]
+        
+        return p0, p1, frame_ids
+    
+    
+    #
+    # render frames[frame_start:frame_end] as ndarray(frames, height, width, 4) of uint8 (RGBA)
+    # out: preallocated C-contiguous buffer of at least frame_end - frame_start frames (the returned frames are a view of it)
+    #
+    def render(self, data, trajec, MINS, MAXS, frame_start = 0, frame_end = None, out = None):
+    
+        frame_end = data.shape[0] if frame_end is None else frame_end
+        frame_indices = np.arange(frame_start, frame_end)
+        num_frames = len(frame_indices)
+        
+        if out is None:
+            out = np.empty((num_frames, self.height, self.width, 4), dtype=np.uint8)
+        frames = out[:num_frames]
+        frames.fill(255)
+        
+        if self._coverage.size < frames[..., 0].size:
+            self._coverage = np.zeros(frames[..., 0].size, dtype=np.float32)
+        
+        trajec = np.asarray(trajec, dtype=np.float64)
+        self._drawSegments(frames, *self._floorSegments(trajec, MINS, MAXS, frame_indices), self.thin_linewidth, self.floor_color, self.floor_opacity)
+        self._drawSegments(frames, *self._trajectorySegments(trajec, frame_indices), self.thin_linewidth, self.trajectory_color)
+        
+        # segments of a chain over all frames: (frames, len(chain) - 1)
+        positions = np.asarray(data[frame_start:frame_end], dtype=np.float64)
+        for chain, linewidth, color in zip(self.joint_chains, self.linewidths, self.colors):
+            frame_ids = np.repeat(np.arange(num_frames), len(chain) - 1)
+            self._drawSegments(
+                frames,
+                positions[:, chain[:-1]].reshape(-1, 3),
+                positions[:, chain[1:]].reshape(-1, 3),
+                frame_ids,
+                linewidth,
+                color
+            )
+        
+        return frames